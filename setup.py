@@ -12,6 +12,7 @@ kwargs = {'author': '',
                  'Topic :: Scientific/Engineering'],
  'description': '',
  'download_url': '',
+ 'extras_require': {'scipy': ['scipy>=1.7']},
  'include_package_data': True,
  'install_requires': ['openmdao>=1.5'],
  'keywords': ['openmdao'],
@@ -0,0 +1,12 @@
+# The OpenMDAO components are only imported on first use, so tools that only need the NumPy
+# core (plant_financese.core, monte_carlo, sweep, ...) never load OpenMDAO
+_LAZY = {'PlantFinance':         'plant_financese.plant_finance',
+         'PlantFinanceMulti':    'plant_financese.plant_finance',
+         'PlantFinanceTurbines': 'plant_financese.plant_finance'}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        return getattr(importlib.import_module(_LAZY[name]), name)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
@@ -0,0 +1,229 @@
+"""
+benchmark.py
+
+Performance benchmarks of PlantFinance: scalar solve_nonlinear and linearize, evaluation and
+gradients inside an OpenMDAO Problem, and the batch and sweep paths, at increasing numbers of scenarios. Each run is
+appended to a JSON-lines history so per-evaluation latency and memory can be compared between
+releases:
+
+    $ python -m plant_financese.benchmark --history bench_history.jsonl --label 0.2.0
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+import numpy as np
+
+from plant_financese.core import batch_lcoe, batch_dcf, evaluate_batch, PARAM_DEFAULTS
+
+SIZES = (1, 10**3, 10**5, 10**6)
+
+# Baseline plant, the benchmark scenarios perturb the turbine cost around it
+BASE = dict(PARAM_DEFAULTS)
+BASE.update(turbine_cost=1.2e6, turbine_number=50, turbine_bos_costs=7.7e5, turbine_avg_annual_opex=7e4,
+            turbine_aep=1.6e7, machine_rating=5.0, wake_loss_factor=0.15)
+
+
+def scenarios(n):
+    columns = dict(BASE)
+    columns['turbine_cost'] = np.linspace(1.0e6, 2.0e6, n)
+    return columns
+
+
+# Loop cases run the scalar component once per scenario; loop is capped by max_loop and the
+# per-evaluation time is taken from the calls actually made. The component (and OpenMDAO) is only
+# imported when one of them runs.
+
+def _loop_solve_nonlinear(n):
+    from plant_financese.plant_finance import PlantFinance
+    comp, params = PlantFinance(), dict(BASE)
+    costs = scenarios(n)['turbine_cost']
+    def run():
+        for c in costs:
+            params['turbine_cost'] = c
+            comp.solve_nonlinear(params, {}, {})
+    return run
+
+
+def _loop_linearize(n):
+    from plant_financese.plant_finance import PlantFinance
+    comp, params = PlantFinance(), dict(BASE)
+    costs = scenarios(n)['turbine_cost']
+    def run():
+        for c in costs:
+            params['turbine_cost'] = c
+            comp.linearize(params, {}, {})
+    return run
+
+
+def _loop_problem(n):
+    from openmdao.api import Problem, Group
+    from plant_financese.plant_finance import PlantFinance
+    prob = Problem(root=Group())
+    prob.root.add('pf', PlantFinance(), promotes=['*'])
+    prob.setup(check=False, out_stream=None)
+    for name in ['turbine_cost', 'turbine_number', 'turbine_bos_costs', 'turbine_avg_annual_opex',
+                 'turbine_aep', 'machine_rating']:
+        prob[name] = BASE[name]
+    costs = scenarios(n)['turbine_cost']
+    def run():
+        for c in costs:
+            prob['turbine_cost'] = c
+            prob.run_once()
+    return run
+
+
+def _loop_gradient(n):
+    # Gradient path of the component in a Problem: run_once, then linearize and the linear solve
+    from openmdao.api import Problem, Group, IndepVarComp
+    from plant_financese.plant_finance import PlantFinance
+    wrt = ['turbine_cost', 'turbine_bos_costs', 'turbine_avg_annual_opex', 'turbine_aep', 'machine_rating']
+    prob = Problem(root=Group())
+    prob.root.add('indeps', IndepVarComp([(name, BASE[name]) for name in wrt]), promotes=['*'])
+    prob.root.add('pf', PlantFinance(), promotes=['*'])
+    prob.setup(check=False, out_stream=None)
+    prob['turbine_number'] = BASE['turbine_number']
+    costs = scenarios(n)['turbine_cost']
+    def run():
+        for c in costs:
+            prob['turbine_cost'] = c
+            prob.run_once()
+            prob.calc_gradient(wrt, ['lcoe', 'coe'], mode='rev')
+    return run
+
+
+def _batch(evaluate):
+    def case(n):
+        columns = scenarios(n)
+        return lambda: evaluate(**columns)
+    return case
+
+
+def _evaluate_batch(n):
+    columns = scenarios(n)
+    return lambda: evaluate_batch(columns, policy='nan')
+
+
+def _sweep(n):
+    from plant_financese.sweep import ScenarioList, run_sweep
+    spec = ScenarioList({'turbine_cost': scenarios(n)['turbine_cost']}, fixed=BASE)
+    def run():
+        out_dir = tempfile.mkdtemp()
+        try:
+            run_sweep(spec, out_dir, chunk_size=100000)
+        finally:
+            shutil.rmtree(out_dir)
+    return run
+
+
+CASES = [('solve_nonlinear', _loop_solve_nonlinear, True),
+         ('linearize',       _loop_linearize,       True),
+         ('problem_run',     _loop_problem,         True),
+         ('problem_gradient', _loop_gradient,       True),
+         ('batch_lcoe',      _batch(batch_lcoe),    False),
+         ('batch_dcf',       _batch(batch_dcf),     False),
+         ('evaluate_batch',  _evaluate_batch,       False),
+         ('sweep',           _sweep,                False)]
+
+
+def time_case(make, n, repeat=3):
+    # Best of repeat wall times, then a separate traced run for the peak of Python-side allocations
+    run  = make(n)
+    best = np.inf
+    for k in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(sizes=SIZES, cases=None, repeat=3, max_loop=10**4, history=None, label=None, out=sys.stdout):
+    """Time every case at every size and return the result records.
+
+    Loop cases (one scalar evaluation per scenario) run at most max_loop scenarios. With history,
+    the records are appended to that JSON-lines file, tagged with label, the environment and a
+    run_id unique to this call.
+    """
+    env = {'run_id': uuid.uuid4().hex, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'label': label,
+           'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine()}
+    records = []
+    for name, make, loop in CASES:
+        if cases is not None and name not in cases:
+            continue
+        for n in sizes:
+            n_run = min(n, max_loop) if loop else n
+            seconds, peak = time_case(make, n_run, repeat)
+            record = dict(env, case=name, n=n, n_run=n_run, seconds=seconds, per_eval_s=seconds / n_run,
+                          peak_bytes=peak)
+            records.append(record)
+            if out is not None:
+                print('%-16s n=%-8d %10.4f s %12.3e s/eval %12d B peak' % (name, n, seconds, record['per_eval_s'], peak),
+                      file=out)
+
+    if history:
+        with open(history, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+    return records
+
+
+def check_regressions(history, tolerance=0.25):
+    """Compare the last run in a history file with the run before it.
+
+    Returns (case, n, metric, old, new) for every per-evaluation time or peak memory that grew by
+    more than tolerance (as a fraction). Runs are told apart by run_id (by time for records
+    written before it existed) and ordered as appended.
+    """
+    with open(history) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    runs = []
+    for r in records:
+        run = r.get('run_id', r['time'])
+        if run not in runs:
+            runs.append(run)
+    if len(runs) < 2:
+        return []
+    old = dict(((r['case'], r['n']), r) for r in records if r.get('run_id', r['time']) == runs[-2])
+    new = dict(((r['case'], r['n']), r) for r in records if r.get('run_id', r['time']) == runs[-1])
+
+    regressions = []
+    for key in sorted(set(old) & set(new)):
+        for metric in ('per_eval_s', 'peak_bytes'):
+            if new[key][metric] > (1. + tolerance) * old[key][metric]:
+                regressions.append(key + (metric, old[key][metric], new[key][metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PlantFinance performance benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--cases', nargs='+', choices=[name for name, make, loop in CASES])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-loop', type=int, default=10**4)
+    parser.add_argument('--history', help='JSON-lines file the results are appended to')
+    parser.add_argument('--label', help='Tag stored with the results, e.g. the release')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    run_benchmarks(args.sizes, args.cases, args.repeat, args.max_loop, args.history, args.label)
+    if args.history:
+        regressions = check_regressions(args.history, args.tolerance)
+        for case, n, metric, old, new in regressions:
+            print('REGRESSION %s n=%d %s: %.3e -> %.3e' % (case, n, metric, old, new))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
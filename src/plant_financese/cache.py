@@ -0,0 +1,174 @@
+"""
+cache.py
+
+Persistent result cache for batch evaluations, in a local SQLite file. Every scenario is keyed by
+a hash of its full canonical param set (all declared params, defaults filled in), the evaluation
+mode and core.MODEL_VERSION, so a cached result is only reused for exactly the same inputs and
+equations. Lookups and writes are done for whole batches, and the file can be shared by the
+workers of a process pool: each process opens its own connection, the database runs in WAL mode
+so readers never block, and writers wait on the lock instead of failing.
+"""
+
+import hashlib
+import os
+import sqlite3
+import numpy as np
+
+from plant_financese.core import evaluate_batch, MODEL_VERSION, PARAM_DEFAULTS
+from plant_financese.validation import validate_inputs, check_status, apply_policy
+
+# Outputs stored per scenario, in this order, for each evaluation mode
+OUTPUTS     = ('lcoe', 'coe', 'icc', 'c_opex', 'nec', 'npr', 'park_aep')
+DCF_OUTPUTS = OUTPUTS + ('capex', 'opex')
+
+# Rows per SQL statement batch, well below the SQLite variable limit
+_BATCH = 500
+
+
+def scenario_matrix(columns):
+    """(n, n_params) float64 matrix of the declared params of a dict of columns, in PARAM_DEFAULTS order.
+
+    Missing params take their defaults and the columns are broadcast against each other. -0.0 is
+    stored as 0.0 and every NaN as the same NaN, so equal scenarios always give equal rows.
+    """
+    values = [np.asarray(columns.get(name, default), dtype=np.float64) for name, default in PARAM_DEFAULTS.items()]
+    values = np.broadcast_arrays(*values)
+    M = np.empty((values[0].size, len(values)))
+    for j, v in enumerate(values):
+        M[:, j] = v.ravel()
+    M[M == 0.0] = 0.0
+    M[np.isnan(M)] = np.nan
+    return M
+
+
+def scenario_keys(columns, use_dcf=False):
+    """16-byte cache key of each scenario of a dict of columns: hash of the model version, the
+    evaluation mode and the canonical param row."""
+    M = scenario_matrix(columns)
+    salt = ('%s:%s' % (MODEL_VERSION, 'dcf' if use_dcf else 'fcr')).encode()
+    rows = memoryview(np.ascontiguousarray(M)).cast('B')
+    width = M.shape[1] * 8
+    return [hashlib.blake2b(rows[i * width:(i + 1) * width], digest_size=16, key=salt).digest()
+            for i in range(M.shape[0])]
+
+
+class ResultCache(object):
+    """Scenario outputs stored in the SQLite file at path, safe to share between processes.
+
+    Connections are opened lazily and per process, so a cache can be passed to pool workers (it
+    pickles as its path). timeout is how long a writer waits for the lock, in seconds.
+    hits and misses count the lookups of this process.
+    """
+    def __init__(self, path, timeout=60.0):
+        self.path     = os.path.abspath(path)
+        self.timeout  = timeout
+        self.hits     = 0
+        self.misses   = 0
+        self._conn    = None
+        self._pid     = None
+        self._connection().close()
+        self._conn    = None
+
+    def __getstate__(self):
+        return {'path': self.path, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['timeout'])
+
+    def _connection(self):
+        # A connection must not cross a fork, reopen after one
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._pid  = os.getpid()
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, value BLOB NOT NULL)')
+        return self._conn
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def clear(self):
+        self._connection().execute('DELETE FROM results')
+
+    def get_many(self, keys, width):
+        """Look up a list of keys. Returns (found, values): a boolean mask over keys and an
+        (n, width) float64 array holding the stored outputs of the keys found (NaN elsewhere)."""
+        conn   = self._connection()
+        found  = np.zeros(len(keys), dtype=bool)
+        values = np.full((len(keys), width), np.nan)
+        position = {}
+        for i, key in enumerate(keys):
+            position.setdefault(key, []).append(i)
+        unique = list(position)
+        for start in range(0, len(unique), _BATCH):
+            batch = unique[start:start + _BATCH]
+            query = 'SELECT key, value FROM results WHERE key IN (%s)' % ','.join('?' * len(batch))
+            for key, value in conn.execute(query, batch):
+                row = np.frombuffer(value, dtype=np.float64)
+                if len(row) != width:
+                    continue
+                idx = position[bytes(key)]
+                found[idx]  = True
+                values[idx] = row
+        self.hits   += int(found.sum())
+        self.misses += len(keys) - int(found.sum())
+        return found, values
+
+    def put_many(self, keys, values):
+        """Store the rows of the (n, width) array values under keys, in one transaction. Keys
+        already stored are left as they are, so concurrent writers of the same scenario agree."""
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        conn   = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('INSERT OR IGNORE INTO results (key, value) VALUES (?, ?)',
+                             ((key, row.tobytes()) for key, row in zip(keys, values)))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+
+def as_cache(cache):
+    # A ResultCache, or a path to open one at
+    if cache is None or isinstance(cache, ResultCache):
+        return cache
+    return ResultCache(cache)
+
+
+def evaluate_cached(columns, cache, use_dcf=False, policy='raise'):
+    """evaluate_batch through a ResultCache (or the path of one).
+
+    Scenarios found in the cache are not evaluated again; the others are evaluated as one batch
+    and written back. Inputs are validated under policy for every scenario, as in evaluate_batch,
+    and the returned dict has the same outputs, all of the broadcast shape of the columns.
+    """
+    cache  = as_cache(cache)
+    names  = DCF_OUTPUTS if use_dcf else OUTPUTS
+    inputs = dict(PARAM_DEFAULTS)
+    inputs.update(columns)
+    shape  = np.broadcast(*[np.asarray(inputs[name]) for name in PARAM_DEFAULTS]).shape
+
+    status = validate_inputs(**inputs)
+    errors = check_status(status, policy)
+
+    keys = scenario_keys(inputs, use_dcf)
+    found, values = cache.get_many(keys, len(names))
+    miss = np.flatnonzero(~found)
+    if len(miss):
+        M = scenario_matrix(inputs)[miss]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = evaluate_batch(dict(zip(PARAM_DEFAULTS, M.T)), use_dcf, trusted=True)
+        values[miss] = np.column_stack([np.broadcast_to(out[name], (len(miss),)) for name in names])
+        cache.put_many([keys[i] for i in miss], values[miss])
+
+    out = dict((name, values[:, j].reshape(shape)) for j, name in enumerate(names))
+    apply_policy(out, errors, policy)
+    out['status'] = np.broadcast_to(status, shape)
+    return out
@@ -0,0 +1,676 @@
+"""
+core.py
+
+The PlantFinance cost equations, scalar and vectorized, with their partials, the discounted
+cash-flow factors and the batch evaluation helpers. Depends on NumPy only, so worker processes
+and scripts can use it without importing OpenMDAO; plant_finance wraps it as components.
+"""
+
+from collections import OrderedDict
+import numpy as np
+
+from plant_financese.validation import validate_inputs, check_status, apply_policy
+
+
+# Intermediates of the cost equations, shared by the scalar, incremental and batch paths so that
+# they all agree to round-off
+
+def net_park_rating(n_turbine, t_rating):
+    return n_turbine * t_rating # net park rating, used in net energy capture calculation below
+
+def net_energy_capture(turb_aep, n_turbine, npr):
+    return turb_aep * n_turbine / (npr * 1.e003) # net energy rating, per COE report
+
+def initial_capital_cost(c_turbine, c_bos_turbine, t_rating):
+    return (c_turbine + c_bos_turbine) / (t_rating * 1.e003) #$/kW, changed per COE report
+
+def opex_per_kw(c_opex_turbine, t_rating):
+    return (c_opex_turbine) / (t_rating * 1.e003)  # $/kW, changed per COE report
+
+def fcr_lcoe(icc, fcr, c_opex, nec):
+    return ((icc * fcr + c_opex) / nec) # changed per COE report
+
+def unlevelized_coe(icc, c_opex, nec, fcr, tax):
+    # Unlevelized cost of energy, opex is taken after tax
+    return (icc * fcr + (1. - tax) * c_opex) / nec
+
+def plant_aep(park_aep, n_turbine, turb_aep, wlf):
+    # Park AEP falls back on the turbine AEP with wake losses when it is not set
+    return np.where(park_aep == 0.0, n_turbine * turb_aep * (1. - wlf), park_aep)
+
+def plant_capex(n_turbine, c_turbine, c_bos_turbine):
+    return n_turbine * (c_turbine + c_bos_turbine)
+
+def plant_opex(n_turbine, c_opex_turbine):
+    return n_turbine * c_opex_turbine
+
+
+def lcoe_terms(c_turbine, n_turbine, c_bos_turbine, c_opex_turbine, turb_aep, t_rating, fcr):
+    npr     = net_park_rating(n_turbine, t_rating)
+    nec     = net_energy_capture(turb_aep, n_turbine, npr)
+    icc     = initial_capital_cost(c_turbine, c_bos_turbine, t_rating)
+    c_opex  = opex_per_kw(c_opex_turbine, t_rating)
+    lcoe    = fcr_lcoe(icc, fcr, c_opex, nec)
+    return npr, nec, icc, c_opex, lcoe
+
+
+def coe_partials(c_turbine, n_turbine, c_bos_turbine, c_opex_turbine, turb_aep, t_rating, fcr, tax):
+    # Exact partials of unlevelized_coe, keyed by PlantFinance param name (zero partials left out as for lcoe)
+    npr, nec, icc, c_opex, lcoe = lcoe_terms(c_turbine, n_turbine, c_bos_turbine, c_opex_turbine,
+                                             turb_aep, t_rating, fcr)
+    coe     = unlevelized_coe(icc, c_opex, nec, fcr, tax)
+    dicc_dc = 1.0 / (t_rating * 1.e003)
+
+    J = {}
+    J['turbine_cost']            = fcr * dicc_dc / nec
+    J['turbine_bos_costs']       = fcr * dicc_dc / nec
+    J['turbine_avg_annual_opex'] = (1. - tax) * dicc_dc / nec
+    J['turbine_aep']             = -coe / turb_aep
+    J['fixed_charge_rate']       = icc / nec
+    J['tax_rate']                = -c_opex / nec
+    return J
+
+
+def lcoe_partials(c_turbine, n_turbine, c_bos_turbine, c_opex_turbine, turb_aep, t_rating, fcr):
+    # Exact partials of lcoe_terms' lcoe, keyed by PlantFinance param name.
+    # turbine_number and machine_rating cancel out of lcoe (npr, icc, c_opex and nec all scale with them),
+    # and park_aep/wake_loss_factor never enter it, so those partials are identically zero and left out.
+    npr, nec, icc, c_opex, lcoe = lcoe_terms(c_turbine, n_turbine, c_bos_turbine, c_opex_turbine,
+                                             turb_aep, t_rating, fcr)
+    dlcoe_dicc = fcr / nec
+    dicc_dc    = 1.0 / (t_rating * 1.e003)
+
+    J = {}
+    J['turbine_cost']            = dlcoe_dicc * dicc_dc
+    J['turbine_bos_costs']       = dlcoe_dicc * dicc_dc
+    J['turbine_avg_annual_opex'] = dicc_dc / nec
+    J['turbine_aep']             = -lcoe / turb_aep
+    J['fixed_charge_rate']       = icc / nec
+    return J
+
+
+def batch_lcoe_partials(turbine_cost, turbine_number, turbine_bos_costs, turbine_avg_annual_opex, turbine_aep,
+                        machine_rating, fixed_charge_rate=0.12, **kwargs):
+    """Vectorized partials of lcoe with respect to the PlantFinance params, as a dict of arrays.
+
+    Takes the same arguments as batch_lcoe. Params with identically zero partials are omitted.
+    """
+    args = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in
+                                 (turbine_cost, turbine_number, turbine_bos_costs, turbine_avg_annual_opex,
+                                  turbine_aep, machine_rating, fixed_charge_rate)])
+    return lcoe_partials(*args)
+
+
+def batch_lcoe(turbine_cost, turbine_number, turbine_bos_costs, turbine_avg_annual_opex, turbine_aep,
+               machine_rating, fixed_charge_rate=0.12, park_aep=0.0, wake_loss_factor=0.0, tax_rate=0.4, **kwargs):
+    """Vectorized PlantFinance evaluation over many plant scenarios at once.
+
+    Every argument accepts a scalar or an array (keyed by the PlantFinance param names, so a
+    dict of columns can be passed with ``**``); inputs are broadcast against each other.
+    Params that do not enter the LCOE equations (sea_depth, ...) are accepted and ignored.
+    Returns a dict of float arrays: lcoe, coe, icc, c_opex, nec, npr and park_aep.
+    """
+    c_turbine, n_turbine, c_bos_turbine, c_opex_turbine, turb_aep, t_rating, fcr, park_aep, wlf, tax = \
+        np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in
+                              (turbine_cost, turbine_number, turbine_bos_costs, turbine_avg_annual_opex,
+                               turbine_aep, machine_rating, fixed_charge_rate, park_aep, wake_loss_factor, tax_rate)])
+
+    npr, nec, icc, c_opex, lcoe = lcoe_terms(c_turbine, n_turbine, c_bos_turbine, c_opex_turbine,
+                                             turb_aep, t_rating, fcr)
+    coe = unlevelized_coe(icc, c_opex, nec, fcr, tax)
+
+    park_aep = plant_aep(park_aep, n_turbine, turb_aep, wlf)
+
+    return {'lcoe': lcoe, 'coe': coe, 'icc': icc, 'c_opex': c_opex, 'nec': nec, 'npr': npr, 'park_aep': park_aep}
+
+
+def dcf_weights(construction_time, project_lifetime):
+    """Year grid with capex drawdown and operating-year weights for each scenario.
+
+    Year 0 is the last construction year; operation runs over years 1..ceil(project_lifetime).
+    Returns (years, w_capex, w_oper), the weights shaped (scenarios, years). Capex is drawn evenly
+    over the construction time and each w_capex row sums to one; fractional lifetimes and
+    construction times get a partial last year.
+    """
+    tc = np.asarray(construction_time, dtype=np.float64)[..., np.newaxis]
+    tp = np.asarray(project_lifetime, dtype=np.float64)[..., np.newaxis]
+
+    tc_eff  = np.where(tc > 0.0, tc, 1.0) # no construction period means all capex at year 0
+    n_build = np.ceil(tc_eff)
+    years   = np.arange(1 - int(n_build.max()), int(np.ceil(tp.max())) + 1, dtype=np.float64)
+
+    k       = years + n_build - 1.0 # 0-based construction year of each grid year
+    w_capex = np.where((years <= 0.0) & (k >= 0.0), np.clip(tc_eff - k, 0.0, 1.0), 0.0) / tc_eff
+    w_oper  = np.where(years >= 1.0, np.clip(tp - (years - 1.0), 0.0, 1.0), 0.0)
+    return years, w_capex, w_oper
+
+
+def dcf_cash_flows(capex, opex, energy, tax_rate, discount_rate, construction_time, project_lifetime):
+    """(scenario x year) after-tax cost and energy flows of a plant, with their discount factors.
+
+    capex is the total plant capital cost, opex the plant annual opex and energy the plant annual
+    energy. Opex and energy are taxed; capex is depreciated straight-line over the project lifetime
+    and the depreciation tax shield is credited against costs.
+    Returns (years, cost, energy, discount) with cost/energy/discount shaped (scenarios, years).
+    """
+    years, w_capex, w_oper = dcf_weights(construction_time, project_lifetime)
+    capex  = np.asarray(capex, dtype=np.float64)[..., np.newaxis]
+    opex   = np.asarray(opex, dtype=np.float64)[..., np.newaxis]
+    energy = np.asarray(energy, dtype=np.float64)[..., np.newaxis]
+    tax    = np.asarray(tax_rate, dtype=np.float64)[..., np.newaxis]
+    r      = np.asarray(discount_rate, dtype=np.float64)[..., np.newaxis]
+    tp     = np.asarray(project_lifetime, dtype=np.float64)[..., np.newaxis]
+
+    cost     = capex * w_capex + (opex * (1. - tax) - tax * capex / tp) * w_oper
+    energy   = energy * (1. - tax) * w_oper
+    discount = (1. + r) ** (-years)
+    return years, cost, energy, discount
+
+
+FACTOR_NAMES = ('amortization', 'pv_capex', 'pv_oper', 'dpv_capex_dr', 'dpv_oper_dr')
+
+
+def finance_factors(discount_rate, construction_time, project_lifetime):
+    """Amortization and present-value factors for arrays of (rate, construction time, lifetime).
+
+    amortization is the capital recovery factor with half a year of construction interest,
+    pv_capex/pv_oper are the present values of the capex drawdown and of one unit per operating year,
+    dpv_*_dr their derivatives with respect to the discount rate. Returns a dict of arrays.
+    """
+    r, tc, tp = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in
+                                      (discount_rate, construction_time, project_lifetime)])
+    # The year weights only depend on the schedule, which is usually the same for every triple
+    if tc.size and tc.min() == tc.max() and tp.min() == tp.max():
+        years, w_capex, w_oper = dcf_weights(tc.flat[0], tp.flat[0])
+    else:
+        years, w_capex, w_oper = dcf_weights(tc, tp)
+    discount  = np.exp(-years * np.log1p(r)[..., np.newaxis])
+    ddiscount = -years * discount / (1. + r[..., np.newaxis])
+
+    f = {}
+    f['amortization'] = (1 + 0.5*((1+r)**tc - 1)) * (r/(1-(1+r)**(-tp)))
+    f['pv_capex']     = (w_capex * discount).sum(axis=-1)
+    f['pv_oper']      = (w_oper * discount).sum(axis=-1)
+    f['dpv_capex_dr'] = (w_capex * ddiscount).sum(axis=-1)
+    f['dpv_oper_dr']  = (w_oper * ddiscount).sum(axis=-1)
+    return f
+
+
+def _unique_rows(r, tc, tp):
+    # Distinct (r, tc, tp) triples in sorted order and the index of each input's triple; a lexsort
+    # of the three columns is several times faster than np.unique(..., axis=0)
+    order  = np.lexsort((tp, tc, r))
+    rows   = np.column_stack([r[order], tc[order], tp[order]])
+    first  = np.empty(len(rows), dtype=bool)
+    first[:1] = True
+    first[1:] = (rows[1:] != rows[:-1]).any(axis=1)
+    inverse = np.empty(len(rows), dtype=np.intp)
+    inverse[order] = np.cumsum(first) - 1
+    return rows[first], inverse
+
+
+class FactorCache(object):
+    """Bounded LRU cache of finance_factors keyed by (discount_rate, construction_time, project_lifetime).
+
+    Sweeps tend to revisit a handful of financing triples, so the scalar and batch DCF paths look
+    their factors up here rather than rebuilding the year grid. hits/misses count triples, not calls.
+    A batch with more than batch_keys distinct triples (e.g. sampled rates) is computed directly
+    and bypasses the cache, which it would only churn; uncached counts those triples.
+    """
+    def __init__(self, maxsize=4096, batch_keys=256):
+        self.maxsize    = maxsize
+        self.batch_keys = batch_keys
+        self.hits       = 0
+        self.misses     = 0
+        self.uncached   = 0
+        self._data      = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = self.uncached = 0
+
+    def cache_info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
+    def _store(self, key, values):
+        self._data[key] = values
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, discount_rate, construction_time, project_lifetime):
+        # Scalar lookup, returns the factors as a tuple ordered as FACTOR_NAMES
+        key = (float(discount_rate), float(construction_time), float(project_lifetime))
+        values = self._data.get(key)
+        if values is not None:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return values
+        self.misses += 1
+        f = finance_factors(*key)
+        values = tuple(float(f[name]) for name in FACTOR_NAMES)
+        self._store(key, values)
+        return values
+
+    def lookup(self, discount_rate, construction_time, project_lifetime):
+        """Vectorized lookup, returns a dict of factor arrays broadcast over the three inputs.
+
+        The distinct triples are found once, missing ones are computed in a single vectorized pass.
+        """
+        r, tc, tp = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in
+                                          (discount_rate, construction_time, project_lifetime)])
+        if r.ndim == 0:
+            return dict(zip(FACTOR_NAMES, [np.float64(v) for v in self.get(r, tc, tp)]))
+
+        keys, inverse = _unique_rows(r.ravel(), tc.ravel(), tp.ravel())
+        inverse = inverse.reshape(r.shape)
+        if len(keys) > min(self.batch_keys, self.maxsize):
+            # Too many distinct triples to be worth caching, in blocks to bound the year-grid temporaries
+            self.uncached += len(keys)
+            table = np.empty((len(keys), len(FACTOR_NAMES)))
+            for start in range(0, len(keys), 65536):
+                block = keys[start:start + 65536]
+                f = finance_factors(block[:, 0], block[:, 1], block[:, 2])
+                table[start:start + 65536] = np.column_stack([f[name] for name in FACTOR_NAMES])
+            return dict((name, table[inverse, j]) for j, name in enumerate(FACTOR_NAMES))
+
+        table = np.empty((len(keys), len(FACTOR_NAMES)))
+        missing = []
+        for i, key in enumerate(map(tuple, keys.tolist())):
+            values = self._data.get(key)
+            if values is None:
+                missing.append(i)
+            else:
+                self._data.move_to_end(key)
+                table[i] = values
+        self.hits   += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            f = finance_factors(keys[missing, 0], keys[missing, 1], keys[missing, 2])
+            table[missing] = np.column_stack([f[name] for name in FACTOR_NAMES])
+            for i in missing:
+                self._store(tuple(keys[i].tolist()), tuple(table[i].tolist()))
+
+        return dict((name, table[inverse, j]) for j, name in enumerate(FACTOR_NAMES))
+
+    def precompute(self, discount_rates, construction_times, project_lifetimes):
+        """Dense factor table over the full grid of the three axes, computed in one pass.
+
+        Returns a dict of arrays shaped (len(discount_rates), len(construction_times), len(project_lifetimes));
+        the grid points are also stored in the cache, up to maxsize.
+        """
+        r, tc, tp = np.meshgrid(np.atleast_1d(discount_rates).astype(np.float64),
+                                np.atleast_1d(construction_times).astype(np.float64),
+                                np.atleast_1d(project_lifetimes).astype(np.float64), indexing='ij')
+        f = finance_factors(r, tc, tp)
+        table = np.stack([f[name].ravel() for name in FACTOR_NAMES], axis=-1)
+        for key, values in zip(zip(r.ravel().tolist(), tc.ravel().tolist(), tp.ravel().tolist()), table.tolist()):
+            self._store(key, tuple(values))
+        return f
+
+factor_cache = FactorCache()
+
+
+def dcf_lcoe(capex, opex, energy, tax_rate, discount_rate, construction_time, project_lifetime):
+    # Discounted lifetime cost over discounted lifetime energy, i.e. the cash-flow matrices of
+    # dcf_cash_flows summed against the discount factors, with the year sums taken from factor_cache
+    f    = factor_cache.lookup(discount_rate, construction_time, project_lifetime)
+    tax  = np.asarray(tax_rate, dtype=np.float64)
+    tp   = np.asarray(project_lifetime, dtype=np.float64)
+    pv_cost = capex * f['pv_capex'] + (opex * (1. - tax) - tax * capex / tp) * f['pv_oper']
+    return pv_cost / (energy * (1. - tax) * f['pv_oper'])
+
+
+def dcf_partials(capex, opex, energy, tax_rate, discount_rate, construction_time, project_lifetime):
+    # Exact partials of dcf_lcoe with respect to the plant totals and the rates.
+    # The construction schedule and lifetime set the year grid and are treated as discrete, no partials.
+    f      = factor_cache.lookup(discount_rate, construction_time, project_lifetime)
+    capex  = np.asarray(capex, dtype=np.float64)
+    opex   = np.asarray(opex, dtype=np.float64)
+    energy = np.asarray(energy, dtype=np.float64)
+    tax    = np.asarray(tax_rate, dtype=np.float64)
+    tp     = np.asarray(project_lifetime, dtype=np.float64)
+
+    oper_cost = opex * (1. - tax) - tax * capex / tp
+    pv_energy = energy * (1. - tax) * f['pv_oper']
+    lcoe      = (capex * f['pv_capex'] + oper_cost * f['pv_oper']) / pv_energy
+
+    J = {}
+    J['capex']         = (f['pv_capex'] - tax * f['pv_oper'] / tp) / pv_energy
+    J['opex']          = (1. - tax) * f['pv_oper'] / pv_energy
+    J['energy']        = -lcoe / energy
+    J['tax_rate']      = (lcoe * energy - opex - capex / tp) * f['pv_oper'] / pv_energy
+    J['discount_rate'] = (capex * f['dpv_capex_dr'] + (oper_cost - lcoe * energy * (1. - tax)) * f['dpv_oper_dr']) \
+                         / pv_energy
+    return J
+
+
+def batch_dcf(turbine_cost, turbine_number, turbine_bos_costs, turbine_avg_annual_opex, turbine_aep,
+              machine_rating, fixed_charge_rate=0.12, park_aep=0.0, wake_loss_factor=0.0, tax_rate=0.4,
+              discount_rate=0.07, construction_time=1.0, project_lifetime=20.0, **kwargs):
+    """Discounted cash-flow PlantFinance evaluation over many plant scenarios at once.
+
+    Takes the same arguments as batch_lcoe and returns the same dict, with lcoe replaced by the
+    discounted cash-flow LCOE of the whole plant (park AEP, so wake losses count) and the plant
+    totals capex, opex. The year sums of the cash-flow matrix only depend on the financing triple
+    and come from factor_cache, so memory stays linear in the number of scenarios.
+    """
+    out = batch_lcoe(turbine_cost, turbine_number, turbine_bos_costs, turbine_avg_annual_opex, turbine_aep,
+                     machine_rating, fixed_charge_rate, park_aep, wake_loss_factor, tax_rate)
+    n_turbine = np.asarray(turbine_number, dtype=np.float64)
+    out['capex'] = plant_capex(n_turbine, np.asarray(turbine_cost, dtype=np.float64), turbine_bos_costs)
+    out['opex']  = plant_opex(n_turbine, np.asarray(turbine_avg_annual_opex, dtype=np.float64))
+    out['lcoe']  = dcf_lcoe(out['capex'], out['opex'], out['park_aep'], tax_rate, discount_rate,
+                            construction_time, project_lifetime)
+    return out
+
+
+def batch_partials(turbine_cost, turbine_number, turbine_bos_costs, turbine_avg_annual_opex, turbine_aep,
+                   machine_rating, fixed_charge_rate=0.12, park_aep=0.0, wake_loss_factor=0.0, tax_rate=0.4,
+                   discount_rate=0.07, construction_time=1.0, project_lifetime=20.0, use_dcf=False, **kwargs):
+    """Vectorized partials of coe and lcoe (cash-flow lcoe with use_dcf) of many scenarios at once.
+
+    Takes the same arguments as batch_dcf. Returns a dict keyed (output, param) as in
+    PlantFinance.linearize, each value an array of per-scenario partials; structurally zero
+    partials are left out.
+    """
+    c_turbine, n_turbine, c_bos_turbine, c_opex_turbine, turb_aep, t_rating, fcr, park_aep, wlf, tax, r, tc, tp = \
+        np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in
+                              (turbine_cost, turbine_number, turbine_bos_costs, turbine_avg_annual_opex, turbine_aep,
+                               machine_rating, fixed_charge_rate, park_aep, wake_loss_factor, tax_rate,
+                               discount_rate, construction_time, project_lifetime)])
+
+    J = {}
+    for name, dcoe in coe_partials(c_turbine, n_turbine, c_bos_turbine, c_opex_turbine,
+                                   turb_aep, t_rating, fcr, tax).items():
+        J['coe', name] = dcoe
+
+    if not use_dcf:
+        for name, dlcoe in lcoe_partials(c_turbine, n_turbine, c_bos_turbine, c_opex_turbine,
+                                         turb_aep, t_rating, fcr).items():
+            J['lcoe', name] = dlcoe
+    else:
+        # Same chain rule as the scalar component, the AEP fallback is picked per scenario
+        wake_aep = (park_aep == 0.0)
+        dlcoe = dcf_partials(plant_capex(n_turbine, c_turbine, c_bos_turbine), plant_opex(n_turbine, c_opex_turbine),
+                             plant_aep(park_aep, n_turbine, turb_aep, wlf), tax, r, tc, tp)
+        J['lcoe', 'turbine_cost']            = n_turbine * dlcoe['capex']
+        J['lcoe', 'turbine_bos_costs']       = n_turbine * dlcoe['capex']
+        J['lcoe', 'turbine_avg_annual_opex'] = n_turbine * dlcoe['opex']
+        J['lcoe', 'tax_rate']                = dlcoe['tax_rate']
+        J['lcoe', 'discount_rate']           = dlcoe['discount_rate']
+        # Cancels out unless park_aep is given, then only the costs scale with the turbine count
+        J['lcoe', 'turbine_number']          = dlcoe['capex'] * (c_turbine + c_bos_turbine) + dlcoe['opex'] * c_opex_turbine \
+                                               + np.where(wake_aep, dlcoe['energy'] * turb_aep * (1. - wlf), 0.0)
+        J['lcoe', 'turbine_aep']             = np.where(wake_aep, dlcoe['energy'] * n_turbine * (1. - wlf), 0.0)
+        J['lcoe', 'wake_loss_factor']        = np.where(wake_aep, -dlcoe['energy'] * n_turbine * turb_aep, 0.0)
+        J['lcoe', 'park_aep']                = np.where(wake_aep, 0.0, dlcoe['energy'])
+    return J
+
+
+
+# Matrix-free products with the partials. Scenario i only depends on element i of each param,
+# so every partial of batch_partials is a diagonal and the products are element-wise; no
+# Jacobian matrix is formed.
+
+def jvp_partials(partials, tangents):
+    """Output tangents of partials keyed (output, param), times the param tangents (any mapping)."""
+    out = {}
+    for (name, param), d in partials.items():
+        if param in tangents:
+            out[name] = out.get(name, 0.0) + d * tangents[param]
+    return out
+
+
+def vjp_partials(partials, seeds):
+    """Param gradients of the output seeds (any mapping) through partials keyed (output, param)."""
+    grads = {}
+    for (name, param), d in partials.items():
+        if name in seeds:
+            grads[param] = grads.get(param, 0.0) + d * seeds[name]
+    return grads
+
+
+def _scenario_partials(columns, use_dcf, offshore_costs):
+    # batch_partials of a dict of columns with the defaults filled in, chained for offshore costs
+    columns = dict(PARAM_DEFAULTS, **columns)
+    shape = np.broadcast(*[np.asarray(columns[name]) for name in PARAM_DEFAULTS]).shape
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if offshore_costs is None:
+            return batch_partials(use_dcf=use_dcf, **columns), shape
+        J = batch_partials(use_dcf=use_dcf, **offshore_costs.adjust(columns))
+        return offshore_costs.chain_partials(J, columns), shape
+
+
+def batch_jvp(columns, tangents, use_dcf=False, offshore_costs=None):
+    """Forward-mode derivatives of many scenarios in one call.
+
+    columns maps PlantFinance params to scenario values (missing ones take PARAM_DEFAULTS) and
+    tangents maps some of them to per-scenario input directions. Returns the directional
+    derivatives of lcoe and coe, one per scenario.
+    """
+    partials, shape = _scenario_partials(columns, use_dcf, offshore_costs)
+    out = jvp_partials(partials, tangents)
+    return dict((name, np.broadcast_to(out.get(name, 0.0), shape).copy()) for name in ('lcoe', 'coe'))
+
+
+def batch_vjp(columns, seeds, use_dcf=False, offshore_costs=None):
+    """Reverse-mode derivatives of many scenarios in one call.
+
+    columns maps PlantFinance params to scenario values (missing ones take PARAM_DEFAULTS) and
+    seeds maps lcoe and/or coe to per-scenario output weights, e.g. the gradient of a fleet
+    objective with respect to each plant's LCOE. Returns the gradient of every param, per scenario.
+    """
+    partials, shape = _scenario_partials(columns, use_dcf, offshore_costs)
+    grads = vjp_partials(partials, seeds)
+    return dict((name, np.broadcast_to(grads.get(name, 0.0), shape).copy()) for name in PARAM_DEFAULTS)
+
+# Per-turbine plants: every turbine has its own AEP, wake loss and costs (vectors along the last
+# axis). Both LCOE definitions are linear in the plant capex and opex, so the plant LCOE splits
+# exactly into per-turbine contributions (k_capex * capex_i + k_opex * opex_i) / E, with E the
+# waked plant AEP and the weights depending on the rates only.
+
+def lcoe_cost_weights(fixed_charge_rate=0.12, tax_rate=0.4, discount_rate=0.07, construction_time=1.0,
+                      project_lifetime=20.0, use_dcf=False):
+    """Weights (k_capex, k_opex) of the capex and annual opex in lcoe * plant AEP, with their rate partials.
+
+    Returns k_capex, k_opex and a dict param -> (dk_capex, dk_opex) of the rates they depend on.
+    """
+    if not use_dcf:
+        fcr = np.asarray(fixed_charge_rate, dtype=np.float64)
+        return fcr, np.ones_like(fcr), {'fixed_charge_rate': (np.ones_like(fcr), np.zeros_like(fcr))}
+    f   = factor_cache.lookup(discount_rate, construction_time, project_lifetime)
+    tax = np.asarray(tax_rate, dtype=np.float64)
+    tp  = np.asarray(project_lifetime, dtype=np.float64)
+    pv_ratio = f['pv_capex'] / f['pv_oper']
+    k_capex  = (pv_ratio - tax / tp) / (1. - tax)
+    dratio   = (f['dpv_capex_dr'] - pv_ratio * f['dpv_oper_dr']) / f['pv_oper']
+    zero     = np.zeros_like(k_capex)
+    return k_capex, np.ones_like(k_capex), {'tax_rate':      ((pv_ratio - 1. / tp) / (1. - tax)**2, zero),
+                                            'discount_rate': (dratio / (1. - tax), zero)}
+
+
+def turbine_lcoe(turbine_aep, wake_loss_factor, turbine_cost, turbine_bos_costs, turbine_avg_annual_opex,
+                 fixed_charge_rate=0.12, tax_rate=0.4, discount_rate=0.07, construction_time=1.0,
+                 project_lifetime=20.0, use_dcf=False):
+    """Plant LCOE/COE of a plant given turbine by turbine, with per-turbine contributions.
+
+    The per-turbine args are arrays over turbines (last axis, leading axes are separate plants),
+    the rates are per plant. Unlike batch_lcoe the LCOE is taken over the waked plant AEP
+    sum(turbine_aep * (1 - wake_loss_factor)). Returns a dict with park_aep, lcoe, coe, the
+    per-turbine lcoe_contribution (summing to lcoe) and turbine_lcoe (each turbine's own cost over
+    its own waked AEP), plus the intermediates energy, capex, opex, k_capex and k_opex.
+    """
+    aep, wlf, c_turbine, c_bos_turbine, c_opex_turbine = \
+        np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in
+                              (turbine_aep, wake_loss_factor, turbine_cost, turbine_bos_costs, turbine_avg_annual_opex)])
+    k_capex, k_opex, dk = lcoe_cost_weights(fixed_charge_rate, tax_rate, discount_rate, construction_time,
+                                            project_lifetime, use_dcf)
+    k_capex = np.asarray(k_capex)[..., np.newaxis]
+    k_opex  = np.asarray(k_opex)[..., np.newaxis]
+    fcr     = np.asarray(fixed_charge_rate, dtype=np.float64)[..., np.newaxis]
+    tax     = np.asarray(tax_rate, dtype=np.float64)[..., np.newaxis]
+
+    energy = aep * (1. - wlf)
+    capex  = c_turbine + c_bos_turbine
+    opex   = c_opex_turbine
+    E      = energy.sum(axis=-1, keepdims=True)
+    cost   = k_capex * capex + k_opex * opex
+
+    out = {'energy': energy, 'capex': capex, 'opex': opex, 'k_capex': k_capex, 'k_opex': k_opex}
+    out['park_aep']          = E[..., 0]
+    out['lcoe_contribution'] = cost / E
+    out['lcoe']              = out['lcoe_contribution'].sum(axis=-1)
+    out['coe']               = (fcr * capex + (1. - tax) * opex).sum(axis=-1) / E[..., 0]
+    out['turbine_lcoe']      = cost / energy
+    return out
+
+
+def turbine_lcoe_gradient(turbine_aep, wake_loss_factor, turbine_cost, turbine_bos_costs, turbine_avg_annual_opex,
+                          fixed_charge_rate=0.12, tax_rate=0.4, discount_rate=0.07, construction_time=1.0,
+                          project_lifetime=20.0, use_dcf=False):
+    """Gradient of the plant lcoe of turbine_lcoe, keyed by param: per-turbine arrays and per-plant rates.
+
+    This is what layout and sizing optimizers need, at the cost of one turbine_lcoe evaluation.
+    """
+    out = turbine_lcoe(turbine_aep, wake_loss_factor, turbine_cost, turbine_bos_costs, turbine_avg_annual_opex,
+                       fixed_charge_rate, tax_rate, discount_rate, construction_time, project_lifetime, use_dcf)
+    k_capex, k_opex, dk = lcoe_cost_weights(fixed_charge_rate, tax_rate, discount_rate, construction_time,
+                                            project_lifetime, use_dcf)
+    E      = out['park_aep'][..., np.newaxis]
+    de     = -out['lcoe'][..., np.newaxis] / E # d lcoe / d energy of any turbine
+    aep, wlf = np.broadcast_arrays(np.asarray(turbine_aep, dtype=np.float64), np.asarray(wake_loss_factor, dtype=np.float64))
+
+    G = {}
+    G['turbine_aep']             = de * (1. - wlf)
+    G['wake_loss_factor']        = -de * aep
+    G['turbine_cost']            = np.broadcast_to(out['k_capex'] / E, aep.shape)
+    G['turbine_bos_costs']       = G['turbine_cost']
+    G['turbine_avg_annual_opex'] = np.broadcast_to(out['k_opex'] / E, aep.shape)
+    for name, (dk_capex, dk_opex) in dk.items():
+        G[name] = ((dk_capex[..., np.newaxis] * out['capex'] + dk_opex[..., np.newaxis] * out['opex']) / E).sum(axis=-1)
+    return G
+
+
+# Intermediates of solve_nonlinear in evaluation order: name, function and its arguments, which are
+# params or earlier intermediates. coe and lcoe_fcr/lcoe_dcf are the outputs of the two finance modes.
+TERMS = [
+    ('npr',          net_park_rating,      ('turbine_number', 'machine_rating')),
+    ('nec',          net_energy_capture,   ('turbine_aep', 'turbine_number', 'npr')),
+    ('icc',          initial_capital_cost, ('turbine_cost', 'turbine_bos_costs', 'machine_rating')),
+    ('c_opex',       opex_per_kw,          ('turbine_avg_annual_opex', 'machine_rating')),
+    ('coe',          unlevelized_coe,      ('icc', 'c_opex', 'nec', 'fixed_charge_rate', 'tax_rate')),
+    ('lcoe_fcr',     fcr_lcoe,             ('icc', 'fixed_charge_rate', 'c_opex', 'nec')),
+]
+
+DCF_TERMS = [
+    ('plant_aep',    plant_aep,            ('park_aep', 'turbine_number', 'turbine_aep', 'wake_loss_factor')),
+    ('capex',        plant_capex,          ('turbine_number', 'turbine_cost', 'turbine_bos_costs')),
+    ('opex',         plant_opex,           ('turbine_number', 'turbine_avg_annual_opex')),
+    ('lcoe_dcf',     dcf_lcoe,             ('capex', 'opex', 'plant_aep', 'tax_rate', 'discount_rate',
+                                            'construction_time', 'project_lifetime')),
+]
+
+
+class IncrementalTerms(object):
+    """Dependency-aware cache of the intermediates of one component.
+
+    Keeps the params of the last evaluation and the values of all terms; update() recomputes only
+    the terms downstream of the params that changed. recomputed counts term evaluations.
+    """
+    def __init__(self, terms, names, output):
+        self.terms      = terms
+        self.names      = list(names)
+        self.output     = output
+        self.inputs     = None
+        self.values     = {}
+        self.recomputed = 0
+
+    def changed(self, params):
+        # Params that differ from the last evaluation (all of them before the first one)
+        if self.inputs is None:
+            return set(self.names)
+        inputs = self.inputs
+        return set(name for name in self.names if params[name] != inputs[name])
+
+    def update(self, params, changed=None):
+        # Bring the terms up to date with params, changed=None recomputes everything
+        inputs = dict((name, params[name]) for name in self.names)
+        values = self.values
+        dirty  = set(self.names if changed is None or self.inputs is None else changed)
+        for name in dirty:
+            values[name] = inputs[name]
+        for name, func, args in self.terms:
+            if not dirty.isdisjoint(args):
+                values[name] = func(*[values[a] for a in args])
+                dirty.add(name)
+                self.recomputed += 1
+        self.inputs = inputs
+        return values
+
+
+def evaluate_batch(columns, use_dcf=False, policy='raise', trusted=False, offshore_costs=None):
+    """Validated batch evaluation of a dict of PlantFinance param columns.
+
+    Runs batch_lcoe (or batch_dcf with use_dcf) on columns, with the input checks of
+    plant_financese.validation applied under policy ('raise', 'mask' or 'nan'). The returned dict
+    also holds the per-scenario status bit mask. trusted skips the checks and the status entirely.
+    offshore_costs (an offshore.OffshoreCostTable) scales the BoS costs and opex by sea_depth,
+    which can be a whole bathymetry raster.
+    """
+    evaluate = batch_dcf if use_dcf else batch_lcoe
+    if offshore_costs is not None:
+        columns = offshore_costs.adjust(columns)
+    if trusted:
+        return evaluate(**columns)
+
+    status = validate_inputs(**columns)
+    errors = check_status(status, policy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = evaluate(**columns)
+    apply_policy(out, errors, policy)
+    out['status'] = np.broadcast_to(status, np.shape(out['lcoe']))
+    return out
+
+
+# Declared PlantFinance params and their defaults, in declaration order, for code that builds
+# batches of scenarios column by column
+PARAM_DEFAULTS = OrderedDict([
+    ('turbine_cost',            0.0),
+    ('turbine_number',          0),
+    ('turbine_bos_costs',       0.0),
+    ('turbine_avg_annual_opex', 0.0),
+    ('park_aep',                0.0),
+    ('turbine_aep',             0.0),
+    ('wake_loss_factor',        0.0),
+    ('net_energy_capture',      0.0),
+    ('machine_rating',          0.0),
+    ('fixed_charge_rate',       0.12),
+    ('tax_rate',                0.4),
+    ('discount_rate',           0.07),
+    ('construction_time',       1.0),
+    ('project_lifetime',        20.0),
+    ('sea_depth',               0.0),
+])
+
+# Units of the declared params, unitless ones are left out
+PARAM_UNITS = {
+    'turbine_cost':            'USD',
+    'turbine_bos_costs':       'USD',
+    'turbine_avg_annual_opex': 'USD',
+    'park_aep':                'kW*h',
+    'turbine_aep':             'kW*h',
+    'net_energy_capture':      'MWh/MW/yr',
+    'machine_rating':          'MW',
+    'construction_time':       'year',
+    'project_lifetime':        'year',
+    'sea_depth':               'm',
+}
+
+# Version of the equations above, part of every persistent cache key (plant_financese.cache);
+# bump it whenever a change alters any output so stale cached results are never returned
+MODEL_VERSION = '0.1.1'
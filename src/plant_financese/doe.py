@@ -0,0 +1,187 @@
+"""
+doe.py
+
+Space-filling designs of experiments over boxes of PlantFinance params, e.g. to build surrogate
+training data. Designs are generated chunk by chunk straight into the batch evaluator, so a
+10^7-point design never exists in memory at once:
+
+    lhs       sliced Latin hypercube; the whole design and every chunk_size slice of it are both
+              Latin hypercubes
+    sobol     scrambled Sobol sequence (scipy.stats.qmc, SciPy 1.7 or later: the scipy extra)
+    halton    Halton sequence with random digit permutations
+    maximin   Latin hypercube optimized for the Morris-Mitchell maximin criterion by coordinate
+              exchanges, for moderate numbers of points
+
+Any chunk can be generated on its own, so a Design also works as the spec of sweep.run_sweep.
+"""
+
+import warnings
+import numpy as np
+
+from plant_financese.core import evaluate_batch, PARAM_DEFAULTS
+
+METHODS = ('lhs', 'sobol', 'halton', 'maximin')
+
+_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71)
+
+
+def halton(start, stop, d, digits=None):
+    """Points start:stop of the d-dimensional Halton sequence (index 0, the origin, is skipped).
+
+    digits[k][position] optionally permutes the digits of dimension k at each position, which
+    scrambles the sequence and breaks the correlations between high dimensions. A permuted zero
+    digit is not zero, so every point then uses all len(digits[k]) positions, whatever stop is;
+    size digits for the whole sequence so a point does not depend on the chunk it is drawn in.
+    """
+    if d > len(_PRIMES):
+        raise ValueError('Halton sequences are limited to %d dimensions here' % len(_PRIMES))
+    index = np.arange(start, stop, dtype=np.int64) + 1
+    u = np.zeros((stop - start, d))
+    for k in range(d):
+        base = _PRIMES[k]
+        if digits is not None:
+            n_digits = len(digits[k])
+        else:
+            n_digits = int(np.ceil(np.log(max(stop, 2) + 1) / np.log(base))) + 1
+        rest, scale = index.copy(), 1.0 / base
+        for position in range(n_digits):
+            digit = rest % base
+            if digits is not None:
+                digit = digits[k][position][digit]
+            u[:, k] += digit * scale
+            rest  //= base
+            scale /= base
+    return u
+
+
+def maximin_criterion(u, p=20):
+    """Morris-Mitchell phi_p of a design (lower is more space-filling) and its smallest distance.
+    Distances are scaled by the smallest one so large p does not overflow."""
+    diff = u[:, np.newaxis, :] - u[np.newaxis, :, :]
+    dist = np.sqrt((diff**2).sum(axis=-1))[np.triu_indices(len(u), 1)]
+    dmin = dist.min()
+    return ((dist / dmin)**-p).sum()**(1. / p) / dmin, dmin
+
+
+def maximin_lhs(n, d, rng, iterations=None, p=20):
+    """Latin hypercube of n points in d dimensions improved by exchanging coordinates between pairs
+    of points, keeping an exchange when it lowers phi_p. Memory is O(n d), each exchange O(n d)."""
+    u = (np.argsort(rng.random((d, n)), axis=1).T + rng.random((n, d))) / n
+    # Distances are scaled by the expected spacing so the powers stay in range
+    spacing = n**(-1. / d)
+    for it in range(iterations if iterations is not None else 20 * n):
+        i, j = rng.choice(n, 2, replace=False)
+        k = rng.integers(d)
+        old_i = np.sqrt(((u - u[i])**2).sum(axis=1)) / spacing
+        old_j = np.sqrt(((u - u[j])**2).sum(axis=1)) / spacing
+        v = u[[i, j]].copy()
+        v[0, k], v[1, k] = v[1, k], v[0, k]
+        new_i = np.sqrt(((u - v[0])**2).sum(axis=1)) / spacing
+        new_j = np.sqrt(((u - v[1])**2).sum(axis=1)) / spacing
+        # Pairs with i or j, without the self distances and counting the i-j pair once
+        mask = np.ones(n, dtype=bool)
+        mask[[i, j]] = False
+        with np.errstate(divide='ignore', over='ignore'):
+            before = (old_i[mask]**-p).sum() + (old_j[mask]**-p).sum()
+            after  = (new_i[mask]**-p).sum() + (new_j[mask]**-p).sum()
+        if after < before:
+            u[i, k], u[j, k] = u[j, k], u[i, k]
+    return u
+
+
+class Design(object):
+    """n-point design of the given method over ranges, a dict mapping params to (low, high).
+
+    fixed sets the other params (PARAM_DEFAULTS otherwise). chunk_size is the slice size of the
+    'lhs' method, n must be a multiple of it; other methods take any chunk bounds. seed makes the
+    design reproducible, the same seed gives the same points whatever the chunking.
+    """
+    def __init__(self, ranges, n, method='sobol', seed=None, fixed=None, chunk_size=100000, iterations=None):
+        if method not in METHODS:
+            raise ValueError('Unknown design method %r, use one of %s' % (method, ', '.join(METHODS)))
+        unknown = (set(ranges) | set(fixed or {})) - set(PARAM_DEFAULTS)
+        if unknown:
+            raise ValueError('Unknown params: %s' % ', '.join(sorted(unknown)))
+        self.names  = list(ranges)
+        self.low    = np.array([ranges[name][0] for name in self.names], dtype=np.float64)
+        self.high   = np.array([ranges[name][1] for name in self.names], dtype=np.float64)
+        self.n      = int(n)
+        self.method = method
+        self.seed   = np.random.SeedSequence(seed).entropy
+        self.fixed  = dict(fixed or {})
+        self.chunk_size = min(chunk_size, self.n)
+        d   = len(self.names)
+        rng = np.random.default_rng([self.seed, 0])
+
+        if method == 'lhs':
+            # Slice s of m points takes, in coarse stratum j of each dimension, the fine stratum
+            # j * t + perm[(s + offset[j]) % t]: every slice hits each coarse stratum once and the
+            # t slices together hit every fine stratum once
+            if self.n % self.chunk_size:
+                raise ValueError('A sliced Latin hypercube needs n (%d) to be a multiple of chunk_size (%d)'
+                                 % (self.n, self.chunk_size))
+            m, t = self.chunk_size, self.n // self.chunk_size
+            self.perm   = np.array([rng.permutation(t) for k in range(d)])
+            self.offset = rng.integers(0, t, size=(d, m))
+        elif method == 'halton':
+            # Enough digits in each base for the whole design, fixed so chunks agree
+            self.digits = []
+            for base in _PRIMES[:d]:
+                n_digits = int(np.ceil(np.log(self.n + 1) / np.log(base))) + 1
+                self.digits.append([rng.permutation(base) for position in range(n_digits)])
+        elif method == 'maximin':
+            self.points = maximin_lhs(self.n, d, rng, iterations)
+
+    def __len__(self):
+        return self.n
+
+    def _slice(self, s):
+        # Unit points of LHS slice s, each dimension shuffled within the slice
+        m, t = self.chunk_size, self.n // self.chunk_size
+        rng = np.random.default_rng([self.seed, 1, s])
+        u = np.empty((m, len(self.names)))
+        for k in range(len(self.names)):
+            fine = np.arange(m) * t + self.perm[k][(s + self.offset[k]) % t]
+            u[:, k] = (fine[rng.permutation(m)] + rng.random(m)) / self.n
+        return u
+
+    def unit(self, start, stop):
+        """Points start:stop in the unit cube, (stop - start, len(ranges))."""
+        if self.method == 'sobol':
+            from scipy.stats import qmc # only this method needs SciPy
+            engine = qmc.Sobol(len(self.names), scramble=True, seed=np.random.default_rng([self.seed, 2]))
+            if start:
+                engine.fast_forward(start)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning) # balance warning for non-power-of-2 counts
+                return engine.random(stop - start)
+        if self.method == 'halton':
+            return halton(start, stop, len(self.names), self.digits)
+        if self.method == 'maximin':
+            return self.points[start:stop]
+        m = self.chunk_size
+        slices = [self._slice(s) for s in range(start // m, (stop - 1) // m + 1)]
+        offset = (start // m) * m
+        return np.concatenate(slices)[start - offset:stop - offset]
+
+    def chunk(self, start, stop):
+        """Params of points start:stop, scaled to the ranges, plus the fixed values."""
+        u = self.unit(start, stop)
+        columns = dict(self.fixed)
+        for k, name in enumerate(self.names):
+            columns[name] = self.low[k] + u[:, k] * (self.high[k] - self.low[k])
+        return columns
+
+
+def evaluate_design(design, use_dcf=False, policy='nan', chunk_size=None):
+    """Evaluate a Design chunk by chunk, yielding (inputs, outputs) dicts per chunk.
+
+    chunk_size defaults to the design's own. Only one chunk of points and results is in memory at
+    a time; write the chunks out or fold them into statistics as they come.
+    """
+    chunk_size = chunk_size or design.chunk_size
+    for start in range(0, len(design), chunk_size):
+        inputs  = design.chunk(start, min(start + chunk_size, len(design)))
+        columns = dict(PARAM_DEFAULTS)
+        columns.update(inputs)
+        yield inputs, evaluate_batch(columns, use_dcf, policy)
@@ -0,0 +1,109 @@
+"""
+instrumentation.py
+
+Opt-in call counters, timers and latency histograms for component methods. Instrumentation
+wraps the methods of one component instance; when it is removed the class methods are used
+again directly, so a component that is not instrumented pays nothing.
+"""
+
+import json
+import math
+import time
+import numpy as np
+
+# Latency histogram: 10 log-spaced bins per decade from 100 ns to 100 s, plus under/overflow
+_BINS_PER_DECADE = 10
+_LOG_MIN         = -7
+_N_BINS          = 9 * _BINS_PER_DECADE + 2
+
+
+class CallStats(object):
+    """Count, cumulative/min/max wall time, latency histogram and unchanged-input count of one method."""
+
+    def __init__(self):
+        self.count     = 0
+        self.total     = 0.0
+        self.min       = math.inf
+        self.max       = 0.0
+        self.unchanged = 0
+        self.bins      = [0] * _N_BINS
+
+    def record(self, seconds, unchanged=False):
+        self.count += 1
+        self.total += seconds
+        self.min    = min(self.min, seconds)
+        self.max    = max(self.max, seconds)
+        self.unchanged += unchanged
+        b = int((math.log10(seconds) - _LOG_MIN) * _BINS_PER_DECADE) + 1 if seconds > 0.0 else 0
+        self.bins[min(max(b, 0), _N_BINS - 1)] += 1
+
+    def percentile(self, q):
+        # Upper edge of the histogram bin holding the q-th percentile (q in [0, 100]), clamped to max
+        if self.count == 0:
+            return math.nan
+        b = int(np.searchsorted(np.cumsum(self.bins), q / 100. * self.count))
+        return min(10.0 ** (_LOG_MIN + float(b) / _BINS_PER_DECADE), self.max)
+
+    def as_dict(self):
+        return {'count': self.count, 'total_s': self.total, 'mean_s': self.total / self.count if self.count else math.nan,
+                'min_s': self.min if self.count else math.nan, 'max_s': self.max,
+                'p50_s': self.percentile(50), 'p90_s': self.percentile(90), 'p99_s': self.percentile(99),
+                'unchanged_inputs': self.unchanged}
+
+
+class Instrumentation(object):
+    """Times methods of a component instance taking (params, unknowns, resids, ...).
+
+    keys are the params compared between consecutive calls of a method to count calls whose
+    inputs did not change.
+    """
+
+    def __init__(self, component, keys, methods=('solve_nonlinear', 'linearize')):
+        self.component = component
+        self.keys      = list(keys)
+        self.methods   = list(methods)
+        self.stats     = dict((name, CallStats()) for name in self.methods)
+        self._last     = dict((name, None) for name in self.methods)
+
+    def _wrap(self, name, method):
+        stats = self.stats[name]
+        def wrapper(params, *args, **kwargs):
+            inputs    = [np.array(params[k]) for k in self.keys]
+            last      = self._last[name]
+            unchanged = last is not None and all(np.array_equal(a, b) for a, b in zip(inputs, last))
+            self._last[name] = inputs
+            t0 = time.perf_counter()
+            try:
+                return method(params, *args, **kwargs)
+            finally:
+                stats.record(time.perf_counter() - t0, unchanged)
+        return wrapper
+
+    def install(self):
+        for name in self.methods:
+            setattr(self.component, name, self._wrap(name, getattr(self.component, name)))
+
+    def remove(self):
+        for name in self.methods:
+            self.component.__dict__.pop(name, None)
+
+    def reset(self):
+        for name in self.methods:
+            self.stats[name] = CallStats()
+            self._last[name] = None
+        self.remove()
+        self.install()
+
+    def as_dict(self):
+        return dict((name, stats.as_dict()) for name, stats in self.stats.items())
+
+    def dump(self, path=None):
+        # JSON to a file, or a readable table to stdout
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump(self.as_dict(), f, indent=1)
+            return
+        for name, s in sorted(self.as_dict().items()):
+            print('%-16s calls %8d  total %10.4f s  mean %10.3e s  p50 %10.3e s  p90 %10.3e s  p99 %10.3e s  unchanged %d'
+                  % (name, s['count'], s['total_s'], s['mean_s'], s['p50_s'], s['p90_s'], s['p99_s'],
+                     s['unchanged_inputs']))
@@ -0,0 +1,233 @@
+"""
+monte_carlo.py
+
+Monte Carlo propagation of input uncertainty through the PlantFinance cost equations.
+Samples are drawn and evaluated in fixed-size chunks with the batch kernels, and only
+streaming statistics are kept, so memory does not grow with the number of draws.
+"""
+
+from multiprocessing import Pool
+import math
+import numpy as np
+
+from plant_financese.cache import as_cache, evaluate_cached
+from plant_financese.core import evaluate_batch
+
+
+# Input distributions
+
+class Normal(object):
+    def __init__(self, mean, std):
+        self.mean = mean
+        self.std  = std
+
+    def sample(self, rng, size):
+        return rng.normal(self.mean, self.std, size)
+
+
+class LogNormal(object):
+    # mu and sigma are the mean and standard deviation of the underlying normal (log of the value)
+    def __init__(self, mu, sigma):
+        self.mu    = mu
+        self.sigma = sigma
+
+    def sample(self, rng, size):
+        return rng.lognormal(self.mu, self.sigma, size)
+
+
+class Triangular(object):
+    def __init__(self, left, mode, right):
+        self.left  = left
+        self.mode  = mode
+        self.right = right
+
+    def sample(self, rng, size):
+        return rng.triangular(self.left, self.mode, self.right, size)
+
+
+class Uniform(object):
+    def __init__(self, low, high):
+        self.low  = low
+        self.high = high
+
+    def sample(self, rng, size):
+        return rng.uniform(self.low, self.high, size)
+
+
+class Empirical(object):
+    # Resamples observed values with replacement, optionally weighted
+    def __init__(self, values, weights=None):
+        self.values  = np.asarray(values, dtype=np.float64)
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float64) / np.sum(weights)
+
+    def sample(self, rng, size):
+        return rng.choice(self.values, size=size, p=self.weights)
+
+
+# Streaming statistics
+
+class QuantileSketch(object):
+    """Mergeable quantile sketch with relative accuracy (log-spaced buckets, as in DDSketch).
+
+    Any quantile is returned within a relative error of `accuracy` of a true sample value, with a
+    number of buckets that only grows with the log of the range of the data.
+    """
+    def __init__(self, accuracy=1e-3):
+        self.accuracy  = accuracy
+        self.gamma     = (1. + accuracy) / (1. - accuracy)
+        self._lngamma  = math.log(self.gamma)
+        self.positive  = {}
+        self.negative  = {}
+        self.zeros     = 0
+        self.count     = 0
+
+    def _add(self, store, x):
+        keys, counts = np.unique(np.ceil(np.log(x) / self._lngamma).astype(np.int64), return_counts=True)
+        for k, c in zip(keys.tolist(), counts.tolist()):
+            store[k] = store.get(k, 0) + c
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float64).ravel()
+        self._add(self.positive, x[x > 0.0])
+        self._add(self.negative, -x[x < 0.0])
+        self.zeros += int(np.count_nonzero(x == 0.0))
+        self.count += x.size
+
+    def merge(self, other):
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for k, c in other_store.items():
+                store[k] = store.get(k, 0) + c
+        self.zeros += other.zeros
+        self.count += other.count
+
+    def quantile(self, q):
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        # Buckets in increasing value order: negatives (largest magnitude first), zero, positives
+        neg = sorted(self.negative.items(), key=lambda kc: -kc[0])
+        pos = sorted(self.positive.items())
+        values = ([-2. * self.gamma**k / (self.gamma + 1.) for k, c in neg] + [0.0] +
+                  [2. * self.gamma**k / (self.gamma + 1.) for k, c in pos])
+        counts = [c for k, c in neg] + [self.zeros] + [c for k, c in pos]
+        cum = np.cumsum(counts)
+        idx = np.searchsorted(cum, q * (self.count - 1), side='right')
+        out = np.asarray(values)[np.minimum(idx, len(values) - 1)]
+        return out if out.size > 1 else out[0]
+
+
+class StreamingStats(object):
+    """Running count, mean, variance, extrema and quantiles of a stream of chunks.
+
+    Chunks are folded in with the pairwise update of Chan et al., so partial results from
+    different workers can be merged exactly. NaN samples are counted and otherwise ignored.
+    """
+    def __init__(self, accuracy=1e-3):
+        self.count  = 0
+        self.mean   = 0.0
+        self.m2     = 0.0
+        self.min    = np.inf
+        self.max    = -np.inf
+        self.nan    = 0
+        self.sketch = QuantileSketch(accuracy)
+
+    def _combine(self, n, mean, m2):
+        total = self.count + n
+        if total == 0:
+            return
+        delta = mean - self.mean
+        self.mean  += delta * n / total
+        self.m2    += m2 + delta**2 * self.count * n / total
+        self.count  = total
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float64).ravel()
+        bad = np.isnan(x)
+        if bad.any():
+            self.nan += int(bad.sum())
+            x = x[~bad]
+        if x.size == 0:
+            return
+        mean = x.mean()
+        self._combine(x.size, mean, ((x - mean)**2).sum())
+        self.min = min(self.min, x.min())
+        self.max = max(self.max, x.max())
+        self.sketch.update(x)
+
+    def merge(self, other):
+        self._combine(other.count, other.mean, other.m2)
+        self.min  = min(self.min, other.min)
+        self.max  = max(self.max, other.max)
+        self.nan += other.nan
+        self.sketch.merge(other.sketch)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def summary(self):
+        p10, p50, p90 = self.quantile([0.1, 0.5, 0.9])
+        return {'count': self.count, 'mean': self.mean, 'std': self.std, 'min': self.min, 'max': self.max,
+                'p10': p10, 'p50': p50, 'p90': p90, 'nan': self.nan}
+
+
+# Driver
+
+def sample_inputs(inputs, rng, size):
+    # Draw one chunk: distributions are sampled, anything else is passed through as a fixed value
+    return dict((name, value.sample(rng, size) if hasattr(value, 'sample') else value)
+                for name, value in inputs.items())
+
+
+def _run_chunk(args):
+    inputs, seed, size, use_dcf, outputs, accuracy, cache = args
+    rng = np.random.default_rng(seed)
+    if cache is not None:
+        out = evaluate_cached(sample_inputs(inputs, rng, size), cache, use_dcf, policy='nan')
+    else:
+        out = evaluate_batch(sample_inputs(inputs, rng, size), use_dcf, policy='nan')
+    stats = {}
+    for name in outputs:
+        stats[name] = StreamingStats(accuracy)
+        stats[name].update(out[name])
+    return stats
+
+
+def run_monte_carlo(inputs, n_samples, chunk_size=100000, seed=None, use_dcf=False, outputs=('lcoe',),
+                    processes=None, accuracy=1e-3, cache=None):
+    """Propagate input distributions through the PlantFinance equations.
+
+    inputs maps PlantFinance param names to a distribution (anything with a sample(rng, size) method)
+    or a fixed value. Draws are made in chunks of chunk_size, each chunk with its own child seed of
+    `seed`, so results are reproducible and independent of the number of worker processes.
+    Returns a dict of StreamingStats keyed by output name (any key of batch_lcoe/batch_dcf).
+    Draws with invalid inputs (see plant_financese.validation) are counted as NaN in the statistics.
+    cache (a cache.ResultCache or the path of its file) reuses the results of draws seen before,
+    so rerunning a study with the same seed only reads the cache.
+    """
+    n_chunks = int(math.ceil(float(n_samples) / chunk_size))
+    seeds    = np.random.SeedSequence(seed).spawn(n_chunks)
+    sizes    = [min(chunk_size, n_samples - k * chunk_size) for k in range(n_chunks)]
+    cache    = as_cache(cache)
+    tasks    = [(inputs, seeds[k], sizes[k], use_dcf, outputs, accuracy, cache) for k in range(n_chunks)]
+
+    stats = dict((name, StreamingStats(accuracy)) for name in outputs)
+    if processes is None or processes == 1:
+        for chunk in map(_run_chunk, tasks):
+            for name in outputs:
+                stats[name].merge(chunk[name])
+    else:
+        pool = Pool(processes)
+        try:
+            for chunk in pool.imap(_run_chunk, tasks):
+                for name in outputs:
+                    stats[name].merge(chunk[name])
+        finally:
+            pool.close()
+            pool.join()
+    return stats
@@ -0,0 +1,93 @@
+"""
+offshore.py
+
+Depth-dependent offshore cost adjustment. Multipliers on the foundation, installation and O&M
+costs are tabulated against water depth and interpolated linearly; the foundation and installation
+multipliers act on their share of the balance of system costs, the O&M one on the annual opex.
+Onshore sites (sea_depth <= 0) are left unchanged. Interpolation is one vectorized pass over
+any array of depths, so a whole bathymetry raster is adjusted at once.
+"""
+
+import numpy as np
+
+MULTIPLIERS = ('foundation', 'installation', 'om')
+
+
+class OffshoreCostTable(object):
+    """Cost multipliers tabulated on increasing depths (m), linear in between and held beyond the ends.
+
+    foundation_share and installation_share are the fractions of turbine_bos_costs the foundation
+    and installation multipliers apply to.
+    """
+    def __init__(self, depths, foundation, installation, om, foundation_share=0.35, installation_share=0.25):
+        self.depths = np.asarray(depths, dtype=np.float64)
+        if self.depths.ndim != 1 or len(self.depths) < 2 or np.any(np.diff(self.depths) <= 0.0):
+            raise ValueError('depths must be at least two increasing values')
+        self.table = np.array([foundation, installation, om], dtype=np.float64)
+        if self.table.shape[1] != len(self.depths):
+            raise ValueError('Every multiplier needs one value per depth')
+        self.foundation_share   = foundation_share
+        self.installation_share = installation_share
+
+        # Segment slopes, and the grid step when the depths are evenly spaced (index by arithmetic,
+        # no search)
+        width       = np.diff(self.depths)
+        self.slopes = np.diff(self.table, axis=1) / width
+        self.step   = width[0] if np.allclose(width, width[0]) else None
+
+    def _segments(self, depth):
+        # Segment index and position of each depth, clamped to the table
+        d = np.clip(depth, self.depths[0], self.depths[-1])
+        if self.step is not None:
+            idx = ((d - self.depths[0]) / self.step).astype(np.intp)
+        else:
+            idx = np.searchsorted(self.depths, d, side='right') - 1
+        idx = np.minimum(idx, len(self.depths) - 2)
+        return idx, d - self.depths[idx]
+
+    def lookup(self, depth):
+        """Multipliers at each depth: foundation, installation, om, their combined bos multiplier,
+        and d_bos, d_om, the derivatives of bos and om with respect to depth (zero off the table).
+        """
+        depth = np.asarray(depth, dtype=np.float64)
+        idx, offset = self._segments(depth)
+        values  = self.table[:, idx] + self.slopes[:, idx] * offset
+        inside  = (depth > 0.0) & (depth >= self.depths[0]) & (depth <= self.depths[-1])
+        slopes  = np.where(inside, self.slopes[:, idx], 0.0)
+        values  = np.where(depth > 0.0, values, 1.0)
+
+        m = dict(zip(MULTIPLIERS, values))
+        fs, ins = self.foundation_share, self.installation_share
+        m['bos']   = 1. + fs * (m['foundation'] - 1.) + ins * (m['installation'] - 1.)
+        m['d_bos'] = fs * slopes[0] + ins * slopes[1]
+        m['d_om']  = slopes[2]
+        return m
+
+    def adjust(self, columns):
+        # Copy of a dict of PlantFinance params with the BoS costs and opex scaled for sea_depth
+        m = self.lookup(columns.get('sea_depth', 0.0))
+        columns = dict(columns)
+        columns['turbine_bos_costs']       = columns['turbine_bos_costs'] * m['bos']
+        columns['turbine_avg_annual_opex'] = columns['turbine_avg_annual_opex'] * m['om']
+        return columns
+
+    def chain_partials(self, J, columns):
+        """Turn partials keyed (output, param) taken at the adjusted costs into partials with respect
+        to the unadjusted params of columns, adding the sea_depth partials. Updates J in place."""
+        m = self.lookup(columns.get('sea_depth', 0.0))
+        for out in set(key[0] for key in J):
+            dbos  = J.get((out, 'turbine_bos_costs'), 0.0)
+            dopex = J.get((out, 'turbine_avg_annual_opex'), 0.0)
+            J[out, 'turbine_bos_costs']       = dbos * m['bos']
+            J[out, 'turbine_avg_annual_opex'] = dopex * m['om']
+            J[out, 'sea_depth'] = dbos * columns['turbine_bos_costs'] * m['d_bos'] + \
+                                  dopex * columns['turbine_avg_annual_opex'] * m['d_om']
+        return J
+
+
+# Generic fixed-bottom to floating trend, for screening studies; project work should supply its own tables
+DEFAULT_OFFSHORE_COSTS = OffshoreCostTable(
+    depths       = [0.0,  10.0, 20.0, 30.0, 40.0, 50.0, 60.0, 70.0, 80.0, 90.0, 100.0],
+    foundation   = [1.00, 1.00, 1.08, 1.18, 1.30, 1.45, 1.60, 1.78, 1.95, 2.12, 2.30],
+    installation = [1.00, 1.00, 1.05, 1.11, 1.18, 1.26, 1.35, 1.45, 1.55, 1.65, 1.75],
+    om           = [1.00, 1.00, 1.02, 1.04, 1.06, 1.08, 1.10, 1.12, 1.14, 1.16, 1.18])
@@ -1,8 +1,25 @@
 from openmdao.api import Component
 import numpy as np
 
+from plant_financese.core import (batch_partials, jvp_partials, vjp_partials, lcoe_cost_weights, turbine_lcoe,
+                                  evaluate_batch, factor_cache, TERMS, DCF_TERMS, IncrementalTerms,
+                                  PARAM_DEFAULTS, PARAM_UNITS)
+# Compatibility re-export: the equations moved to the NumPy-only core module, these names are kept
+# importable from here for existing code and are not used in this module
+from plant_financese.core import (
+    net_park_rating, net_energy_capture, initial_capital_cost, opex_per_kw, fcr_lcoe, unlevelized_coe,
+    plant_aep, plant_capex, plant_opex, lcoe_terms,
+    coe_partials, lcoe_partials, batch_lcoe_partials, batch_lcoe,
+    dcf_weights, dcf_cash_flows, FACTOR_NAMES, finance_factors, FactorCache, dcf_lcoe, dcf_partials, batch_dcf,
+    batch_jvp, batch_vjp, turbine_lcoe_gradient)
+from plant_financese.validation import validate_inputs, check_status, apply_policy, POLICIES, OK
+from plant_financese.report import FinanceReport, ReportCollector
+from plant_financese.instrumentation import Instrumentation
+
+
 class PlantFinance(Component):
-    def __init__(self, verbosity = False):
+    def __init__(self, verbosity = False, use_dcf = False, policy = 'raise', trusted_inputs = False,
+                 report_every = None, incremental = True, offshore_costs = None, max_reports = 1000):
         super(PlantFinance, self).__init__()
 
         self.amortFactor = None
@@ -31,7 +48,35 @@ class PlantFinance(Component):
         self.add_output('coe',              val=0.0, units='USD/kW',desc='Cost of energy for the wind plant - unlevelized')
 
         
+        # Structured reports of the evaluations, kept every report_every calls (every call with verbosity)
+        # in self.reports and exported in bulk with self.reports.to_json/to_csv. print() a report for text.
+        # Only the last max_reports are kept (all of them with None).
         self.verbosity = verbosity
+        self.reports = ReportCollector(1 if verbosity and not report_every else report_every, max_reports)
+        self.n_calls = 0
+        self.instrumentation = None
+        # Levelize with the year-by-year discounted cash flow instead of the fixed charge rate
+        self.use_dcf = use_dcf
+        # Input checks: policy for invalid inputs ('raise', or 'nan' for NaN outputs; 'mask' needs
+        # arrays and is refused), trusted_inputs skips the checks entirely. The offshore-adjusted
+        # inputs are checked, as in linearize and evaluate_batch. status holds the bit mask of the last check.
+        if policy not in POLICIES:
+            raise ValueError('Unknown validation policy %r, use one of %s' % (policy, ', '.join(POLICIES)))
+        if policy == 'mask':
+            raise ValueError("The 'mask' policy needs masked arrays, use 'nan' or 'raise'")
+        self.policy = policy
+        self.trusted_inputs = trusted_inputs
+        self.status = OK
+        # Intermediates are cached between calls and only those depending on changed inputs are
+        # recomputed; with incremental=False every call evaluates all of them
+        self.incremental = incremental
+        self.terms = IncrementalTerms(TERMS + DCF_TERMS if use_dcf else TERMS, PARAM_DEFAULTS.keys(),
+                                      'lcoe_dcf' if use_dcf else 'lcoe_fcr')
+        # Depth-dependent offshore multipliers on the BoS costs and opex, e.g.
+        # plant_financese.offshore.DEFAULT_OFFSHORE_COSTS; None leaves the costs as given
+        self.offshore_costs = offshore_costs
+        # Partials of the last linearize, multiplied out in apply_linear
+        self.partials = {}
         
     
     def solve_nonlinear(self, params, unknowns, resids):
@@ -50,115 +95,287 @@ class PlantFinance(Component):
         t_construct = params['construction_time']
         t_project   = params['project_lifetime']
         t_rating    = params['machine_rating']
-        npr         = params['turbine_number'] * params['machine_rating'] # net park rating, used in net energy capture calculation below
-        nec         = params['turbine_aep'] * params['turbine_number'] / (npr * 1.e003) # net energy rating, per COE report
-        
-        # Handy offshore boolean flag
-        offshore = (depth > 0.0)
-        
-        # Run a few checks on the inputs
-        if n_turbine == 0:
-            exit('ERROR: The number of the turbines in the plant is not initialized correctly and it is currently equal to 0. Check the connections to Plant_FinanceSE')
-        
-        if c_turbine == 0:
-            exit('ERROR: The cost of the turbines in the plant is not initialized correctly and it is currently equal to 0 USD. Check the connections to Plant_FinanceSE')
-            
-        if c_bos_turbine == 0:
-            print('WARNING: The BoS costs of the turbine are not initialized correctly and they are currently equal to 0 USD. Check the connections to Plant_FinanceSE')
-        
-        if c_opex_turbine == 0:
-            print('WARNING: The Opex costs of the turbine are not initialized correctly and they are currently equal to 0 USD. Check the connections to Plant_FinanceSE')
-        
-        if park_aep == 0:
-            if turb_aep != 0:
-                park_aep = n_turbine * turb_aep * (1. - wlf)
-            else:
-                exit('ERROR: AEP is not connected properly. Both turbine_aep and park_aep are currently equal to 0 Wh. Check the connections to Plant_FinanceSE')
+        self.n_calls += 1
         
-        
-        icc     = (c_turbine + c_bos_turbine) / (t_rating * 1.e003) #$/kW, changed per COE report
-        c_opex  = (c_opex_turbine) / (t_rating * 1.e003)  # $/kW, changed per COE report
-      
-        #compute COE and LCOE values
-        unknowns['lcoe'] = ((icc * fcr + c_opex) / nec) # changed per COE report
-
-        if self.verbosity == True:
-            print('################################################')
-            print('Computation of CoE and LCoE from Plant_FinanceSE')
-            print('Inputs:')
-            print('Water depth                      %.2f m'          % depth)
-            print('Number of turbines in the park   %u'              % n_turbine)
-            print('Cost of the single turbine       %.3f M USD'      % (c_turbine * 1.e-006))  
-            print('BoS costs of the single turbine  %.3f M USD'      % (c_bos_turbine * 1.e-006))  
-            print('Initial capital cost of the park %.3f M USD'      % (icc * 1.e-006))  
-            print('Opex costs of the single turbine %.3f M USD'      % (c_opex_turbine * 1.e-006))
-            print('Opex costs of the park           %.3f M USD'      % (c_opex * 1.e-006))              
-            print('Fixed charge rate                %.2f %%'         % (fcr * 100.))     
-            print('Tax rate                         %.2f %%'         % (tax * 100.))        
-            print('Discount rate                    %.2f %%'         % (r * 100.))        
-            print('Wake loss factor                 %.2f %%'         % (wlf * 100.))         
-            print('AEP of the single turbine        %.3f GWh'        % (turb_aep * 1.e-006))    
-            print('AEP of the wind plant            %.3f GWh'        % (park_aep * 1.e-006))   
-            print('Construction time                %.2f yr'         % t_construct)
-            print('Project lifetime                 %.2f yr'         % t_project)
-            print('Capital costs                    %.2f $/kW'       % icc) #added
-            print('NEC                              %.2f MWh/MW/yr'  % nec) #added
-            print('Outputs:')
-            print('LCoE                             %.3f USD/MW'     % (unknowns['lcoe']  * 1.e003)) #removed "coe", best to have only one metric for cost
-            print('################################################')
-            
-                    
+        # The equations see the BoS costs and opex adjusted for the sea depth
+        inputs = params
+        if self.offshore_costs is not None:
+            inputs = self.offshore_costs.adjust(dict((name, params[name]) for name in PARAM_DEFAULTS))
+
+        # Skip the whole evaluation when no input changed since the last one, otherwise only
+        # recompute the intermediates downstream of the inputs that changed
+        changed = self.terms.changed(inputs) if self.incremental else None
+        if changed is not None and not changed:
+            unknowns['coe']  = self.terms.values['coe']
+            unknowns['lcoe'] = self.terms.values[self.terms.output]
+            self.status      = self.terms.values['status']
+        else:
+            # Run a few checks on the inputs
+            if not self.trusted_inputs:
+                self.status = validate_inputs(inputs['turbine_cost'], n_turbine, inputs['turbine_bos_costs'],
+                                              inputs['turbine_avg_annual_opex'], turb_aep, t_rating)
+                if self.status and check_status(self.status, self.policy):
+                    unknowns['coe']  = np.nan
+                    unknowns['lcoe'] = np.nan
+                    return
+
+            #compute COE and LCOE values
+            values = self.terms.update(inputs, changed)
+            values['status'] = self.status # restored with the cached outputs
+            unknowns['coe']  = values['coe']
+            unknowns['lcoe'] = values[self.terms.output]
+            if self.use_dcf:
+                self.amortFactor = factor_cache.get(r, t_construct, t_project)[0]
+
+        if self.reports.every and self.reports.want(self.n_calls):
+            self.reports.add(FinanceReport(params, unknowns, self.use_dcf, self.n_calls, self.offshore_costs))
+
+    def enable_instrumentation(self):
+        # Time solve_nonlinear and linearize from now on, see plant_financese.instrumentation
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation(self, PARAM_DEFAULTS.keys())
+            self.instrumentation.install()
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        # Back to the plain methods, the collected statistics are returned
+        instrumentation, self.instrumentation = self.instrumentation, None
+        if instrumentation is not None:
+            instrumentation.remove()
+        return instrumentation
+
+    def report(self):
+        # Report of the current (e.g. final) state of the component, built on request
+        return FinanceReport(self.params, self.unknowns, self.use_dcf, self.n_calls, self.offshore_costs)
 
     def linearize(self, params, unknowns, resids):
-        # Unpack parameters
-        depth       = params['sea_depth']
-        n_turbine   = params['turbine_number']
-        fcr         = params['fixed_charge_rate']
-        tax         = params['tax_rate']
-        r           = params['discount_rate']
-        wlf         = params['wake_loss_factor']
-        turb_aep    = params['turbine_aep']
-        park_aep    = params['park_aep']
-        t_construct = params['construction_time']
-        t_project   = params['project_lifetime']
+        # The partials of batch_partials for this one scenario; with offshore costs they are taken at
+        # the adjusted costs and chained back to the given ones
+        given  = dict((name, params[name]) for name in PARAM_DEFAULTS)
+        inputs = given if self.offshore_costs is None else self.offshore_costs.adjust(given)
 
-        # Handy offshore boolean flag
-        offshore = (depth > 0.0)
-        
         # Run a few checks on the inputs
-        if n_turbine == 0:
-            exit('ERROR: The number of the turbines in the plant is not initialized correctly and it is currently equal to 0. Check the connections to Plant_FinanceSE')
-        
-        if park_aep == 0:
-            if turb_aep != 0:
-                park_aep = n_turbine * turb_aep * (1. - wlf)
+        invalid = False
+        if not self.trusted_inputs:
+            status  = validate_inputs(**inputs)
+            invalid = bool(status) and check_status(status, self.policy, warn=False)
+
+        # Only the structurally non-zero partials are returned, missing keys are zero to OpenMDAO.
+        # Invalid inputs get NaN partials, only the key layout is computed and the errors are silenced
+        with np.errstate(all='ignore' if invalid else None):
+            J = batch_partials(use_dcf=self.use_dcf, **inputs)
+            if self.offshore_costs is not None:
+                J = self.offshore_costs.chain_partials(J, given)
+
+        if invalid:
+            for key in J:
+                J[key] = np.nan
+
+        self.partials = J = dict((key, float(d)) for key, d in J.items())
+        return J
+
+    def apply_linear(self, params, unknowns, dparams, dunknowns, dresids, mode):
+        # Matrix-free products with the partials of linearize, shared with the batch VJP/JVP
+        if mode == 'fwd':
+            for out, d in jvp_partials(self.partials, dparams).items():
+                dresids[out] += d
+        else:
+            for name, d in vjp_partials(self.partials, dresids).items():
+                if name in dparams:
+                    dparams[name] += d
+
+
+class PlantFinanceMulti(Component):
+    """PlantFinance over n_plants plants in one component: every param and output is a length-n_plants array.
+
+    Plant i only depends on element i of each param, so every partial is diagonal. linearize keeps
+    the diagonals as vectors (see batch_partials) and apply_linear multiplies element-wise, the
+    dense n_plants x n_plants Jacobians are never formed.
+    """
+    def __init__(self, n_plants, use_dcf = False, policy = 'raise', trusted_inputs = False, offshore_costs = None):
+        super(PlantFinanceMulti, self).__init__()
+
+        self.n_plants = n_plants
+
+        # Inputs, same names, defaults and units as PlantFinance; turbine_number is a float array here
+        for name, default in PARAM_DEFAULTS.items():
+            units = PARAM_UNITS.get(name)
+            kwargs = {'units': units} if units else {}
+            self.add_param(name, val=np.full(n_plants, float(default)), **kwargs)
+
+        #Outputs
+        self.add_output('lcoe', val=np.zeros(n_plants), units='USD/kW', desc='Levelized cost of energy of each wind plant')
+        self.add_output('coe',  val=np.zeros(n_plants), units='USD/kW', desc='Cost of energy of each wind plant - unlevelized')
+
+        self.use_dcf = use_dcf
+        # Input checks as in PlantFinance, invalid plants get NaN outputs and partials unless policy is 'raise'
+        if policy not in POLICIES:
+            raise ValueError('Unknown validation policy %r, use one of %s' % (policy, ', '.join(POLICIES)))
+        self.policy = policy
+        self.trusted_inputs = trusted_inputs
+        self.status = np.zeros(n_plants, dtype=int)
+        self.offshore_costs = offshore_costs
+        self.partials = {}
+
+    def solve_nonlinear(self, params, unknowns, resids):
+        columns = dict((name, params[name]) for name in PARAM_DEFAULTS)
+        out = evaluate_batch(columns, self.use_dcf, 'nan' if self.policy == 'mask' else self.policy,
+                             self.trusted_inputs, self.offshore_costs)
+        if not self.trusted_inputs:
+            self.status = out['status']
+        unknowns['lcoe'] = out['lcoe']
+        unknowns['coe']  = out['coe']
+
+    def linearize(self, params, unknowns, resids):
+        # Diagonals only, applied in apply_linear; nothing is returned for OpenMDAO to cache
+        columns = dict((name, params[name]) for name in PARAM_DEFAULTS)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.offshore_costs is None:
+                partials = batch_partials(use_dcf=self.use_dcf, **columns)
             else:
-                exit('ERROR: AEP is not connected properly. Both turbine_aep and park_aep are currently equal to 0 Wh. Check the connections to Plant_FinanceSE')
-        
-        
-        dicc_dcturb = n_turbine
-        dicc_dcbos  = 1.0
-        if offshore:
-            dicc_dcturb = n_turbine * (1.0 + 0.15 / 1.10)
-            
-        dcoe_dcturb = dicc_dcturb * fcr / park_aep
-        dcoe_dcbos  = dicc_dcbos  * fcr / park_aep
-        dcoe_dopex  = (1. - tax)        / park_aep
-        dcoe_daep   = -unknowns['coe']  / park_aep
-
-        dlcoe_dcturb = dicc_dcturb * self.amortFactor / park_aep
-        dlcoe_dcbos  = dicc_dcbos  * self.amortFactor / park_aep
-        dlcoe_dopex  = 1.0                            / park_aep
-        dlcoe_daep   = -unknowns['lcoe']              / park_aep
-
-        J = {}
-        J['coe' , 'turbine_cost'   ] = dcoe_dcturb
-        J['coe' , 'bos_cost'       ] = dcoe_dcbos
-        J['coe' , 'avg_annual_opex'] = dcoe_dopex
-        J['coe' , 'net_aep'        ] = dcoe_daep
-        J['lcoe', 'turbine_cost'   ] = dlcoe_dcturb
-        J['lcoe', 'bos_cost'       ] = dlcoe_dcbos
-        J['lcoe', 'avg_annual_opex'] = dlcoe_dopex
-        J['lcoe', 'net_aep'        ] = dlcoe_daep
-        
-        return J      
+                partials = self.offshore_costs.chain_partials(
+                    batch_partials(use_dcf=self.use_dcf, **self.offshore_costs.adjust(columns)), columns)
+        if not self.trusted_inputs:
+            errors = check_status(validate_inputs(**columns), self.policy, warn=False)
+            if errors.any():
+                for key in partials:
+                    partials[key] = np.where(errors, np.nan, partials[key])
+        self.partials = partials
+
+    def apply_linear(self, params, unknowns, dparams, dunknowns, dresids, mode):
+        if mode == 'fwd':
+            for out, d in jvp_partials(self.partials, dparams).items():
+                dresids[out] += d
+        else:
+            for name, d in vjp_partials(self.partials, dresids).items():
+                if name in dparams:
+                    dparams[name] += d
+
+
+class PlantFinanceTurbines(Component):
+    """PlantFinance of one plant given turbine by turbine, for layout and sizing optimization.
+
+    The AEP, wake loss and costs are length-n_turbines arrays (see core.turbine_lcoe). Besides the
+    plant lcoe, coe and waked park_aep it outputs each turbine's lcoe_contribution and own
+    turbine_lcoe. Every output depends on the turbines only through their own values and the plant
+    AEP, so apply_linear works with vectors and sums instead of n_turbines x n_turbines Jacobians.
+    """
+    TURBINE_PARAMS = ('turbine_aep', 'wake_loss_factor', 'turbine_cost', 'turbine_bos_costs', 'turbine_avg_annual_opex')
+    PLANT_PARAMS   = ('fixed_charge_rate', 'tax_rate', 'discount_rate', 'construction_time', 'project_lifetime')
+
+    def __init__(self, n_turbines, use_dcf = False, policy = 'raise', trusted_inputs = False):
+        super(PlantFinanceTurbines, self).__init__()
+
+        self.n_turbines = n_turbines
+        self.use_dcf = use_dcf
+        # Input checks as in PlantFinance, turbine by turbine: status holds the bit mask of each turbine.
+        # Under 'nan' an invalid turbine gets NaN turbine outputs, makes the plant outputs and all the
+        # partials NaN; 'mask' is refused as the plant outputs are scalars
+        if policy not in POLICIES:
+            raise ValueError('Unknown validation policy %r, use one of %s' % (policy, ', '.join(POLICIES)))
+        if policy == 'mask':
+            raise ValueError("The 'mask' policy needs masked arrays, use 'nan' or 'raise'")
+        self.policy = policy
+        self.trusted_inputs = trusted_inputs
+        self.status = np.zeros(n_turbines, dtype=int)
+        self.errors = np.zeros(n_turbines, dtype=bool)
+
+        # Inputs, per turbine then per plant
+        for name in self.TURBINE_PARAMS + self.PLANT_PARAMS:
+            units = PARAM_UNITS.get(name)
+            kwargs = {'units': units} if units else {}
+            val = np.zeros(n_turbines) if name in self.TURBINE_PARAMS else PARAM_DEFAULTS[name]
+            self.add_param(name, val=val, **kwargs)
+
+        #Outputs
+        self.add_output('lcoe',              val=0.0, units='USD/kW', desc='Levelized cost of energy for the wind plant')
+        self.add_output('coe',               val=0.0, units='USD/kW', desc='Cost of energy for the wind plant - unlevelized')
+        self.add_output('park_aep',          val=0.0, units='kW*h',   desc='Annual Energy Production of the wind plant, after wake losses')
+        self.add_output('lcoe_contribution', val=np.zeros(n_turbines), units='USD/kW', desc='Share of each turbine in lcoe')
+        self.add_output('turbine_lcoe',      val=np.zeros(n_turbines), units='USD/kW', desc='Levelized cost of energy of each turbine')
+
+        self.terms = None
+
+    def _check(self, params, warn):
+        # Per-turbine checks; a turbine is a one-turbine plant, the rating is not an input here
+        if self.trusted_inputs:
+            return self.errors
+        self.status = validate_inputs(params['turbine_cost'], 1, params['turbine_bos_costs'],
+                                      params['turbine_avg_annual_opex'], params['turbine_aep'], 1.0)
+        self.errors = check_status(self.status, self.policy, warn)
+        return self.errors
+
+    def _evaluate(self, params):
+        with np.errstate(all='ignore' if self.errors.any() else None):
+            return turbine_lcoe(*[params[name] for name in self.TURBINE_PARAMS + self.PLANT_PARAMS],
+                                use_dcf=self.use_dcf)
+
+    def solve_nonlinear(self, params, unknowns, resids):
+        errors = self._check(params, warn=True)
+        out = self._evaluate(params)
+        if errors.any():
+            apply_policy(out, errors, 'nan', ('lcoe_contribution', 'turbine_lcoe'))
+            out['lcoe'] = out['coe'] = np.nan
+        for name in ('lcoe', 'coe', 'park_aep', 'lcoe_contribution', 'turbine_lcoe'):
+            unknowns[name] = out[name]
+
+    def linearize(self, params, unknowns, resids):
+        # Keep the terms for apply_linear, nothing is returned for OpenMDAO to cache.
+        # Invalid turbines couple into every plant output, so all the products are NaN then
+        self._check(params, warn=False)
+        self.terms = self._evaluate(params)
+        self.terms['dk'] = lcoe_cost_weights(*[params[name] for name in self.PLANT_PARAMS], use_dcf=self.use_dcf)[2]
+        self.terms.update((name, params[name]) for name in ('turbine_aep', 'wake_loss_factor', 'fixed_charge_rate', 'tax_rate'))
+
+    def apply_linear(self, params, unknowns, dparams, dunknowns, dresids, mode):
+        if self.errors.any():
+            products = dresids if mode == 'fwd' else dparams
+            for name in products.keys():
+                products[name] += np.nan
+            return
+        t = self.terms
+        E, energy, capex, opex = t['park_aep'], t['energy'], t['capex'], t['opex']
+        k_capex, k_opex = t['k_capex'][0], t['k_opex'][0]
+
+        if mode == 'fwd':
+            dp = lambda name: dparams[name] if name in dparams else 0.0
+            dcapex  = dp('turbine_cost') + dp('turbine_bos_costs')
+            dopex   = dp('turbine_avg_annual_opex')
+            denergy = (1. - t['wake_loss_factor']) * dp('turbine_aep') - t['turbine_aep'] * dp('wake_loss_factor')
+            dE      = np.sum(denergy)
+            dcost   = k_capex * dcapex + k_opex * dopex
+            for name, (dk_capex, dk_opex) in t['dk'].items():
+                dcost = dcost + dp(name) * (dk_capex * capex + dk_opex * opex)
+            dcoe = np.sum(t['fixed_charge_rate'] * dcapex + (1. - t['tax_rate']) * dopex) \
+                   + dp('fixed_charge_rate') * np.sum(capex) - dp('tax_rate') * np.sum(opex)
+
+            dresids['lcoe']              += (np.sum(dcost) - t['lcoe'] * dE) / E
+            dresids['coe']               += (dcoe - t['coe'] * dE) / E
+            dresids['park_aep']          += dE
+            dresids['lcoe_contribution'] += (dcost - t['lcoe_contribution'] * dE) / E
+            dresids['turbine_lcoe']      += (dcost - t['turbine_lcoe'] * denergy) / energy
+        else:
+            a_lcoe, a_coe = dresids['lcoe'], dresids['coe']
+            a_contribution, a_turbine = dresids['lcoe_contribution'], dresids['turbine_lcoe']
+            bcost   = (a_lcoe + a_contribution) / E + a_turbine / energy
+            bE      = dresids['park_aep'] - (a_lcoe * t['lcoe'] + np.sum(a_contribution * t['lcoe_contribution'])
+                                             + a_coe * t['coe']) / E
+            benergy = bE - a_turbine * t['turbine_lcoe'] / energy
+            bcoe    = a_coe / E
+            bcapex  = k_capex * bcost + t['fixed_charge_rate'] * bcoe
+            bopex   = k_opex * bcost + (1. - t['tax_rate']) * bcoe
+
+            b = dict((name, 0.0) for name in self.TURBINE_PARAMS + self.PLANT_PARAMS)
+            b['turbine_cost']            = bcapex
+            b['turbine_bos_costs']       = bcapex
+            b['turbine_avg_annual_opex'] = bopex
+            b['turbine_aep']             = benergy * (1. - t['wake_loss_factor'])
+            b['wake_loss_factor']        = -benergy * t['turbine_aep']
+            b['fixed_charge_rate']       = bcoe * np.sum(capex)
+            b['tax_rate']                = -bcoe * np.sum(opex)
+            for name, (dk_capex, dk_opex) in t['dk'].items():
+                b[name] = b[name] + dk_capex * np.sum(capex * bcost) + dk_opex * np.sum(opex * bcost)
+            for name, value in b.items():
+                if name in dparams:
+                    dparams[name] += value
+
@@ -0,0 +1,186 @@
+"""
+portfolio.py
+
+Capacity allocation over many candidate sites: how many turbines of which rating to build at each
+site so that the fleet LCOE is lowest, within a capex budget and for a minimum installed capacity.
+
+Both LCOE definitions are linear in the capex and opex (see core.lcoe_cost_weights), so the fleet
+LCOE is sum(n * cost) / sum(n * energy) over the per-turbine annual cost and energy of the
+candidates; by default the energy is the one batch_lcoe/batch_dcf and PlantFinance use, so a
+single candidate gets the same LCOE here as there. The continuous relaxation of this linear-fractional program is solved exactly by
+Dinkelbach's method, each step one LP over the gradient of the fleet LCOE; integer turbine counts
+and one rating per site are recovered by best-first branch-and-bound on those relaxations.
+Needs SciPy 1.6 or later for the HiGHS LP solver (pip install plant_financese[scipy]).
+"""
+
+import heapq
+import numpy as np
+from scipy.optimize import linprog
+from scipy.sparse import csr_matrix, vstack
+
+from plant_financese.core import lcoe_cost_weights, PARAM_DEFAULTS
+
+# Annual energy of a candidate: as the batch kernels (the unwaked turbine_aep with the fixed charge
+# rate, the waked AEP with the cash flow), or waked or gross in both finance modes
+ENERGY = ('batch', 'waked', 'gross')
+
+
+def candidate_terms(candidates, use_dcf=False, energy='batch'):
+    """Per-turbine annual cost (in LCOE x energy units), energy, capex and rating of each candidate.
+
+    candidates maps PlantFinance params to one value per (site, rating) candidate; energy is one of
+    ENERGY.
+    """
+    if energy not in ENERGY:
+        raise ValueError('Unknown energy %r, use one of %s' % (energy, ', '.join(ENERGY)))
+    waked = energy == 'waked' or (energy == 'batch' and use_dcf)
+    c = dict(PARAM_DEFAULTS)
+    c.update(candidates)
+    k_capex, k_opex = lcoe_cost_weights(c['fixed_charge_rate'], c['tax_rate'], c['discount_rate'],
+                                        c['construction_time'], c['project_lifetime'], use_dcf)[:2]
+    capex  = np.asarray(c['turbine_cost'], dtype=np.float64) + np.asarray(c['turbine_bos_costs'], dtype=np.float64)
+    cost   = k_capex * capex + k_opex * np.asarray(c['turbine_avg_annual_opex'], dtype=np.float64)
+    energy = np.asarray(c['turbine_aep'], dtype=np.float64)
+    if waked:
+        energy = energy * (1. - np.asarray(c['wake_loss_factor'], dtype=np.float64))
+    cost, energy, capex, rating = np.broadcast_arrays(cost, energy, capex,
+                                                      np.asarray(c['machine_rating'], dtype=np.float64))
+    return cost, energy, capex, rating
+
+
+def fleet_lcoe(turbine_number, cost, energy):
+    """Fleet LCOE of turbine counts and its gradient with respect to them."""
+    n = np.asarray(turbine_number, dtype=np.float64)
+    E = np.dot(n, energy)
+    lcoe = np.dot(n, cost) / E
+    return lcoe, (cost - lcoe * energy) / E
+
+
+def _relaxed(cost, energy, A, b, lower, upper, tol):
+    # Dinkelbach: minimize sum((cost - lam * energy) * n) and move lam to the ratio at the solution
+    # until that minimum reaches zero. Returns (lcoe, n) or None when the node is infeasible.
+    bounds = np.column_stack([lower, upper])
+    res = linprog(cost, A_ub=A, b_ub=b, bounds=bounds, method='highs')
+    if res.status != 0:
+        return None
+    n = res.x
+    lam = np.dot(cost, n) / np.dot(energy, n)
+    for it in range(50):
+        res = linprog(cost - lam * energy, A_ub=A, b_ub=b, bounds=bounds, method='highs')
+        n_new = res.x
+        if res.fun >= -tol * lam * np.dot(energy, n_new):
+            break
+        n   = n_new
+        lam = np.dot(cost, n) / np.dot(energy, n)
+    return lam, n
+
+
+def _round(n, site, cost, energy, capex, rating, budget, min_capacity, max_turbines, lam):
+    # Integer allocation near a relaxed one: the largest candidate of each site, floored, then the
+    # turbines with the best marginal effect on the fleet LCOE added until the capacity is met
+    m = np.zeros(len(n))
+    order = np.lexsort((-n, site))
+    first = np.r_[True, site[order][1:] != site[order][:-1]]
+    keep  = order[first]
+    m[keep] = np.floor(n[keep] + 1e-9)
+    for j in keep[np.argsort((cost - lam * energy)[keep])]:
+        while np.dot(m, rating) < min_capacity - 1e-9 and m[j] < max_turbines[j] and \
+                np.dot(m, capex) + capex[j] <= budget * (1. + 1e-12):
+            m[j] += 1
+    if np.dot(m, rating) < min_capacity - 1e-9 or not m.any():
+        return None
+    return m
+
+
+def allocate_portfolio(candidates, site, budget, min_capacity, max_turbines, use_dcf=False, gap=1e-4,
+                       max_nodes=10000, tol=1e-10, energy='batch'):
+    """Turbine counts minimizing the fleet LCOE, at most one rating per site.
+
+    candidates maps PlantFinance params to one value per (site, rating) candidate (machine_rating,
+    turbine_cost, turbine_bos_costs, turbine_avg_annual_opex, turbine_aep, wake_loss_factor and
+    optionally the rates), site gives the site of each candidate and max_turbines the most turbines
+    each candidate can take. The total capex must stay within budget and the installed capacity
+    (MW) reach min_capacity. Branch-and-bound stops when the incumbent is within the relative gap
+    of the lower bound or after max_nodes relaxations. energy picks the annual energy of the LCOE,
+    see ENERGY.
+
+    Returns a dict with turbine_number (per candidate), lcoe, capex, capacity, energy, bound (the
+    best lower bound on the fleet LCOE), gap, nodes and status ('optimal', 'node_limit' or
+    'infeasible').
+    """
+    if min_capacity <= 0:
+        raise ValueError('min_capacity must be positive, the lowest fleet LCOE is otherwise a single turbine')
+    cost, energy, capex, rating = candidate_terms(candidates, use_dcf, energy)
+    site = np.asarray(site)
+    n_cand = len(cost)
+    max_turbines = np.broadcast_to(np.asarray(max_turbines, dtype=np.float64), (n_cand,))
+
+    # Budget, capacity, and per site sum(n / max_turbines) <= 1, the relaxation of one rating per site
+    sites, site_index = np.unique(site, return_inverse=True)
+    per_site = csr_matrix((1. / np.maximum(max_turbines, 1.), (site_index, np.arange(n_cand))),
+                          shape=(len(sites), n_cand))
+    A = vstack([csr_matrix(capex[np.newaxis]), csr_matrix(-rating[np.newaxis]), per_site]).tocsr()
+    b = np.r_[budget, -min_capacity, np.ones(len(sites))]
+
+    best, best_lcoe = None, np.inf
+    heap, nodes, counter = [], 0, 0
+    pruned = np.inf # lowest bound of the nodes dropped as within the gap
+    root = _relaxed(cost, energy, A, b, np.zeros(n_cand), max_turbines.copy(), tol)
+    if root is not None:
+        heap.append((root[0], counter, np.zeros(n_cand), max_turbines.copy(), root[1]))
+
+    while heap and nodes < max_nodes:
+        node = heapq.heappop(heap)
+        bound, _, lower, upper, n = node
+        if bound >= best_lcoe * (1. - gap):
+            heapq.heappush(heap, node) # every open node is within the gap
+            break
+        nodes += 1
+
+        m = _round(n, site, cost, energy, capex, rating, budget, min_capacity, max_turbines, bound)
+        if m is not None and np.dot(m, cost) / np.dot(m, energy) < best_lcoe:
+            best, best_lcoe = m, np.dot(m, cost) / np.dot(m, energy)
+
+        # Branch on a site using several ratings first, then on a fractional turbine count
+        counts = np.bincount(site_index[n > 1e-9], minlength=len(sites))
+        children = []
+        if (counts > 1).any():
+            at_site = site_index == np.flatnonzero(counts > 1)[0]
+            j  = np.flatnonzero(at_site)[np.argmax(n[at_site])]
+            up = upper.copy()
+            up[at_site & (np.arange(n_cand) != j)] = 0.0
+            children.append((lower, up))
+            up = upper.copy()
+            up[j] = 0.0
+            children.append((lower, up))
+        else:
+            frac = np.abs(n - np.round(n))
+            if frac.max() <= 1e-6:
+                continue # the relaxation is integer, so it is the rounded allocation above
+            j  = np.argmax(frac)
+            up = upper.copy()
+            up[j] = np.floor(n[j])
+            children.append((lower, up))
+            lo = lower.copy()
+            lo[j] = np.ceil(n[j])
+            children.append((lo, upper))
+
+        for lo, up in children:
+            child = _relaxed(cost, energy, A, b, lo, up, tol)
+            if child is None:
+                continue
+            if child[0] < best_lcoe * (1. - gap):
+                counter += 1
+                heapq.heappush(heap, (child[0], counter, lo, up, child[1]))
+            else:
+                pruned = min(pruned, child[0])
+
+    # Lower bound from the open and pruned nodes, none left means the incumbent is optimal
+    bound = min(heap[0][0] if heap else np.inf, pruned, best_lcoe)
+    if best is None:
+        return {'turbine_number': None, 'lcoe': np.nan, 'capex': np.nan, 'capacity': np.nan, 'energy': np.nan,
+                'bound': bound, 'gap': np.nan, 'nodes': nodes, 'status': 'infeasible' if not heap else 'node_limit'}
+    gap_found = (best_lcoe - bound) / best_lcoe
+    return {'turbine_number': np.round(best).astype(int), 'lcoe': best_lcoe, 'capex': np.dot(best, capex),
+            'capacity': np.dot(best, rating), 'energy': np.dot(best, energy), 'bound': bound, 'gap': gap_found,
+            'nodes': nodes, 'status': 'optimal' if gap_found <= gap * (1. + 1e-9) else 'node_limit'}
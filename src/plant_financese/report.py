@@ -0,0 +1,121 @@
+"""
+report.py
+
+Structured reports of PlantFinance evaluations. A FinanceReport keeps a copy of the inputs and
+outputs of one evaluation and only derives the intermediates and any text or table on request;
+a ReportCollector samples reports every N calls and exports them in bulk at the end of a run.
+"""
+
+from collections import OrderedDict, deque
+import csv
+import json
+import numpy as np
+
+from plant_financese.core import batch_lcoe, PARAM_DEFAULTS
+
+
+def _float(value):
+    return float(np.asarray(value))
+
+
+class FinanceReport(object):
+    """Inputs, intermediates (npr, nec, icc, c_opex, park_aep) and outputs (lcoe, coe) of one evaluation.
+
+    The inputs are kept as given; with offshore_costs the intermediates are derived from the
+    depth-adjusted costs, as the outputs were.
+    """
+
+    INTERMEDIATES = ('npr', 'nec', 'icc', 'c_opex', 'park_aep')
+    OUTPUTS       = ('lcoe', 'coe')
+
+    def __init__(self, params, unknowns, use_dcf=False, call=None, offshore_costs=None):
+        self.call     = call
+        self.use_dcf  = use_dcf
+        self.offshore_costs = offshore_costs
+        self.inputs   = OrderedDict((name, params[name]) for name in PARAM_DEFAULTS)
+        self.outputs  = OrderedDict((name, unknowns[name]) for name in self.OUTPUTS)
+        self._intermediates = None
+
+    @property
+    def intermediates(self):
+        if self._intermediates is None:
+            inputs = self.inputs if self.offshore_costs is None else self.offshore_costs.adjust(self.inputs)
+            out = batch_lcoe(**inputs)
+            self._intermediates = OrderedDict((name, _float(out[name])) for name in self.INTERMEDIATES)
+        return self._intermediates
+
+    def as_dict(self):
+        # Flat record, intermediates and outputs after the inputs
+        record = OrderedDict([('call', self.call), ('use_dcf', self.use_dcf)])
+        record.update((name, _float(value)) for name, value in self.inputs.items())
+        record.update(self.intermediates)
+        record.update((name, _float(value)) for name, value in self.outputs.items())
+        return record
+
+    def __str__(self):
+        r = self.as_dict()
+        lines = ['################################################',
+                 'Computation of CoE and LCoE from Plant_FinanceSE',
+                 'Inputs:',
+                 'Water depth                      %.2f m'          % r['sea_depth'],
+                 'Number of turbines in the park   %u'              % r['turbine_number'],
+                 'Cost of the single turbine       %.3f M USD'      % (r['turbine_cost'] * 1.e-006),
+                 'BoS costs of the single turbine  %.3f M USD'      % (r['turbine_bos_costs'] * 1.e-006),
+                 'Opex costs of the single turbine %.3f M USD'      % (r['turbine_avg_annual_opex'] * 1.e-006),
+                 'Fixed charge rate                %.2f %%'         % (r['fixed_charge_rate'] * 100.),
+                 'Tax rate                         %.2f %%'         % (r['tax_rate'] * 100.),
+                 'Discount rate                    %.2f %%'         % (r['discount_rate'] * 100.),
+                 'Wake loss factor                 %.2f %%'         % (r['wake_loss_factor'] * 100.),
+                 'AEP of the single turbine        %.3f GWh'        % (r['turbine_aep'] * 1.e-006),
+                 'AEP of the wind plant            %.3f GWh'        % (r['park_aep'] * 1.e-006),
+                 'Construction time                %.2f yr'         % r['construction_time'],
+                 'Project lifetime                 %.2f yr'         % r['project_lifetime'],
+                 'Capital costs                    %.2f $/kW'       % r['icc'],
+                 'Opex costs                       %.2f $/kW'       % r['c_opex'],
+                 'NEC                              %.2f MWh/MW/yr'  % r['nec'],
+                 'Outputs:',
+                 'CoE                              %.3f USD/MW'     % (r['coe'] * 1.e003),
+                 'LCoE                             %.3f USD/MW'     % (r['lcoe'] * 1.e003),
+                 '################################################']
+        return '\n'.join(lines)
+
+
+class ReportCollector(object):
+    """Keeps a FinanceReport every `every` calls (none when every is None or 0), the last max_reports
+    of them (all with None), so a long optimization run does not grow memory without bound.
+
+    Reports are only turned into records or text when exported.
+    """
+    def __init__(self, every=1, max_reports=1000):
+        self.every       = every
+        self.max_reports = max_reports
+        self.reports     = deque(maxlen=max_reports)
+
+    def __len__(self):
+        return len(self.reports)
+
+    @property
+    def last(self):
+        return self.reports[-1] if self.reports else None
+
+    def want(self, call):
+        return bool(self.every) and call % self.every == 0
+
+    def add(self, report):
+        self.reports.append(report)
+
+    def records(self):
+        return [report.as_dict() for report in self.reports]
+
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.records(), f, indent=1)
+
+    def to_csv(self, path):
+        records = self.records()
+        with open(path, 'w') as f:
+            if not records:
+                return
+            writer = csv.DictWriter(f, fieldnames=list(records[0].keys()))
+            writer.writeheader()
+            writer.writerows(records)
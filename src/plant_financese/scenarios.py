@@ -0,0 +1,162 @@
+"""
+scenarios.py
+
+Binary columnar scenario files. A file holds one float64 column per PlantFinance param, in
+struct-of-arrays layout after a fixed-size header:
+
+    bytes 0-7      magic b'PFSCEN\\x00\\x01'
+    bytes 8-11     format version (uint32, little-endian)
+    bytes 12-15    length of the JSON schema (uint32)
+    bytes 16-23    number of scenarios n (uint64), updated last on append
+    bytes 24-31    capacity, the scenarios each column has room for (uint64)
+    bytes 32-      JSON schema: column names, dtypes and units, model version, fixed params
+    HEADER_SIZE-   the columns, each capacity * 8 bytes, one after the other
+
+Opening a file only reads the header and maps the columns with numpy.memmap, so it takes the
+same time and memory whatever the number of scenarios. Columns are preallocated (sparse on disk)
+and appending writes into the spare room, growing the file by doubling when it is full.
+"""
+
+import json
+import os
+import struct
+import numpy as np
+
+from plant_financese.core import MODEL_VERSION, PARAM_DEFAULTS, PARAM_UNITS
+
+MAGIC          = b'PFSCEN\x00\x01'
+FORMAT_VERSION = 1
+HEADER_SIZE    = 4096
+
+_FIXED = struct.Struct('<8sIIQQ')
+
+
+def _read_header(f):
+    magic, version, length, n, capacity = _FIXED.unpack(f.read(_FIXED.size))
+    if magic != MAGIC:
+        raise ValueError('%s is not a scenario file' % f.name)
+    if version > FORMAT_VERSION:
+        raise ValueError('%s has format version %d, this reader supports up to %d' % (f.name, version, FORMAT_VERSION))
+    schema = json.loads(f.read(length).decode())
+    return n, capacity, schema
+
+
+def _write_header(f, n, capacity, schema):
+    data = json.dumps(schema).encode()
+    if _FIXED.size + len(data) > HEADER_SIZE:
+        raise ValueError('Scenario schema too large for the %d-byte header' % HEADER_SIZE)
+    f.seek(0)
+    f.write(_FIXED.pack(MAGIC, FORMAT_VERSION, len(data), n, capacity) + data)
+
+
+def create_scenarios(path, columns, capacity=None, fixed=None):
+    """Write a scenario file from a dict of equal-length param columns and return it opened for appending.
+
+    fixed holds params shared by every scenario (stored in the schema); params in neither take their
+    PARAM_DEFAULTS values when read. capacity reserves room for that many scenarios (at least the
+    ones written), so later appends do not move the columns.
+    """
+    names  = list(columns)
+    fixed  = dict((name, float(value)) for name, value in (fixed or {}).items())
+    unknown = (set(names) | set(fixed)) - set(PARAM_DEFAULTS)
+    if unknown:
+        raise ValueError('Unknown params: %s' % ', '.join(sorted(unknown)))
+    if not names:
+        raise ValueError('A scenario file needs at least one column')
+    n = len(np.asarray(columns[names[0]]))
+    capacity = max(int(capacity or 0), n, 1)
+
+    schema = {'columns': [{'name': name, 'dtype': '<f8', 'units': PARAM_UNITS.get(name)} for name in names],
+              'fixed': fixed, 'fixed_units': dict((name, PARAM_UNITS.get(name)) for name in fixed),
+              'model_version': MODEL_VERSION}
+    with open(path, 'wb') as f:
+        _write_header(f, 0, capacity, schema)
+        f.truncate(HEADER_SIZE + 8 * capacity * len(names))
+    scenarios = ScenarioFile(path, mode='r+')
+    scenarios.append(columns)
+    return scenarios
+
+
+class ScenarioFile(object):
+    """Memory-mapped scenario file; mode 'r' to read, 'r+' to also append.
+
+    The columns are memmaps of the n stored scenarios, under .columns by param name. A
+    ScenarioFile also works as the spec of sweep.run_sweep (len and chunk), and pickles as its
+    path, so pool workers map the file themselves.
+    """
+    def __init__(self, path, mode='r'):
+        self.path = path
+        self.mode = mode
+        with open(path, 'rb') as f:
+            self.n, self.capacity, self.schema = _read_header(f)
+        self.names = [column['name'] for column in self.schema['columns']]
+        self.fixed = self.schema['fixed']
+        self.units = dict((column['name'], column['units']) for column in self.schema['columns'])
+        self.units.update(self.schema['fixed_units'])
+        for name, units in self.units.items():
+            if name not in PARAM_DEFAULTS:
+                raise ValueError('%s holds the unknown param %s' % (path, name))
+            if units != PARAM_UNITS.get(name):
+                raise ValueError('%s stores %s in %s, PlantFinance expects %s' % (path, name, units, PARAM_UNITS.get(name)))
+        self._map()
+
+    def _map(self):
+        self._data = np.memmap(self.path, dtype='<f8', mode=self.mode, offset=HEADER_SIZE,
+                               shape=(len(self.names), self.capacity))
+        self.columns = dict((name, self._data[k, :self.n]) for k, name in enumerate(self.names))
+
+    def __getstate__(self):
+        return {'path': self.path, 'mode': 'r'}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['mode'])
+
+    def __len__(self):
+        return self.n
+
+    def chunk(self, start, stop):
+        """Params of scenarios start:stop, views of the mapped columns plus the fixed values."""
+        columns = dict(self.fixed)
+        for name in self.names:
+            columns[name] = self.columns[name][start:stop]
+        return columns
+
+    def append(self, columns):
+        """Add scenarios from a dict holding one equal-length array for every stored column."""
+        if self.mode != 'r+':
+            raise ValueError('%s is open read-only' % self.path)
+        if set(columns) != set(self.names):
+            raise ValueError('Appended scenarios must have exactly the columns %s' % ', '.join(self.names))
+        arrays = dict((name, np.atleast_1d(np.asarray(columns[name], dtype=np.float64))) for name in self.names)
+        lengths = set(len(values) for values in arrays.values())
+        if len(lengths) != 1:
+            raise ValueError('All scenario columns must have the same length')
+        m = lengths.pop()
+        if self.n + m > self.capacity:
+            self._grow(max(2 * self.capacity, self.n + m))
+
+        for k, name in enumerate(self.names):
+            self._data[k, self.n:self.n + m] = arrays[name]
+        self._data.flush()
+        self.n += m
+        with open(self.path, 'r+b') as f:
+            _write_header(f, self.n, self.capacity, self.schema)
+        self.columns = dict((name, self._data[k, :self.n]) for k, name in enumerate(self.names))
+
+    def _grow(self, capacity):
+        # Rewrite with more room per column, under a temporary name so a crash keeps the old file
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            _write_header(f, self.n, capacity, self.schema)
+            f.truncate(HEADER_SIZE + 8 * capacity * len(self.names))
+        grown = np.memmap(tmp, dtype='<f8', mode='r+', offset=HEADER_SIZE, shape=(len(self.names), capacity))
+        grown[:, :self.n] = self._data[:, :self.n]
+        grown.flush()
+        del grown
+        self._data = self.columns = None
+        os.replace(tmp, self.path)
+        self.capacity = capacity
+        self._map()
+
+    def close(self):
+        self._data = self.columns = None
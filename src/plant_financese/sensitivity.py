@@ -0,0 +1,129 @@
+"""
+sensitivity.py
+
+Global sensitivity analysis of the PlantFinance outputs over its declared params:
+Sobol first-order and total indices from Saltelli designs, and Morris elementary effects.
+All design points are evaluated in large vectorized batches with the batch kernels.
+"""
+
+import numpy as np
+
+from plant_financese.core import evaluate_batch, PARAM_DEFAULTS
+
+
+def check_bounds(bounds):
+    # Bounds map declared param names to (low, high); returns the names and the (d, 2) bound array
+    names = list(bounds.keys())
+    unknown = [name for name in names if name not in PARAM_DEFAULTS]
+    if unknown:
+        raise ValueError('Unknown PlantFinance params: %s' % ', '.join(unknown))
+    return names, np.array([bounds[name] for name in names], dtype=np.float64)
+
+
+def _evaluate_samples(x, names, fixed=None, output='lcoe', use_dcf=False, chunk_size=1000000):
+    """Evaluate rows of a design matrix through the batch kernels.
+
+    x is (n, d) with columns ordered as names; fixed holds values for the params that are not
+    varied (defaults otherwise). Rows are evaluated chunk_size at a time; returns output as (n,).
+    Invalid samples raise PlantFinanceInputError and non-finite outputs ValueError, as either
+    would silently corrupt the variance estimates.
+    """
+    columns = dict(PARAM_DEFAULTS)
+    if fixed:
+        columns.update(fixed)
+
+    y = np.empty(x.shape[0])
+    for start in range(0, x.shape[0], chunk_size):
+        rows = x[start:start + chunk_size]
+        for j, name in enumerate(names):
+            columns[name] = rows[:, j]
+        y[start:start + chunk_size] = np.broadcast_to(evaluate_batch(columns, use_dcf, 'raise')[output],
+                                                      (rows.shape[0],))
+    bad = ~np.isfinite(y)
+    if bad.any():
+        raise ValueError('%d of %d samples give a non-finite %s, first at row %d; narrow the bounds'
+                         % (bad.sum(), len(y), output, np.flatnonzero(bad)[0]))
+    return y
+
+
+# Sobol indices
+
+def saltelli_design(bounds, n, seed=None):
+    """Saltelli design over bounds: returns (names, A, B, AB) with AB shaped (d, n, d).
+
+    AB[i] is A with its i-th column taken from B.
+    """
+    names, lim = check_bounds(bounds)
+    d   = len(names)
+    rng = np.random.default_rng(seed)
+    A   = lim[:, 0] + rng.random((n, d)) * (lim[:, 1] - lim[:, 0])
+    B   = lim[:, 0] + rng.random((n, d)) * (lim[:, 1] - lim[:, 0])
+    AB  = np.repeat(A[np.newaxis], d, axis=0)
+    for i in range(d):
+        AB[i, :, i] = B[:, i]
+    return names, A, B, AB
+
+
+def sobol_indices(bounds, n, fixed=None, output='lcoe', use_dcf=False, seed=None, chunk_size=1000000):
+    """First-order (S1) and total (ST) Sobol indices of output over the params in bounds.
+
+    Uses n base samples, i.e. n * (d + 2) evaluations, with the Saltelli (2010) first-order and
+    Jansen total-effect estimators. Returns a dict with names, S1 and ST (arrays ordered as names).
+    """
+    names, A, B, AB = saltelli_design(bounds, n, seed)
+    d = len(names)
+    y = _evaluate_samples(np.concatenate([A, B, AB.reshape(d * n, d)]), names, fixed, output, use_dcf,
+                        chunk_size)
+    fA, fB, fAB = y[:n], y[n:2*n], y[2*n:].reshape(d, n)
+
+    var = np.var(np.concatenate([fA, fB]))
+    S1  = np.mean(fB * (fAB - fA), axis=1) / var
+    ST  = 0.5 * np.mean((fA - fAB)**2, axis=1) / var
+    return {'names': names, 'S1': S1, 'ST': ST}
+
+
+# Morris elementary effects
+
+def morris_design(bounds, r, levels=4, seed=None):
+    """r Morris trajectories over bounds, each of d + 1 points moving one param at a time.
+
+    Returns (names, X, order, step) with X shaped (r, d + 1, d) in param units, order[j, k] the
+    param moved by the k-th step of trajectory j and step[j, i] the signed step of param i in the
+    unit hypercube.
+    """
+    names, lim = check_bounds(bounds)
+    d     = len(names)
+    rng   = np.random.default_rng(seed)
+    delta = levels / (2.0 * (levels - 1))
+
+    # Start points on the level grid low enough that a +delta step stays in the unit cube
+    start = rng.integers(0, levels // 2, (r, d)) / (levels - 1.0)
+    order = np.argsort(rng.random((r, d)), axis=1)
+    sign  = rng.choice([-1.0, 1.0], (r, d))
+    start = np.where(sign < 0, start + delta, start)
+
+    steps = np.zeros((r, d + 1, d))
+    rows  = np.arange(r)[:, np.newaxis]
+    steps[rows, np.arange(1, d + 1)[np.newaxis, :], order] = sign[rows, order] * delta
+    unit  = start[:, np.newaxis, :] + np.cumsum(steps, axis=1)
+    X     = lim[:, 0] + unit * (lim[:, 1] - lim[:, 0])
+    return names, X, order, sign * delta
+
+
+def morris_effects(bounds, r, levels=4, fixed=None, output='lcoe', use_dcf=False, seed=None,
+                   chunk_size=1000000):
+    """Morris screening statistics of output over the params in bounds, from r trajectories.
+
+    Elementary effects are per unit of the scaled [0, 1] range of each param.
+    Returns a dict with names, mu, mu_star and sigma (arrays ordered as names).
+    """
+    names, X, order, step = morris_design(bounds, r, levels, seed)
+    d = len(names)
+    y = _evaluate_samples(X.reshape(r * (d + 1), d), names, fixed, output, use_dcf, chunk_size).reshape(r, d + 1)
+
+    # The k-th move of trajectory j changes param order[j, k]
+    rows = np.arange(r)[:, np.newaxis]
+    ee = np.empty((r, d))
+    ee[rows, order] = np.diff(y, axis=1) / step[rows, order]
+    return {'names': names, 'mu': ee.mean(axis=0), 'mu_star': np.abs(ee).mean(axis=0),
+            'sigma': ee.std(axis=0, ddof=1)}
@@ -0,0 +1,236 @@
+"""
+service.py
+
+Asyncio evaluation service for many small, concurrent LCOE queries. Queries arriving within a
+short window are collected into one micro-batch and evaluated with a single vectorized call to
+the cost equations, then each caller gets its own row back. The front end is a minimal HTTP/1.1
+server (keep-alive, JSON bodies) on a local TCP port or a Unix socket:
+
+    POST /evaluate   {"turbine_cost": 1.2e6, "turbine_number": 50, ...}   -> {"lcoe": ..., "coe": ..., "status": 0}
+    POST /evaluate   [{...}, {...}]                                       -> [{...}, {...}]
+    GET  /stats                                                           -> batch counters
+
+Params left out of a query take their PARAM_DEFAULTS values. Queries with invalid inputs (see
+plant_financese.validation) are answered with status 422 and the reasons, malformed ones with 400
+(nothing of a list is evaluated then) and an evaluation that fails with 500.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import numpy as np
+
+from plant_financese.core import evaluate_batch, PARAM_DEFAULTS
+from plant_financese.validation import describe, ERRORS
+
+
+class MicroBatcher(object):
+    """Collects concurrent evaluate() calls into batches of up to max_batch scenarios.
+
+    A batch is evaluated max_delay seconds after its first query arrives, or at once when it is
+    full, so max_delay bounds the latency added to a lone query. outputs are the batch_lcoe (or
+    batch_dcf with use_dcf) outputs returned for each query. Must be used from one event loop.
+    """
+    def __init__(self, use_dcf=False, max_batch=1024, max_delay=0.002, outputs=('lcoe', 'coe')):
+        self.use_dcf   = use_dcf
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.outputs   = tuple(outputs)
+        self.requests  = 0
+        self.batches   = 0
+        self.largest   = 0
+        self._pending  = []
+        self._timer    = None
+
+    def _row(self, params):
+        # Scenario as a tuple of floats in PARAM_DEFAULTS order, refusing unknown or non-numeric params
+        unknown = set(params) - set(PARAM_DEFAULTS)
+        if unknown:
+            raise ValueError('Unknown params: %s' % ', '.join(sorted(unknown)))
+        row = []
+        for name, default in PARAM_DEFAULTS.items():
+            value = params.get(name, default)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError('%s must be a number, got %r' % (name, value))
+            row.append(float(value))
+        return row
+
+    def evaluate(self, params):
+        """Future of the outputs of one scenario (dict of param values), plus its status bit mask."""
+        return self._submit(self._row(params))
+
+    def evaluate_many(self, queries):
+        """Futures of several scenarios. All of them are checked first, so a bad one raises
+        ValueError before any is queued."""
+        rows = [self._row(params) for params in queries]
+        return [self._submit(row) for row in rows]
+
+    def _submit(self, row):
+        future = asyncio.get_event_loop().create_future()
+        self._pending.append((row, future))
+        self.requests += 1
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(self.max_delay, self.flush)
+        return future
+
+    def flush(self):
+        # Evaluate everything pending as one batch and resolve the futures
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        self.batches += 1
+        self.largest  = max(self.largest, len(pending))
+
+        rows = np.array([row for row, future in pending])
+        try:
+            out = evaluate_batch(dict(zip(PARAM_DEFAULTS, rows.T)), self.use_dcf, policy='nan')
+        except Exception as e:
+            for row, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        values = dict((name, np.broadcast_to(out[name], (len(pending),)).tolist()) for name in self.outputs)
+        status = np.broadcast_to(out['status'], (len(pending),)).tolist()
+        for i, (row, future) in enumerate(pending):
+            if future.done(): # cancelled by the caller
+                continue
+            result = dict((name, values[name][i]) for name in self.outputs)
+            result['status'] = int(status[i])
+            future.set_result(result)
+
+    def stats(self):
+        return {'requests': self.requests, 'batches': self.batches, 'largest_batch': self.largest,
+                'mean_batch': float(self.requests - len(self._pending)) / self.batches if self.batches else 0.0}
+
+
+def _json_safe(result):
+    # JSON has no NaN or infinity, send null instead
+    return dict((k, None if isinstance(v, float) and not math.isfinite(v) else v) for k, v in result.items())
+
+
+class EvaluationServer(object):
+    """HTTP front end of a MicroBatcher on host:port (port 0 picks a free one) or on the Unix socket path."""
+
+    def __init__(self, batcher=None, host='127.0.0.1', port=0, path=None):
+        self.batcher = batcher if batcher is not None else MicroBatcher()
+        self.host    = host
+        self.port    = port
+        self.path    = path
+        self.server  = None
+
+    async def start(self):
+        if self.path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, path=self.path)
+        else:
+            self.server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port   = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.batcher.flush()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def _answer(self, method, target, body):
+        # (status code, JSON-able reply) of one request
+        if method == 'GET' and target == '/stats':
+            return 200, self.batcher.stats()
+        if target != '/evaluate':
+            return 404, {'error': 'Unknown endpoint %s' % target}
+        if method != 'POST':
+            return 405, {'error': 'Use POST for /evaluate'}
+        try:
+            query   = json.loads(body.decode() or 'null')
+            many    = isinstance(query, list)
+            queries = query if many else [query]
+            if not all(isinstance(q, dict) for q in queries):
+                raise ValueError('Send a JSON object of params or a list of them')
+            futures = self.batcher.evaluate_many(queries)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+
+        results = [_json_safe(r) for r in await asyncio.gather(*futures)]
+        for r in results:
+            if r['status'] & ERRORS:
+                r['error'] = '; '.join(describe(r['status'] & ERRORS))
+        code = 422 if any('error' in r for r in results) else 200
+        return code, results if many else results[0]
+
+    async def _reply(self, writer, code, reply):
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                   422: 'Unprocessable Entity', 500: 'Internal Server Error'}
+        data = json.dumps(reply).encode()
+        writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+                      % (code, reasons[code], len(data))).encode() + data)
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get('content-length', 0))
+                    if length < 0:
+                        raise ValueError('Negative Content-Length')
+                except ValueError:
+                    # Malformed request line or headers: answered, then closed as the framing is lost
+                    await self._reply(writer, 400, {'error': 'Malformed HTTP request'})
+                    break
+                body = await reader.readexactly(length)
+
+                try:
+                    code, reply = await self._answer(method, target, body)
+                except Exception as e:
+                    # A failed evaluation is answered, it must not drop the connection silently
+                    code, reply = 500, {'error': '%s: %s' % (type(e).__name__, e)}
+                await self._reply(writer, code, reply)
+                if headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def serve(host='127.0.0.1', port=8000, path=None, use_dcf=False, max_batch=1024, max_delay=0.002,
+          outputs=('lcoe', 'coe')):
+    """Run an EvaluationServer until interrupted."""
+    batcher = MicroBatcher(use_dcf, max_batch, max_delay, outputs)
+    asyncio.run(EvaluationServer(batcher, host, port, path).serve_forever())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Micro-batching PlantFinance evaluation service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix', help='Unix socket to serve on instead of TCP')
+    parser.add_argument('--dcf', action='store_true', help='Discounted cash-flow LCOE')
+    parser.add_argument('--max-batch', type=int, default=1024)
+    parser.add_argument('--max-delay', type=float, default=0.002, help='Seconds a query may wait for its batch')
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.unix, args.dcf, args.max_batch, args.max_delay)
+
+
+if __name__ == '__main__':
+    main()
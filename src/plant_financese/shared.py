@@ -0,0 +1,161 @@
+"""
+shared.py
+
+Zero-copy scenario transport for multiprocess evaluation. The input and output columns of a
+batch live in one memory-mapped file (on /dev/shm where it exists, so in RAM); worker processes
+map the same file, evaluate slices of it in place and write their outputs straight into it.
+Tasks only carry slice bounds, so nothing per scenario is pickled either way. A memory-mapped
+file is used rather than multiprocessing.shared_memory so the buffers also work on Python 3.7
+and can be placed on disk for batches larger than memory.
+"""
+
+from multiprocessing import Pool
+import os
+import tempfile
+import uuid
+import weakref
+import numpy as np
+
+from plant_financese.core import evaluate_batch, PARAM_DEFAULTS
+
+# Columns held as int64, all others are float64
+_INTEGER = ('status',)
+
+
+def _default_directory():
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def _remove(path, pid):
+    # Only in the creating process, forked pool workers hold copies of the owner
+    if os.getpid() == pid and os.path.exists(path):
+        os.remove(path)
+
+
+class SharedScenarios(object):
+    """n scenarios as named columns in one memory-mapped file, shared between processes.
+
+    inputs are the names of the varying params, outputs those of the results (status is always
+    added); params that are the same for every scenario go in fixed. The columns are NumPy
+    memmaps under .inputs and .outputs. Pickling sends only the file path and layout, and the
+    receiving process maps the same file, so a SharedScenarios can be passed to pool workers.
+    close() (or leaving a with block) removes the file, as does garbage collection or interpreter
+    exit of the creating instance, so an unclosed batch does not stay in /dev/shm.
+    """
+    def __init__(self, n, inputs, outputs=('lcoe', 'coe'), fixed=None, directory=None, path=None):
+        if n < 1:
+            raise ValueError('SharedScenarios needs at least one scenario')
+        self.n            = int(n)
+        self.input_names  = list(inputs)
+        self.output_names = [name for name in outputs if name != 'status'] + ['status']
+        self.fixed        = dict(fixed or {})
+        unknown = set(self.input_names) | set(self.fixed)
+        unknown -= set(PARAM_DEFAULTS)
+        if unknown:
+            raise ValueError('Unknown params: %s' % ', '.join(sorted(unknown)))
+
+        self.owner = path is None
+        if path is None:
+            path = os.path.join(directory or _default_directory(), 'plant_finance_%s.bin' % uuid.uuid4().hex)
+            with open(path, 'wb') as f:
+                f.truncate(8 * self.n * (len(self.input_names) + len(self.output_names)))
+        self.path = path
+        self._finalizer = weakref.finalize(self, _remove, path, os.getpid()) if self.owner else None
+        self._map()
+
+    def _map(self):
+        names = self.input_names + self.output_names
+        self._data = np.memmap(self.path, dtype=np.uint8, mode='r+', shape=(8 * self.n * len(names),))
+        columns = {}
+        for k, name in enumerate(names):
+            dtype = np.int64 if name in _INTEGER else np.float64
+            columns[name] = self._data[8 * self.n * k:8 * self.n * (k + 1)].view(dtype)
+        self.inputs  = dict((name, columns[name]) for name in self.input_names)
+        self.outputs = dict((name, columns[name]) for name in self.output_names)
+
+    @classmethod
+    def from_columns(cls, columns, outputs=('lcoe', 'coe'), directory=None):
+        """Shared copy of a dict of params: arrays become shared input columns, scalars fixed values."""
+        arrays = dict((name, np.asarray(value)) for name, value in columns.items())
+        varying = [name for name, value in arrays.items() if value.ndim > 0]
+        lengths = set(len(arrays[name]) for name in varying)
+        if len(lengths) > 1:
+            raise ValueError('All scenario columns must have the same length')
+        n = lengths.pop() if lengths else 1
+        fixed = dict((name, value[()]) for name, value in arrays.items() if value.ndim == 0)
+        shared = cls(n, varying, outputs, fixed, directory)
+        for name in varying:
+            shared.inputs[name][:] = arrays[name]
+        return shared
+
+    def __getstate__(self):
+        return {'n': self.n, 'input_names': self.input_names, 'output_names': self.output_names,
+                'fixed': self.fixed, 'path': self.path}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.owner = False
+        self._finalizer = None
+        self._map()
+
+    def columns(self, start=0, stop=None):
+        """Params of scenarios start:stop as views of the shared inputs, plus the fixed values."""
+        columns = dict(PARAM_DEFAULTS)
+        columns.update(self.fixed)
+        for name, values in self.inputs.items():
+            columns[name] = values[start:stop]
+        return columns
+
+    def evaluate(self, start=0, stop=None, use_dcf=False, policy='nan'):
+        # Evaluate scenarios start:stop and write the outputs in place
+        stop = self.n if stop is None else stop
+        out  = evaluate_batch(self.columns(start, stop), use_dcf, policy)
+        for name in self.output_names:
+            self.outputs[name][start:stop] = np.broadcast_to(out[name], (stop - start,))
+
+    def close(self):
+        self.inputs = self.outputs = self._data = None
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Each worker maps the scenarios once, tasks only carry slice bounds
+_worker = {}
+
+def _init_worker(shared, use_dcf, policy):
+    _worker.update(shared=shared, use_dcf=use_dcf, policy=policy)
+
+
+def _run_slice(bounds):
+    start, stop = bounds
+    _worker['shared'].evaluate(start, stop, _worker['use_dcf'], _worker['policy'])
+    return stop - start
+
+
+def evaluate_shared(shared, processes=None, chunk_size=100000, use_dcf=False, policy='nan'):
+    """Evaluate every scenario of a SharedScenarios over a pool of `processes` workers (in-process
+    when None or 1), chunk_size scenarios per task. The outputs are written into shared.outputs,
+    which is returned. Invalid scenarios are handled by policy; 'mask' is not available here as
+    the outputs are plain arrays.
+    """
+    if policy == 'mask':
+        raise ValueError("The 'mask' policy needs masked arrays, use 'nan' or 'raise'")
+    tasks = [(start, min(start + chunk_size, shared.n)) for start in range(0, shared.n, chunk_size)]
+    if processes is None or processes == 1:
+        for start, stop in tasks:
+            shared.evaluate(start, stop, use_dcf, policy)
+    else:
+        pool = Pool(processes, initializer=_init_worker, initargs=(shared, use_dcf, policy))
+        try:
+            for count in pool.imap_unordered(_run_slice, tasks):
+                pass
+        finally:
+            pool.close()
+            pool.join()
+    return shared.outputs
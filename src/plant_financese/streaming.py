@@ -0,0 +1,102 @@
+"""
+streaming.py
+
+Streaming evaluation of project portfolios stored in flat files. Rows are read in fixed-size
+chunks from a CSV file or from a directory of per-column .npy files (memory-mapped), mapped onto
+PlantFinance param names, evaluated with the batch kernels and appended to a CSV output, so
+peak memory depends on the chunk size only.
+"""
+
+from itertools import islice
+import csv
+import os
+import numpy as np
+
+from plant_financese.core import evaluate_batch, PARAM_DEFAULTS
+
+
+def map_columns(names, column_map=None):
+    # Source column -> param name, for mapped columns and for columns already named after a param
+    column_map = dict(column_map or {})
+    unknown = [param for param in column_map.values() if param not in PARAM_DEFAULTS]
+    if unknown:
+        raise ValueError('Unknown PlantFinance params: %s' % ', '.join(unknown))
+    mapping = {}
+    for name in names:
+        param = column_map.get(name, name)
+        if param in PARAM_DEFAULTS:
+            mapping[name] = param
+    missing = [name for name in column_map if name not in names]
+    if missing:
+        raise ValueError('Columns not found in input: %s' % ', '.join(missing))
+    return mapping
+
+
+def read_csv_chunks(path, chunk_size=100000, column_map=None, delimiter=','):
+    """Yield dicts of param-name arrays from a CSV file with a header row, chunk_size rows at a time.
+
+    Only the columns that map onto PlantFinance params are parsed, other columns are skipped.
+    """
+    with open(path, newline='') as f:
+        # One csv.reader for the header and the body, so quoted fields parse the same way in both
+        reader  = csv.reader(f, delimiter=delimiter)
+        header  = [name.strip() for name in next(reader)]
+        mapping = map_columns(header, column_map)
+        usecols = [header.index(name) for name in mapping]
+        params  = [mapping[name] for name in mapping]
+        while True:
+            rows = [[row[k] for k in usecols] for row in islice(reader, chunk_size) if row]
+            if not rows:
+                break
+            data = np.array(rows, dtype=np.float64).reshape(len(rows), len(usecols))
+            yield dict(zip(params, data.T))
+
+
+def read_npy_chunks(directory, chunk_size=100000, column_map=None):
+    """Yield dicts of param-name arrays from a directory of equal-length <column>.npy files.
+
+    The files are memory-mapped, so only the current chunk is ever resident.
+    """
+    files   = dict((name[:-4], os.path.join(directory, name)) for name in os.listdir(directory)
+                   if name.endswith('.npy'))
+    mapping = map_columns(list(files.keys()), column_map)
+    arrays  = dict((mapping[name], np.load(files[name], mmap_mode='r')) for name in mapping)
+    lengths = set(len(a) for a in arrays.values())
+    if len(lengths) > 1:
+        raise ValueError('Columns in %s have different lengths' % directory)
+    n = lengths.pop() if lengths else 0
+    for start in range(0, n, chunk_size):
+        yield dict((param, np.array(a[start:start + chunk_size], dtype=np.float64)) for param, a in arrays.items())
+
+
+def evaluate_file(src, dst, column_map=None, chunk_size=100000, use_dcf=False,
+                  outputs=('lcoe', 'coe', 'icc', 'c_opex', 'nec'), fixed=None, policy='nan'):
+    """Evaluate every row of src through the PlantFinance equations and write the results to dst.
+
+    src is a CSV file with a header row or a directory of per-column .npy files; column_map renames
+    source columns onto PlantFinance params (columns already named after a param need no entry) and
+    fixed sets params that are not in the file. dst is a CSV file with a 0-based row column followed
+    by the outputs and the validation status bit mask, written chunk by chunk. Invalid rows are handled
+    by policy, NaN outputs by default; under 'mask' the masked outputs are written as NaN too, as CSV
+    has no mask. Returns the number of rows evaluated.
+    """
+    if os.path.isdir(src):
+        chunks = read_npy_chunks(src, chunk_size, column_map)
+    else:
+        chunks = read_csv_chunks(src, chunk_size, column_map)
+
+    n = 0
+    with open(dst, 'w') as f:
+        f.write(','.join(('row',) + tuple(outputs) + ('status',)) + '\n')
+        for columns in chunks:
+            inputs = dict(PARAM_DEFAULTS)
+            inputs.update(fixed or {})
+            inputs.update(columns)
+            m   = len(next(iter(columns.values())))
+            out = evaluate_batch(inputs, use_dcf, policy)
+            np.savetxt(f, np.column_stack([np.arange(n, n + m)] +
+                                          [np.broadcast_to(np.ma.filled(out[name], np.nan), (m,)) for name in outputs] +
+                                          [np.broadcast_to(out['status'], (m,))]),
+                       delimiter=',', fmt=['%d'] + ['%.17g'] * len(outputs) + ['%d'])
+            n += m
+    return n
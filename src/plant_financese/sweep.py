@@ -0,0 +1,213 @@
+"""
+sweep.py
+
+Chunked, resumable parameter sweeps of the PlantFinance equations over a process pool.
+Scenarios come from a full-factorial grid or from explicit lists of values; every chunk is
+evaluated with the batch kernels and written to its own file as soon as it is done, so an
+interrupted sweep picks up where it stopped.
+"""
+
+from multiprocessing import Pool
+import hashlib
+import json
+import os
+import numpy as np
+
+from plant_financese.cache import as_cache, evaluate_cached
+from plant_financese.core import evaluate_batch, PARAM_DEFAULTS
+
+
+class FullFactorial(object):
+    """Full-factorial grid over the values of each axis, generated chunk by chunk.
+
+    axes maps PlantFinance param names to the values to sweep, fixed sets the other params.
+    The last axis varies fastest; the grid itself is never materialized.
+    """
+    def __init__(self, axes, fixed=None):
+        self.names  = list(axes.keys())
+        self.values = [np.atleast_1d(np.asarray(axes[name], dtype=np.float64)) for name in self.names]
+        self.shape  = tuple(len(v) for v in self.values)
+        self.fixed  = dict(fixed or {})
+
+    def __len__(self):
+        return int(np.prod(self.shape))
+
+    def chunk(self, start, stop):
+        columns = dict(self.fixed)
+        index = np.unravel_index(np.arange(start, stop), self.shape)
+        for name, values, idx in zip(self.names, self.values, index):
+            columns[name] = values[idx]
+        return columns
+
+
+class ScenarioList(object):
+    """Explicit scenarios: columns maps param names to equal-length arrays, fixed sets the other params."""
+    def __init__(self, columns, fixed=None):
+        self.columns = dict((name, np.asarray(values)) for name, values in columns.items())
+        lengths = set(len(values) for values in self.columns.values())
+        if len(lengths) != 1:
+            raise ValueError('All scenario columns must have the same length')
+        self.n     = lengths.pop()
+        self.fixed = dict(fixed or {})
+
+    def __len__(self):
+        return self.n
+
+    def chunk(self, start, stop):
+        columns = dict(self.fixed)
+        for name, values in self.columns.items():
+            columns[name] = values[start:stop]
+        return columns
+
+
+# Bytes of an array fed to the hash at a time, so digests never copy whole columns
+_DIGEST_BLOCK = 1 << 20
+
+def _digest(value, h):
+    # Feed value into the hash h: dicts by sorted key, sequences in order, arrays by dtype, shape and bytes
+    if isinstance(value, dict):
+        h.update(b'{%d' % len(value))
+        for key in sorted(value, key=str):
+            h.update(repr(key).encode())
+            _digest(value[key], h)
+    elif isinstance(value, (list, tuple)):
+        h.update(b'[%d' % len(value))
+        for item in value:
+            _digest(item, h)
+    else:
+        array = np.asarray(value)
+        if array.dtype.hasobject:
+            h.update(repr(value).encode())
+            return
+        h.update(('%s%s' % (array.dtype.str, array.shape)).encode())
+        if array.flags.c_contiguous:
+            data = memoryview(array.reshape(-1).view(np.uint8))
+            for start in range(0, len(data), _DIGEST_BLOCK):
+                h.update(data[start:start + _DIGEST_BLOCK])
+        else:
+            step = max(1, _DIGEST_BLOCK // array.itemsize)
+            for start in range(0, array.size, step):
+                h.update(array.flat[start:start + step].tobytes())
+
+
+def spec_digest(spec):
+    """SHA-256 hex digest of a sweep spec: its type and public attributes, the fixed params included.
+
+    Arrays are hashed a block at a time. A file-backed spec (a path attribute naming a file, e.g. a
+    scenarios.ScenarioFile) is identified by the path, size and modification time of the file and
+    its length, fixed params and schema, so its data is not read.
+    """
+    h = hashlib.sha256(type(spec).__name__.encode())
+    path = getattr(spec, 'path', None)
+    if isinstance(path, str) and os.path.isfile(path):
+        stat  = os.stat(path)
+        state = {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                 'n': len(spec), 'fixed': getattr(spec, 'fixed', None), 'schema': getattr(spec, 'schema', None)}
+    else:
+        state = dict((name, value) for name, value in vars(spec).items() if not name.startswith('_'))
+    _digest(state, h)
+    return h.hexdigest()
+
+
+def chunk_path(out_dir, index):
+    return os.path.join(out_dir, 'chunk_%06d.npz' % index)
+
+
+# The spec and evaluation settings are sent once per worker, tasks only carry chunk bounds
+_worker = {}
+
+def _init_worker(spec, out_dir, use_dcf, outputs, save_inputs, policy, cache=None):
+    _worker.update(spec=spec, out_dir=out_dir, use_dcf=use_dcf, outputs=outputs, save_inputs=save_inputs,
+                   policy=policy, cache=cache)
+
+
+def _run_chunk(task):
+    index, start, stop = task
+    spec     = _worker['spec']
+    columns  = spec.chunk(start, stop)
+    inputs   = dict(PARAM_DEFAULTS)
+    inputs.update(columns)
+    if _worker['cache'] is not None:
+        out = evaluate_cached(inputs, _worker['cache'], _worker['use_dcf'], _worker['policy'])
+    else:
+        out = evaluate_batch(inputs, _worker['use_dcf'], _worker['policy'])
+
+    arrays = dict((name, np.broadcast_to(out[name], (stop - start,)))
+                  for name in _worker['outputs'] + ('status',))
+    if _worker['save_inputs']:
+        for name, values in columns.items():
+            arrays['input:' + name] = np.broadcast_to(values, (stop - start,))
+
+    # Write under a temporary name and rename, so a crash never leaves a partial chunk behind
+    path = chunk_path(_worker['out_dir'], index)
+    tmp  = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+    return index
+
+
+def run_sweep(spec, out_dir, chunk_size=100000, processes=None, use_dcf=False, outputs=('lcoe', 'coe'),
+              save_inputs=False, policy='nan', cache=None):
+    """Evaluate every scenario of spec (FullFactorial or ScenarioList), chunk_size at a time.
+
+    Chunks are spread over a pool of `processes` workers (in-process when None or 1) and each is
+    written to out_dir as chunk_NNNNNN.npz, holding the outputs, the validation status and, with
+    save_inputs, the swept inputs prefixed with 'input:'. Invalid scenarios are handled by policy
+    (see plant_financese.validation); by default their outputs are NaN and the sweep carries on.
+    'mask' is not available, the chunk files hold plain arrays. Chunks already on disk are
+    skipped, so rerunning the same call resumes a crashed sweep; the manifest in out_dir records
+    the layout, settings and spec_digest of the sweep and refuses to resume a different one,
+    whose chunks would be mixed with these. cache (a cache.ResultCache or
+    the path of its file) reuses the results of scenarios evaluated by earlier runs.
+    Returns a dict with n_scenarios, n_chunks, computed and skipped.
+    """
+    if policy == 'mask':
+        raise ValueError("The 'mask' policy needs masked arrays, use 'nan' or 'raise'")
+    n = len(spec)
+    n_chunks = (n + chunk_size - 1) // chunk_size
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    manifest = {'n_scenarios': n, 'chunk_size': chunk_size, 'n_chunks': n_chunks, 'use_dcf': use_dcf,
+                'outputs': list(outputs), 'save_inputs': save_inputs, 'policy': policy, 'spec': spec_digest(spec)}
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise ValueError('%s holds a different sweep (%s), use a new output directory' % (out_dir, previous))
+    else:
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=1)
+
+    tasks = [(k, k * chunk_size, min(n, (k + 1) * chunk_size)) for k in range(n_chunks)
+             if not os.path.exists(chunk_path(out_dir, k))]
+    initargs = (spec, out_dir, use_dcf, tuple(outputs), save_inputs, policy, as_cache(cache))
+
+    if processes is None or processes == 1:
+        _init_worker(*initargs)
+        for task in tasks:
+            _run_chunk(task)
+    else:
+        pool = Pool(processes, initializer=_init_worker, initargs=initargs)
+        try:
+            for index in pool.imap_unordered(_run_chunk, tasks):
+                pass
+        finally:
+            pool.close()
+            pool.join()
+
+    return {'n_scenarios': n, 'n_chunks': n_chunks, 'computed': len(tasks), 'skipped': n_chunks - len(tasks)}
+
+
+def load_sweep(out_dir):
+    """Concatenate the chunk files of a finished sweep, in scenario order, into a dict of arrays."""
+    with open(os.path.join(out_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    parts = {}
+    for k in range(manifest['n_chunks']):
+        with np.load(chunk_path(out_dir, k)) as data:
+            for name in data.files:
+                parts.setdefault(name, []).append(data[name])
+    return dict((name, np.concatenate(values)) for name, values in parts.items())
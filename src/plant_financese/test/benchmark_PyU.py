@@ -0,0 +1,46 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import plant_financese.benchmark as bm
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def testHistory(self):
+        history = os.path.join(self.tmp, 'history.jsonl')
+        records = bm.run_benchmarks(sizes=(1, 100), repeat=1, max_loop=10, history=history, label='test', out=None)
+        self.assertEqual(len(records), 2 * len(bm.CASES))
+        self.assertEqual(set(r['case'] for r in records), set(name for name, make, loop in bm.CASES))
+        loop = [r for r in records if r['case'] == 'solve_nonlinear' and r['n'] == 100][0]
+        self.assertEqual(loop['n_run'], 10)
+        self.assertEqual(len(set(r['run_id'] for r in records)), 1)
+        gradient = [r for r in records if r['case'] == 'problem_gradient' and r['n'] == 100][0]
+        self.assertGreater(gradient['seconds'], 0.0)
+        with open(history) as f:
+            self.assertEqual([json.loads(line)['label'] for line in f], ['test'] * len(records))
+
+    def testRegressions(self):
+        history = os.path.join(self.tmp, 'history.jsonl')
+        with open(history, 'w') as f:
+            for time, per_eval in (('t0', 1e-6), ('t1', 2e-6)):
+                f.write(json.dumps({'time': time, 'case': 'batch_lcoe', 'n': 1000, 'per_eval_s': per_eval,
+                                    'peak_bytes': 100}) + '\n')
+        self.assertEqual(bm.check_regressions(history), [('batch_lcoe', 1000, 'per_eval_s', 1e-6, 2e-6)])
+
+    def testSameSecond(self):
+        # Two runs stamped with the same second are still two runs
+        history = os.path.join(self.tmp, 'history.jsonl')
+        with open(history, 'w') as f:
+            for run_id, peak in (('a', 100), ('b', 200)):
+                f.write(json.dumps({'run_id': run_id, 'time': 't0', 'case': 'batch_lcoe', 'n': 1000,
+                                    'per_eval_s': 1e-6, 'peak_bytes': peak}) + '\n')
+        self.assertEqual(bm.check_regressions(history), [('batch_lcoe', 1000, 'peak_bytes', 100, 200)])
+
+if __name__ == '__main__':
+    unittest.main()
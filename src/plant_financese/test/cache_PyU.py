@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.cache as ch
+import plant_financese.core as core
+import plant_financese.monte_carlo as mc
+import plant_financese.sweep as sw
+from plant_financese.validation import PlantFinanceInputError
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'results.sqlite')
+        self.columns = {'turbine_cost': np.linspace(1e6, 2e6, 200), 'turbine_number': 50,
+                        'turbine_bos_costs': 7.7e5, 'turbine_avg_annual_opex': 7e4,
+                        'turbine_aep': 1.6e7, 'machine_rating': 5.0}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def testKeys(self):
+        keys = ch.scenario_keys(self.columns)
+        self.assertEqual(len(set(keys)), 200)
+        # Defaults, -0.0 and the int/float type of a column do not change the key
+        same = dict(self.columns, fixed_charge_rate=0.12, sea_depth=-0.0, turbine_number=50.0)
+        self.assertEqual(ch.scenario_keys(same), keys)
+        self.assertNotEqual(ch.scenario_keys(self.columns, use_dcf=True), keys)
+        self.assertNotEqual(ch.scenario_keys(dict(self.columns, tax_rate=0.3)), keys)
+
+    def testHitsAndMisses(self):
+        for use_dcf in (False, True):
+            cache = ch.ResultCache(self.path)
+            expected = core.evaluate_batch(self.columns, use_dcf)
+            out = ch.evaluate_cached(self.columns, cache, use_dcf)
+            self.assertEqual((cache.hits, cache.misses), (0, 200))
+            for name in expected:
+                npt.assert_equal(out[name], expected[name])
+
+            more = dict(self.columns, turbine_cost=np.r_[self.columns['turbine_cost'], np.linspace(2.5e6, 3e6, 199)])
+            out = ch.evaluate_cached(more, self.path, use_dcf)
+            npt.assert_equal(out['lcoe'], core.evaluate_batch(more, use_dcf)['lcoe'])
+            found, _ = cache.get_many(ch.scenario_keys(more, use_dcf), 9 if use_dcf else 7)
+            self.assertEqual(found.sum(), 399)
+        self.assertEqual(len(ch.ResultCache(self.path)), 2 * 399)
+
+    def testPolicy(self):
+        bad = dict(self.columns, turbine_number=np.r_[50, 0, 50], turbine_cost=1.5e6)
+        cache = ch.ResultCache(self.path)
+        self.assertRaises(PlantFinanceInputError, ch.evaluate_cached, bad, cache)
+        out = ch.evaluate_cached(bad, cache, policy='nan')
+        self.assertTrue(np.isnan(out['lcoe'][1]))
+        self.assertEqual(out['status'][1] & 1, 1)
+        out = ch.evaluate_cached(bad, cache, policy='nan')
+        self.assertEqual(cache.hits, 3)
+        npt.assert_equal(np.isnan(out['lcoe']), [False, True, False])
+
+    def testSweepPool(self):
+        spec = sw.ScenarioList({'turbine_cost': np.linspace(1e6, 2e6, 1000)}, fixed=self.columns)
+        spec.fixed.pop('turbine_cost')
+        sw.run_sweep(spec, os.path.join(self.tmp, 'first'), chunk_size=128, processes=2, cache=self.path)
+        cache = ch.ResultCache(self.path)
+        self.assertEqual(len(cache), 1000)
+        sw.run_sweep(spec, os.path.join(self.tmp, 'second'), chunk_size=128, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1000, 0))
+        npt.assert_equal(sw.load_sweep(os.path.join(self.tmp, 'first'))['lcoe'],
+                         sw.load_sweep(os.path.join(self.tmp, 'second'))['lcoe'])
+
+    def testMonteCarlo(self):
+        inputs = dict(self.columns, turbine_cost=mc.Normal(1.5e6, 1e5))
+        a = mc.run_monte_carlo(inputs, 5000, chunk_size=1000, seed=3, processes=2, cache=self.path)
+        b = mc.run_monte_carlo(inputs, 5000, chunk_size=1000, seed=3)
+        self.assertEqual(len(ch.ResultCache(self.path)), 5000)
+        self.assertEqual(a['lcoe'].summary(), b['lcoe'].summary())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+import unittest
+import numpy.testing as npt
+import plant_financese
+import plant_financese.core as core
+
+
+class TestCoreImport(unittest.TestCase):
+    def modules_after(self, statement):
+        code = '%s; import sys; print(sorted(m for m in sys.modules if m.split(".")[0] in ("openmdao", "plant_financese")))'
+        return subprocess.check_output([sys.executable, '-c', code % statement]).decode()
+
+    def testNoOpenMDAO(self):
+        for statement in ('import plant_financese.core', 'import plant_financese.sweep',
+                          'import plant_financese.monte_carlo', 'import plant_financese.streaming',
+                          'import plant_financese.sensitivity', 'import plant_financese.report',
+                          'import plant_financese.timeseries', 'import plant_financese.offshore',
+                          'import plant_financese.portfolio', 'import plant_financese.cache',
+                          'import plant_financese.service', 'import plant_financese.shared',
+                          'import plant_financese.scenarios', 'import plant_financese.doe'):
+            self.assertNotIn('openmdao', self.modules_after(statement), statement)
+
+    def testLazyComponent(self):
+        from plant_financese.plant_finance import PlantFinance, PlantFinanceMulti, PlantFinanceTurbines
+        self.assertIs(plant_financese.PlantFinance, PlantFinance)
+        self.assertIs(plant_financese.PlantFinanceMulti, PlantFinanceMulti)
+        self.assertIs(plant_financese.PlantFinanceTurbines, PlantFinanceTurbines)
+        self.assertIn('openmdao', self.modules_after('from plant_financese import PlantFinance'))
+        with self.assertRaises(AttributeError):
+            plant_financese.NotAComponent
+
+    def testReexported(self):
+        import plant_financese.plant_finance as pf
+        self.assertIs(pf.batch_lcoe, core.batch_lcoe)
+        self.assertIs(pf.factor_cache, core.factor_cache)
+        out = core.batch_lcoe(1.2e6, 50, 7.7e5, 7e4, 1.6e7, 5.0)
+        npt.assert_allclose(out['lcoe'], ((1.2e6 + 7.7e5) * 0.12 + 7e4) / 1.6e7)
+
+
+if __name__ == '__main__':
+    unittest.main()
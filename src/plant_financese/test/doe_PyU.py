@@ -0,0 +1,83 @@
+import shutil
+import subprocess
+import sys
+import tempfile
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.core as core
+import plant_financese.doe as doe
+from scipy.stats import qmc
+import plant_financese.sweep as sw
+
+RANGES = {'turbine_cost': (1e6, 2e6), 'turbine_bos_costs': (5e5, 1e6), 'turbine_avg_annual_opex': (5e4, 9e4),
+          'turbine_aep': (1.2e7, 1.8e7), 'machine_rating': (3.0, 8.0), 'fixed_charge_rate': (0.08, 0.12),
+          'wake_loss_factor': (0.0, 0.2)}
+
+def is_latin(u):
+    # Every one of the n strata of every dimension holds exactly one point
+    n = len(u)
+    return all(len(np.unique(np.floor(u[:, k] * n))) == n for k in range(u.shape[1]))
+
+class TestDesign(unittest.TestCase):
+    def testSlicedLatinHypercube(self):
+        design = doe.Design(RANGES, 4000, 'lhs', seed=5, chunk_size=500)
+        u = design.unit(0, 4000)
+        self.assertTrue(is_latin(u))
+        for s in range(8):
+            self.assertTrue(is_latin(u[500 * s:500 * (s + 1)]))
+        # Any chunk bounds give the same points
+        npt.assert_equal(design.unit(730, 1900), u[730:1900])
+        self.assertRaises(ValueError, doe.Design, RANGES, 4001, 'lhs', chunk_size=500)
+
+    def testSequences(self):
+        for method in ('sobol', 'halton'):
+            design = doe.Design(RANGES, 3000, method, seed=2)
+            u = design.unit(0, 3000)
+            self.assertTrue(((u >= 0.0) & (u < 1.0)).all())
+            npt.assert_equal(design.unit(1234, 2345), u[1234:2345])
+            # A point does not depend on the chunk it is drawn in
+            npt.assert_equal(design.unit(0, 1000), u[:1000])
+            npt.assert_equal(np.concatenate([design.unit(a, b) for a, b in ((0, 7), (7, 100), (100, 3000))]), u)
+            # Low discrepancy: much more even than random points
+            self.assertLess(qmc.discrepancy(u), 0.1 * qmc.discrepancy(np.random.default_rng(0).random(u.shape)))
+        npt.assert_allclose(doe.halton(0, 4, 2), [[0.5, 1. / 3], [0.25, 2. / 3], [0.75, 1. / 9], [0.125, 4. / 9]])
+
+    def testNoScipy(self):
+        # SciPy is only imported by the Sobol method
+        code = 'import sys, plant_financese.doe as doe; doe.Design({"turbine_cost": (1e6, 2e6)}, 8, "halton").chunk(0, 8); ' \
+               'print("scipy" in sys.modules)'
+        self.assertEqual(subprocess.check_output([sys.executable, '-c', code]).decode().strip(), 'False')
+
+    def testMaximin(self):
+        plain = doe.Design(RANGES, 60, 'lhs', seed=1, chunk_size=60).unit(0, 60)
+        design = doe.Design(RANGES, 60, 'maximin', seed=1)
+        u = design.unit(0, 60)
+        self.assertTrue(is_latin(u))
+        self.assertLess(doe.maximin_criterion(u)[0], doe.maximin_criterion(plain)[0])
+        self.assertGreater(doe.maximin_criterion(u)[1], doe.maximin_criterion(plain)[1])
+
+    def testEvaluate(self):
+        design = doe.Design(RANGES, 10000, 'sobol', seed=3, fixed={'turbine_number': 50}, chunk_size=3000)
+        chunks = list(doe.evaluate_design(design, use_dcf=True))
+        self.assertEqual([len(out['lcoe']) for inputs, out in chunks], [3000, 3000, 3000, 1000])
+        inputs, out = chunks[1]
+        for name, (low, high) in RANGES.items():
+            self.assertTrue(((inputs[name] >= low) & (inputs[name] <= high)).all())
+        npt.assert_equal(out['lcoe'], core.evaluate_batch(dict(core.PARAM_DEFAULTS, **inputs), use_dcf=True)['lcoe'])
+        self.assertRaises(ValueError, doe.Design, {'turbine_cst': (0, 1)}, 10)
+        self.assertRaises(ValueError, doe.Design, RANGES, 10, 'grid')
+
+    def testSweep(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            design = doe.Design(RANGES, 2000, 'lhs', seed=4, fixed={'turbine_number': 50}, chunk_size=500)
+            sw.run_sweep(design, tmp, chunk_size=500, processes=2, save_inputs=True)
+            res = sw.load_sweep(tmp)
+            self.assertTrue(is_latin((res['input:turbine_cost'][:, np.newaxis] - 1e6) / 1e6))
+            npt.assert_equal(res['input:machine_rating'], design.chunk(0, 2000)['machine_rating'])
+        finally:
+            shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    unittest.main()
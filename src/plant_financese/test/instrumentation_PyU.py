@@ -0,0 +1,53 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import unittest
+import plant_financese.plant_finance as pf
+import plant_financese.instrumentation as ins
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.params = dict(pf.PARAM_DEFAULTS)
+        self.params.update(turbine_cost=1.2e6, turbine_number=50, turbine_bos_costs=7.7e5,
+                           turbine_avg_annual_opex=7e4, turbine_aep=1.6e7, machine_rating=5.0)
+
+    def testCounters(self):
+        mypfin = pf.PlantFinance()
+        self.assertFalse('solve_nonlinear' in mypfin.__dict__)
+        mypfin.enable_instrumentation()
+        for cost in [1.0e6, 1.0e6, 1.1e6, 1.1e6, 1.1e6]:
+            self.params['turbine_cost'] = cost
+            mypfin.solve_nonlinear(self.params, {}, {})
+        mypfin.linearize(self.params, {}, {})
+
+        stats = mypfin.instrumentation.as_dict()
+        self.assertEqual(stats['solve_nonlinear']['count'], 5)
+        self.assertEqual(stats['solve_nonlinear']['unchanged_inputs'], 3)
+        self.assertEqual(stats['linearize']['count'], 1)
+        s = stats['solve_nonlinear']
+        self.assertTrue(0.0 < s['min_s'] <= s['p50_s'] <= s['p99_s'] <= s['max_s'])
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, 'stats.json')
+        mypfin.instrumentation.dump(path)
+        with open(path) as f:
+            self.assertEqual(json.load(f)['linearize']['count'], 1)
+        os.remove(path)
+
+        instrumentation = mypfin.disable_instrumentation()
+        self.assertFalse('solve_nonlinear' in mypfin.__dict__)
+        mypfin.solve_nonlinear(self.params, {}, {})
+        self.assertEqual(instrumentation.stats['solve_nonlinear'].count, 5)
+
+    def testPercentile(self):
+        stats = ins.CallStats()
+        for t in np.linspace(1e-5, 1e-3, 1000):
+            stats.record(t)
+        self.assertTrue(4e-4 < stats.percentile(50) < 7e-4)
+        self.assertEqual(stats.percentile(100), 1e-3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.monte_carlo as mc
+
+class TestStreamingStats(unittest.TestCase):
+    def testChunkedMatchesNumpy(self):
+        x = np.random.RandomState(0).lognormal(0.0, 0.5, 100001)
+        stats = mc.StreamingStats()
+        for chunk in np.array_split(x, 7):
+            stats.update(chunk)
+        npt.assert_allclose(stats.mean, x.mean(), rtol=1e-12)
+        npt.assert_allclose(stats.variance, x.var(ddof=1), rtol=1e-10)
+        self.assertEqual((stats.min, stats.max), (x.min(), x.max()))
+        npt.assert_allclose(stats.quantile([0.1, 0.5, 0.9]), np.percentile(x, [10, 50, 90]), rtol=2e-3)
+
+    def testMerge(self):
+        x = np.random.RandomState(1).normal(0.0, 1.0, 5000)
+        a, b, c = mc.StreamingStats(), mc.StreamingStats(), mc.StreamingStats()
+        a.update(x[:1000])
+        b.update(np.append(x[1000:], np.nan))
+        c.update(x)
+        a.merge(b)
+        npt.assert_allclose([a.mean, a.variance], [c.mean, c.variance], rtol=1e-12)
+        self.assertEqual(a.nan, 1)
+        npt.assert_allclose(a.quantile(0.25), c.quantile(0.25))
+
+class TestMonteCarlo(unittest.TestCase):
+    def setUp(self):
+        self.inputs = {'turbine_cost': mc.Normal(1.2e6, 1e5),
+                       'turbine_number': 50,
+                       'turbine_bos_costs': mc.Triangular(6e5, 7.7e5, 1e6),
+                       'turbine_avg_annual_opex': mc.LogNormal(np.log(7e4), 0.1),
+                       'turbine_aep': mc.Empirical([1.4e7, 1.6e7, 1.7e7]),
+                       'wake_loss_factor': mc.Uniform(0.05, 0.15),
+                       'machine_rating': 5.0,
+                       'discount_rate': mc.Uniform(0.05, 0.09)}
+
+    def testReproducible(self):
+        a = mc.run_monte_carlo(self.inputs, 25000, chunk_size=4000, seed=42, use_dcf=True)
+        b = mc.run_monte_carlo(self.inputs, 25000, chunk_size=4000, seed=42, use_dcf=True,
+                               processes=2)
+        self.assertEqual(a['lcoe'].count, 25000)
+        self.assertEqual(a['lcoe'].summary(), b['lcoe'].summary())
+
+    def testOutputs(self):
+        stats = mc.run_monte_carlo(self.inputs, 1000, chunk_size=300, seed=1, outputs=('lcoe', 'coe', 'icc'))
+        self.assertEqual(sorted(stats.keys()), ['coe', 'icc', 'lcoe'])
+        self.assertTrue(stats['lcoe'].quantile(0.9) > stats['lcoe'].quantile(0.5))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import warnings
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.offshore as off
+import plant_financese.core as core
+import plant_financese.plant_finance as pf
+from plant_financese.validation import ZERO_OPEX
+from plant_financese.test.plant_finance_PyU import connected_problem, assert_partials
+
+class TestOffshoreCosts(unittest.TestCase):
+    def setUp(self):
+        self.table = off.DEFAULT_OFFSHORE_COSTS
+        self.base  = dict(core.PARAM_DEFAULTS, turbine_cost=1.2e6, turbine_number=50, turbine_bos_costs=7.7e5,
+                          turbine_avg_annual_opex=7e4, turbine_aep=1.6e7, machine_rating=5.0)
+
+    def testInterpolation(self):
+        depth = np.linspace(-5.0, 120.0, 1001)
+        m = self.table.lookup(depth)
+        for k, name in enumerate(off.MULTIPLIERS):
+            expected = np.where(depth > 0.0, np.interp(depth, self.table.depths, self.table.table[k]), 1.0)
+            npt.assert_allclose(m[name], expected, rtol=1e-14)
+        # Uneven depths go through the search path
+        uneven = off.OffshoreCostTable([0.0, 15.0, 60.0], [1.0, 1.1, 1.7], [1.0, 1.05, 1.3], [1.0, 1.02, 1.1])
+        self.assertIsNone(uneven.step)
+        npt.assert_allclose(uneven.lookup(depth)['om'], np.where(depth > 0.0, np.interp(depth, [0.0, 15.0, 60.0],
+                                                                                          [1.0, 1.02, 1.1]), 1.0))
+        self.assertRaises(ValueError, off.OffshoreCostTable, [0.0, 0.0], [1, 1], [1, 1], [1, 1])
+
+    def testRaster(self):
+        raster = np.linspace(0.0, 90.0, 12).reshape(3, 4)
+        out = core.evaluate_batch(dict(self.base, sea_depth=raster), offshore_costs=self.table)
+        self.assertEqual(out['lcoe'].shape, (3, 4))
+        m = self.table.lookup(raster)
+        expected = core.batch_lcoe(**dict(self.base, turbine_bos_costs=7.7e5 * m['bos'],
+                                          turbine_avg_annual_opex=7e4 * m['om']))
+        npt.assert_allclose(out['lcoe'], expected['lcoe'], rtol=1e-14)
+        self.assertEqual(out['lcoe'][0, 0], core.batch_lcoe(**self.base)['lcoe'])
+        self.assertTrue(np.all(np.diff(out['lcoe'].ravel()) >= 0.0))
+        self.assertGreater(out['lcoe'][-1, -1], out['lcoe'][0, 0])
+
+    def testComponent(self):
+        params = dict(self.base, sea_depth=35.0)
+        unknowns = {}
+        pf.PlantFinance(offshore_costs=self.table).solve_nonlinear(params, unknowns, {})
+        out = core.evaluate_batch(params, offshore_costs=self.table)
+        npt.assert_allclose(unknowns['lcoe'], out['lcoe'], rtol=1e-14)
+
+    def testAdjustedValidation(self):
+        # The O&M multiplier reaches zero at 100 m, only the adjusted opex is invalid
+        table = off.OffshoreCostTable([0.0, 100.0], [1.0, 1.5], [1.0, 1.2], [1.0, 0.0])
+        params = dict(self.base, sea_depth=100.0)
+        comp = pf.PlantFinance(policy='nan', offshore_costs=table)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            comp.solve_nonlinear(params, {}, {})
+            out = core.evaluate_batch(params, policy='nan', offshore_costs=table)
+        self.assertEqual(comp.status, out['status'])
+        self.assertEqual(comp.status, ZERO_OPEX)
+
+    def testPartials(self):
+        for use_dcf in (False, True):
+            prob = connected_problem(pf.PlantFinance(use_dcf=use_dcf, offshore_costs=self.table), exclude=['park_aep'])
+            for name in ('turbine_cost', 'turbine_number', 'turbine_bos_costs', 'turbine_avg_annual_opex',
+                         'turbine_aep', 'machine_rating'):
+                prob[name] = self.base[name]
+            prob['sea_depth'] = 35.0
+            prob.run()
+            data = prob.check_partial_derivatives(out_stream=None)['pf']
+            assert_partials(data)
+            self.assertNotEqual(data['lcoe', 'sea_depth']['J_fwd'][0, 0], 0.0)
+
+    def testMultiPartials(self):
+        prob = connected_problem(pf.PlantFinanceMulti(3, offshore_costs=self.table), exclude=['park_aep'])
+        for name in ('turbine_cost', 'turbine_number', 'turbine_bos_costs', 'turbine_avg_annual_opex',
+                     'turbine_aep', 'machine_rating'):
+            prob[name] = np.full(3, float(self.base[name]))
+        prob['sea_depth'] = np.array([0.0, 25.0, 75.0])
+        prob.run()
+        assert_partials(prob.check_partial_derivatives(out_stream=None)['pf'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,32 @@ import numpy as np
 import numpy.testing as npt
 import unittest
 import plant_financese.plant_finance as pf
-from openmdao.api import Problem, Group
+from plant_financese.validation import PlantFinanceInputError, ZERO_AEP
+from openmdao.api import Problem, Group, IndepVarComp
+
+
+def connected_problem(comp, exclude=()):
+    # Problem with the params of comp connected to an IndepVarComp, so that partials are checked.
+    # Partials are checked with relative steps, the costs and AEPs are far from unit scale. A zero
+    # park_aep sits on the switch to the turbine AEP fallback, stepping it would wreck the check.
+    prob = Problem(root=Group())
+    indeps = IndepVarComp([(name, meta['val'], {'pass_by_obj': meta.get('pass_by_obj', False)})
+                           for name, meta in comp._init_params_dict.items() if name not in exclude])
+    comp.deriv_options['check_step_calc'] = 'relative'
+    prob.root.add('indeps', indeps, promotes=['*'])
+    prob.root.add('pf', comp, promotes=['*'])
+    prob.setup(check=False, out_stream=None)
+    return prob
+
+
+def assert_partials(data, skip=('construction_time', 'project_lifetime'), rtol=1e-4, atol=1e-10):
+    # Analytic against finite-difference partials in both modes. The year grid params have no partials by design.
+    assert data, 'no partials were checked'
+    for key, err in data.items():
+        if key[1] in skip:
+            continue
+        for mode in ('J_fwd', 'J_rev'):
+            npt.assert_allclose(err[mode], err['J_fd'], rtol=rtol, atol=atol, err_msg=str(key + (mode,)))
 
 class TestPlantFinance(unittest.TestCase):
     def setUp(self):
@@ -43,9 +68,409 @@ class TestPlantFinance(unittest.TestCase):
         for k in self.params.keys(): prob[k] = self.params[k]        
         prob.check_total_derivatives()
         
+
+class TestBatchLcoe(unittest.TestCase):
+    def setUp(self):
+        self.params = {}
+        self.params['sea_depth'] = 0.0
+        self.params['turbine_number'] = 50
+        self.params['turbine_cost'] = 1.2e6
+        self.params['turbine_bos_costs'] = 7.7e5
+        self.params['turbine_avg_annual_opex'] = 7e4
+        self.params['park_aep'] = 0.0
+        self.params['turbine_aep'] = 1.6e7
+        self.params['wake_loss_factor'] = 0.15
+        self.params['net_energy_capture'] = 0.0
+        self.params['machine_rating'] = 5.0
+        self.params['fixed_charge_rate'] = 0.12
+        self.params['tax_rate'] = 0.4
+        self.params['discount_rate'] = 0.07
+        self.params['construction_time'] = 1.0
+        self.params['project_lifetime'] = 20.0
+
+    def testMatchesScalar(self):
+        rng = np.random.RandomState(3)
+        n = 50
+        batch = dict(self.params)
+        batch['turbine_cost'] = rng.uniform(0.5e6, 5e6, n)
+        batch['turbine_aep'] = rng.uniform(5e6, 3e7, n)
+        batch['machine_rating'] = rng.uniform(1.5, 10.0, n)
+        batch['turbine_number'] = rng.randint(1, 200, n)
+        out = pf.batch_lcoe(**batch)
+
+        mypfin = pf.PlantFinance()
+        for k in range(n):
+            params = dict(self.params)
+            for name in ['turbine_cost', 'turbine_aep', 'machine_rating', 'turbine_number']:
+                params[name] = batch[name][k]
+            unknowns = {}
+            mypfin.solve_nonlinear(params, unknowns, {})
+            self.assertEqual(out['lcoe'][k], unknowns['lcoe'])
+
+        npt.assert_allclose(out['park_aep'], batch['turbine_number'] * batch['turbine_aep'] * 0.85)
+        self.assertEqual(out['icc'].shape, (n,))
+
+    def testBroadcast(self):
+        out = pf.batch_lcoe(**self.params)
+        self.assertEqual(out['lcoe'].shape, ())
+        npt.assert_allclose(out['coe'], (0.12*(1.2e6+7.7e5) + 0.6*7e4)/1.6e7)
+        npt.assert_allclose(out['lcoe'], (0.12*(1.2e6+7.7e5) + 7e4)/1.6e7)
+
+
+class TestPlantFinanceDerivatives(unittest.TestCase):
+    def setUp(self):
+        prob = connected_problem(pf.PlantFinance())
+        prob['turbine_number'] = 50
+        prob['turbine_cost'] = 1.2e6
+        prob['turbine_bos_costs'] = 7.7e5
+        prob['turbine_avg_annual_opex'] = 7e4
+        prob['turbine_aep'] = 1.6e7
+        prob['machine_rating'] = 5.0
+        prob['fixed_charge_rate'] = 0.12
+        prob.run()
+        self.prob = prob
+
+    def testPartials(self):
+        assert_partials(self.prob.check_partial_derivatives(out_stream=None)['pf'], rtol=1e-5, atol=1e-12)
+
+    def testPartialsDCF(self):
+        prob = connected_problem(pf.PlantFinance(use_dcf=True), exclude=['park_aep'])
+        for k in ['turbine_number', 'turbine_cost', 'turbine_bos_costs', 'turbine_avg_annual_opex',
+                  'turbine_aep', 'machine_rating']:
+            prob[k] = self.prob[k]
+        prob['wake_loss_factor'] = 0.1
+        prob['construction_time'] = 1.5
+        prob['project_lifetime'] = 24.5
+        prob.run()
+        assert_partials(prob.check_partial_derivatives(out_stream=None)['pf'])
+
+    def testParamDefaults(self):
+        params = self.prob.root.pf._init_params_dict
+        self.assertEqual(list(params.keys()), list(pf.PARAM_DEFAULTS.keys()))
+        for name, meta in params.items():
+            self.assertEqual(meta['val'], pf.PARAM_DEFAULTS[name])
+
+    def testSparsity(self):
+        J = self.prob.root.pf.linearize(self.prob.root.pf.params, self.prob.root.pf.unknowns, None)
+        J = dict((k, v) for k, v in J.items() if k[0] == 'lcoe')
+        self.assertEqual(set(J.keys()), set([('lcoe', 'turbine_cost'), ('lcoe', 'turbine_bos_costs'),
+                                             ('lcoe', 'turbine_avg_annual_opex'), ('lcoe', 'turbine_aep'),
+                                             ('lcoe', 'fixed_charge_rate')]))
+
+
+class TestDCF(unittest.TestCase):
+    def testAnnuityEquivalence(self):
+        # Without taxes, whole-year periods and all capex at year 0, the cash-flow LCOE is the
+        # capital recovery factor applied to capex plus opex, over energy
+        r, tp = 0.07, 20.0
+        crf = r / (1. - (1. + r)**(-tp))
+        capex = np.array([1e8, 2e8])
+        lcoe = pf.dcf_lcoe(capex, 3e6, 6e8, 0.0, r, 0.0, tp)
+        npt.assert_allclose(lcoe, (crf*capex + 3e6)/6e8)
+
+    def testCashFlowShape(self):
+        years, cost, energy, discount = pf.dcf_cash_flows(np.ones(3), 0.1, 1.0, 0.4, 0.07,
+                                                          [1.0, 2.0, 2.5], [20.0, 25.0, 30.0])
+        self.assertEqual(cost.shape, (3, 33))
+        npt.assert_allclose(energy.sum(axis=1), 0.6*np.array([20.0, 25.0, 30.0]))
+        # Capex is fully drawn and fully depreciated
+        npt.assert_allclose(cost.sum(axis=1), 1.0 + 0.06*np.array([20.0, 25.0, 30.0]) - 0.4)
+
+    def testMatchesComponent(self):
+        params = {'sea_depth': 0.0, 'turbine_number': 50, 'turbine_cost': 1.2e6, 'turbine_bos_costs': 7.7e5,
+                  'turbine_avg_annual_opex': 7e4, 'park_aep': 0.0, 'turbine_aep': 1.6e7, 'wake_loss_factor': 0.15,
+                  'net_energy_capture': 0.0, 'machine_rating': 5.0, 'fixed_charge_rate': 0.12, 'tax_rate': 0.4,
+                  'discount_rate': 0.07, 'construction_time': 1.0, 'project_lifetime': 20.0}
+        unknowns = {}
+        pf.PlantFinance(use_dcf=True).solve_nonlinear(params, unknowns, {})
+        batch = dict(params)
+        batch['discount_rate'] = np.array([0.05, 0.07, 0.09])
+        out = pf.batch_dcf(**batch)
+        npt.assert_allclose(out['lcoe'][1], unknowns['lcoe'], rtol=1e-14)
+        self.assertTrue(np.all(np.diff(out['lcoe']) > 0.0))
+        npt.assert_allclose(out['coe'], unknowns['coe'])
+
+
+class TestFactorCache(unittest.TestCase):
+    def testAmortization(self):
+        r = 0.07
+        a = (1 + 0.5*((1+r)**1.0 - 1)) * (r/(1-(1+r)**(-20.0)))
+        cache = pf.FactorCache()
+        self.assertEqual(cache.get(r, 1.0, 20.0)[0], a)
+
+    def testMatchesCashFlows(self):
+        capex, opex, energy = 9.85e7, 3.5e6, 6.8e8
+        r = np.array([0.05, 0.07, 0.05, 0.09, 0.07])
+        tc = np.array([1.0, 1.5, 1.0, 2.0, 1.5])
+        tp = np.array([20.0, 25.0, 20.0, 30.0, 25.0])
+        years, cost, en, discount = pf.dcf_cash_flows(capex, opex, energy, 0.4, r, tc, tp)
+        npt.assert_allclose(pf.dcf_lcoe(capex, opex, energy, 0.4, r, tc, tp),
+                            (cost*discount).sum(axis=1) / (en*discount).sum(axis=1), rtol=1e-13)
+
+    def testCounters(self):
+        cache = pf.FactorCache(maxsize=2)
+        cache.lookup([0.05, 0.07, 0.05], 1.0, 20.0)
+        self.assertEqual(cache.cache_info(), {'hits': 0, 'misses': 2, 'size': 2, 'maxsize': 2})
+        cache.get(0.07, 1.0, 20.0)
+        cache.get(0.09, 1.0, 20.0)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 3, 2))
+        # 0.05 was least recently used and has been evicted
+        cache.get(0.05, 1.0, 20.0)
+        self.assertEqual(cache.misses, 4)
+
+    def testManyKeysBypass(self):
+        # Sampled rates are computed directly and leave the cached triples alone
+        cache = pf.FactorCache(batch_keys=8)
+        cache.get(0.07, 1.0, 20.0)
+        r = np.random.RandomState(3).uniform(0.05, 0.09, 100)
+        tp = np.where(np.arange(100) % 2, 20.0, 25.0)
+        f = cache.lookup(r, 1.5, tp)
+        expected = pf.finance_factors(r, 1.5, tp)
+        for name in pf.FACTOR_NAMES:
+            npt.assert_allclose(f[name], expected[name], rtol=1e-14)
+        self.assertEqual((cache.uncached, len(cache), cache.misses), (100, 1, 1))
+        f = cache.lookup(np.r_[r[:3], r[:3]], 1.5, 20.0)
+        npt.assert_allclose(f['pv_oper'][3:], f['pv_oper'][:3], rtol=0)
+        self.assertEqual(len(cache), 4)
+
+    def testPrecompute(self):
+        cache = pf.FactorCache()
+        table = cache.precompute([0.05, 0.07, 0.09], [1.0, 2.0], np.arange(10., 31.))
+        self.assertEqual(table['pv_oper'].shape, (3, 2, 21))
+        self.assertEqual(len(cache), 126)
+        f = cache.lookup(0.07, 2.0, 25.0)
+        self.assertEqual(cache.misses, 0)
+        npt.assert_allclose(f['pv_oper'], table['pv_oper'][1, 1, 15])
+
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.params = dict(pf.PARAM_DEFAULTS)
+        self.params.update(turbine_cost=1.2e6, turbine_number=50, turbine_bos_costs=7.7e5,
+                           turbine_avg_annual_opex=7e4, turbine_aep=1.6e7, machine_rating=5.0)
+
+    def testRecompute(self):
+        mypfin = pf.PlantFinance()
+        terms = mypfin.terms
+        mypfin.solve_nonlinear(self.params, {}, {})
+        self.assertEqual(terms.recomputed, 6)
+        unknowns = {}
+        mypfin.solve_nonlinear(self.params, unknowns, {})
+        self.assertEqual(terms.recomputed, 6)
+        self.assertEqual(unknowns['lcoe'], terms.values['lcoe_fcr'])
+        # turbine_cost only feeds icc, then coe and lcoe
+        self.params['turbine_cost'] = 1.3e6
+        mypfin.solve_nonlinear(self.params, unknowns, {})
+        self.assertEqual(terms.recomputed, 9)
+        # discount_rate does not enter the fixed charge rate LCOE
+        self.params['discount_rate'] = 0.08
+        mypfin.solve_nonlinear(self.params, unknowns, {})
+        self.assertEqual(terms.recomputed, 9)
+
+    def testMatchesFull(self):
+        rng = np.random.RandomState(5)
+        for use_dcf in [False, True]:
+            incremental, full = pf.PlantFinance(use_dcf=use_dcf), pf.PlantFinance(use_dcf=use_dcf, incremental=False)
+            params = dict(self.params)
+            for k in range(50):
+                name = ['turbine_cost', 'turbine_aep', 'machine_rating', 'tax_rate', 'discount_rate',
+                        'wake_loss_factor'][rng.randint(6)]
+                params[name] = params[name] * rng.uniform(0.9, 1.1)
+                a, b = {}, {}
+                incremental.solve_nonlinear(params, a, {})
+                full.solve_nonlinear(params, b, {})
+                self.assertEqual(a, b)
+            self.assertTrue(incremental.terms.recomputed < full.terms.recomputed)
+
+    def testInvalidNotCached(self):
+        mypfin = pf.PlantFinance(policy='nan')
+        self.params['turbine_cost'] = 0.0
+        unknowns = {}
+        mypfin.solve_nonlinear(self.params, unknowns, {})
+        mypfin.solve_nonlinear(self.params, unknowns, {})
+        self.assertTrue(np.isnan(unknowns['lcoe']))
+        self.assertEqual(mypfin.terms.recomputed, 0)
+
+    def testStatusRestored(self):
+        # valid, invalid, then the first valid inputs again from the cache
+        mypfin = pf.PlantFinance(policy='nan')
+        unknowns = {}
+        mypfin.solve_nonlinear(self.params, unknowns, {})
+        lcoe = unknowns['lcoe']
+        mypfin.solve_nonlinear(dict(self.params, turbine_cost=0.0), unknowns, {})
+        self.assertEqual(mypfin.status, 2)
+        mypfin.solve_nonlinear(self.params, unknowns, {})
+        self.assertEqual(mypfin.status, 0)
+        self.assertEqual(unknowns['lcoe'], lcoe)
+        self.assertEqual(mypfin.terms.recomputed, 6)
+
+    def testMaskRefused(self):
+        self.assertRaises(ValueError, pf.PlantFinance, policy='mask')
+
+    def testInvalidPartials(self):
+        mypfin = pf.PlantFinance(policy='nan')
+        errstate = np.geterr()
+        J = mypfin.linearize(dict(self.params, turbine_aep=0.0), {}, {})
+        self.assertTrue(np.isnan(J['lcoe', 'turbine_cost']))
+        self.assertEqual(np.geterr(), errstate)
+
+class TestPlantFinanceMulti(unittest.TestCase):
+    def setUp(self):
+        n = 4
+        self.columns = {'turbine_cost': np.linspace(1.0e6, 2.0e6, n), 'turbine_number': np.array([10., 50., 80., 120.]),
+                        'turbine_bos_costs': np.full(n, 7.7e5), 'turbine_avg_annual_opex': np.linspace(5e4, 9e4, n),
+                        'turbine_aep': np.linspace(1.2e7, 1.8e7, n), 'machine_rating': np.array([3.0, 5.0, 6.0, 8.0]),
+                        'wake_loss_factor': np.full(n, 0.1), 'park_aep': np.array([0.0, 0.0, 9.0e8, 0.0])}
+
+    def problem(self, exclude=(), **kwargs):
+        prob = connected_problem(pf.PlantFinanceMulti(4, **kwargs), exclude)
+        for name, values in self.columns.items():
+            prob[name] = values
+        prob.run()
+        return prob
+
+    def testMatchesBatch(self):
+        for use_dcf in (False, True):
+            prob = self.problem(use_dcf=use_dcf)
+            out = (pf.batch_dcf if use_dcf else pf.batch_lcoe)(**self.columns)
+            npt.assert_allclose(prob['lcoe'], out['lcoe'], rtol=1e-14)
+            npt.assert_allclose(prob['coe'], out['coe'], rtol=1e-14)
+
+    def testPartials(self):
+        for use_dcf in (False, True):
+            prob = self.problem(use_dcf=use_dcf, exclude=['park_aep'])
+            assert_partials(prob.check_partial_derivatives(out_stream=None)['pf'])
+        # With park_aep given for every plant the cash-flow lcoe depends on it and on turbine_number
+        self.columns['park_aep'] = np.linspace(4e8, 9e8, 4)
+        assert_partials(self.problem(use_dcf=True).check_partial_derivatives(out_stream=None)['pf'])
+
+    def testInvalidPlant(self):
+        self.columns['turbine_cost'] = np.array([1.0e6, 0.0, 1.5e6, 2.0e6])
+        prob = self.problem(policy='nan')
+        self.assertTrue(np.isnan(prob['lcoe'][1]))
+        self.assertTrue(np.isfinite(prob['lcoe'][[0, 2, 3]]).all())
+        comp = prob.root.pf
+        comp.linearize(comp.params, comp.unknowns, comp.resids)
+        self.assertTrue(np.isnan(comp.partials['lcoe', 'turbine_aep'][1]))
+
+
+class TestPlantFinanceTurbines(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(7)
+        n = 6
+        self.params = {'turbine_aep': rng.uniform(1.4e7, 1.8e7, n), 'wake_loss_factor': rng.uniform(0.02, 0.2, n),
+                       'turbine_cost': rng.uniform(1.0e6, 1.4e6, n), 'turbine_bos_costs': rng.uniform(6e5, 9e5, n),
+                       'turbine_avg_annual_opex': rng.uniform(5e4, 8e4, n)}
+
+    def problem(self, use_dcf, **kwargs):
+        prob = connected_problem(pf.PlantFinanceTurbines(6, use_dcf=use_dcf, **kwargs))
+        for name, values in self.params.items():
+            prob[name] = values
+        prob['construction_time'] = 1.5
+        prob.run()
+        return prob
+
+    def testMatchesBatch(self):
+        for use_dcf in (False, True):
+            out = pf.turbine_lcoe(construction_time=1.5, use_dcf=use_dcf, **self.params)
+            npt.assert_allclose(out['lcoe_contribution'].sum(), out['lcoe'], rtol=1e-14)
+            # Each turbine on its own is a one-turbine plant of the batch kernels
+            single = (pf.batch_dcf if use_dcf else pf.batch_lcoe)(
+                turbine_number=1, machine_rating=5.0, construction_time=1.5,
+                **dict(self.params, turbine_aep=self.params['turbine_aep'] * (1. - self.params['wake_loss_factor']),
+                       wake_loss_factor=0.0))
+            npt.assert_allclose(out['turbine_lcoe'], single['lcoe'], rtol=1e-12)
+
+    def testPartials(self):
+        for use_dcf in (False, True):
+            prob = self.problem(use_dcf)
+            data = prob.check_partial_derivatives(out_stream=None)['pf']
+            assert_partials(data)
+            G = pf.turbine_lcoe_gradient(construction_time=1.5, use_dcf=use_dcf, **self.params)
+            for name, grad in G.items():
+                npt.assert_allclose(np.ravel(grad), np.ravel(data['lcoe', name]['J_fwd']), rtol=1e-12, atol=1e-20,
+                                    err_msg=name)
+
+    def testInvalidTurbine(self):
+        self.params['turbine_aep'][2] = 0.0
+        self.assertRaises(PlantFinanceInputError, self.problem, False)
+        prob = self.problem(False, policy='nan')
+        self.assertEqual(prob.root.pf.status[2], ZERO_AEP)
+        npt.assert_equal(np.isnan(prob['turbine_lcoe']), [False, False, True, False, False, False])
+        self.assertTrue(np.isnan(prob['lcoe']) and np.isnan(prob['coe']))
+        self.assertTrue(np.isfinite(prob['park_aep']))
+        for mode in ('fwd', 'rev'):
+            J = prob.calc_gradient(['turbine_cost'], ['lcoe'], mode=mode)
+            self.assertTrue(np.isnan(J).all())
+        self.assertRaises(ValueError, pf.PlantFinanceTurbines, 6, policy='mask')
+
+
+class TestBatchVJP(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(3)
+        n = 500
+        self.columns = {'turbine_cost': rng.uniform(1e6, 2e6, n), 'turbine_number': rng.randint(10, 150, n).astype(float),
+                        'turbine_bos_costs': rng.uniform(5e5, 1e6, n), 'turbine_avg_annual_opex': rng.uniform(5e4, 9e4, n),
+                        'turbine_aep': rng.uniform(1.2e7, 1.8e7, n), 'machine_rating': rng.uniform(3.0, 8.0, n),
+                        'wake_loss_factor': rng.uniform(0.05, 0.15, n), 'fixed_charge_rate': rng.uniform(0.08, 0.12, n),
+                        'tax_rate': 0.35, 'discount_rate': rng.uniform(0.05, 0.09, n), 'sea_depth': rng.uniform(0, 80, n)}
+        self.seeds = {'lcoe': rng.normal(size=n), 'coe': rng.normal(size=n)}
+
+    def testFiniteDifferences(self):
+        from plant_financese.offshore import DEFAULT_OFFSHORE_COSTS
+        for use_dcf in (False, True):
+            for costs in (None, DEFAULT_OFFSHORE_COSTS):
+                grads = pf.batch_vjp(self.columns, self.seeds, use_dcf, costs)
+                for name in ('turbine_cost', 'turbine_number', 'turbine_bos_costs', 'turbine_avg_annual_opex',
+                             'turbine_aep', 'machine_rating', 'wake_loss_factor', 'fixed_charge_rate', 'discount_rate',
+                             'sea_depth'):
+                    h = 1e-6 * np.maximum(np.abs(self.columns[name]), 1.0)
+                    up = pf.evaluate_batch(dict(self.columns, **{name: self.columns[name] + h}), use_dcf, offshore_costs=costs)
+                    dn = pf.evaluate_batch(dict(self.columns, **{name: self.columns[name] - h}), use_dcf, offshore_costs=costs)
+                    fd = sum(self.seeds[out] * (up[out] - dn[out]) / (2 * h) for out in ('lcoe', 'coe'))
+                    # Compared as output changes over the step, round-off in the outputs sets the floor
+                    scale = np.abs(up['lcoe']).max() + np.abs(up['coe']).max()
+                    npt.assert_allclose(grads[name] * h, fd * h, rtol=1e-5, atol=1e-11 * scale, err_msg=name)
+                if costs is None:
+                    npt.assert_equal(grads['sea_depth'], 0.0)
+
+    def testAdjoint(self):
+        # <seeds, J t> == <J^T seeds, t> scenario by scenario
+        rng = np.random.RandomState(4)
+        for use_dcf in (False, True):
+            tangents = dict((name, rng.normal(size=500)) for name in pf.PARAM_DEFAULTS)
+            jvp = pf.batch_jvp(self.columns, tangents, use_dcf)
+            vjp = pf.batch_vjp(self.columns, self.seeds, use_dcf)
+            self.assertEqual(jvp['lcoe'].shape, (500,))
+            npt.assert_allclose(self.seeds['lcoe'] * jvp['lcoe'] + self.seeds['coe'] * jvp['coe'],
+                                sum(vjp[name] * tangents[name] for name in pf.PARAM_DEFAULTS), rtol=1e-10)
+
+    def testComponentProducts(self):
+        # PlantFinance apply_linear gives the batch products of a single scenario
+        columns = dict((name, np.atleast_1d(value)[0]) for name, value in self.columns.items())
+        columns['turbine_number'] = int(columns['turbine_number'])
+        prob = connected_problem(pf.PlantFinance(use_dcf=True), exclude=['park_aep'])
+        for name, value in columns.items():
+            prob[name] = value
+        prob.run()
+        data = prob.check_partial_derivatives(out_stream=None)['pf']
+        vjp = pf.batch_vjp(columns, {'lcoe': 1.0}, use_dcf=True)
+        for name in ('turbine_cost', 'turbine_aep', 'discount_rate'):
+            npt.assert_allclose(data['lcoe', name]['J_rev'], vjp[name], rtol=1e-12)
+        assert_partials(data)
+
+
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(TestPlantFinance))
+    suite.addTest(unittest.makeSuite(TestBatchLcoe))
+    suite.addTest(unittest.makeSuite(TestPlantFinanceDerivatives))
+    suite.addTest(unittest.makeSuite(TestDCF))
+    suite.addTest(unittest.makeSuite(TestFactorCache))
+    suite.addTest(unittest.makeSuite(TestIncremental))
+    suite.addTest(unittest.makeSuite(TestPlantFinanceMulti))
+    suite.addTest(unittest.makeSuite(TestPlantFinanceTurbines))
+    suite.addTest(unittest.makeSuite(TestBatchVJP))
     return suite
 
 if __name__ == '__main__':
@@ -0,0 +1,88 @@
+import itertools
+import time
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.portfolio as po
+import plant_financese.core as core
+
+def candidates(n_sites, rng):
+    # Two ratings per site, the larger one cheaper per MW but with site-dependent AEP
+    site   = np.repeat(np.arange(n_sites), 2)
+    rating = np.tile([3.0, 5.0], n_sites)
+    return site, {'machine_rating': rating,
+                  'turbine_cost': rating * rng.uniform(2.3e5, 2.8e5, 2 * n_sites),
+                  'turbine_bos_costs': rating * rng.uniform(1.2e5, 2.0e5, 2 * n_sites),
+                  'turbine_avg_annual_opex': rating * rng.uniform(1.2e4, 1.6e4, 2 * n_sites),
+                  'turbine_aep': rating * rng.uniform(2.2e6, 3.6e6, 2 * n_sites),
+                  'wake_loss_factor': rng.uniform(0.05, 0.15, 2 * n_sites)}
+
+class TestPortfolio(unittest.TestCase):
+    def testTerms(self):
+        # One candidate on its own has the LCOE of the batch kernels, wake losses aside
+        site, c = candidates(3, np.random.RandomState(1))
+        c['wake_loss_factor'] = 0.0
+        for use_dcf in (False, True):
+            cost, energy, capex, rating = po.candidate_terms(c, use_dcf)
+            lcoe = (core.batch_dcf if use_dcf else core.batch_lcoe)(turbine_number=1, **c)['lcoe']
+            npt.assert_allclose(cost / energy, lcoe, rtol=1e-12)
+
+    def testEnergy(self):
+        # With wake losses the default energy still matches the batch kernels in both modes
+        site, c = candidates(3, np.random.RandomState(1))
+        for use_dcf in (False, True):
+            cost, energy, capex, rating = po.candidate_terms(c, use_dcf)
+            lcoe = (core.batch_dcf if use_dcf else core.batch_lcoe)(turbine_number=1, **c)['lcoe']
+            npt.assert_allclose(cost / energy, lcoe, rtol=1e-12)
+            waked = po.candidate_terms(c, use_dcf, energy='waked')[1]
+            gross = po.candidate_terms(c, use_dcf, energy='gross')[1]
+            npt.assert_allclose(waked, c['turbine_aep'] * (1. - c['wake_loss_factor']))
+            npt.assert_allclose(gross, c['turbine_aep'])
+        self.assertRaises(ValueError, po.candidate_terms, c, energy='net')
+
+    def testBruteForce(self):
+        rng = np.random.RandomState(2)
+        site, c = candidates(4, rng)
+        budget, min_capacity, max_turbines = 2.2e7, 40.0, 3
+        res = po.allocate_portfolio(c, site, budget, min_capacity, max_turbines)
+        self.assertEqual(res['status'], 'optimal')
+
+        cost, energy, capex, rating = po.candidate_terms(c)
+        best = np.inf
+        options = [(r, k) for r in (0, 1) for k in range(1, max_turbines + 1)] + [(0, 0)]
+        for choice in itertools.product(options, repeat=4):
+            n = np.zeros(8)
+            for s, (r, k) in enumerate(choice):
+                n[2 * s + r] = k
+            if np.dot(n, capex) <= budget and np.dot(n, rating) >= min_capacity:
+                best = min(best, np.dot(n, cost) / np.dot(n, energy))
+        npt.assert_allclose(res['lcoe'], best, rtol=1e-4)
+        self.assertLessEqual(res['bound'], res['lcoe'])
+        n = res['turbine_number']
+        self.assertLessEqual(np.dot(n, capex), budget)
+        self.assertGreaterEqual(np.dot(n, rating), min_capacity)
+        self.assertTrue(np.all(np.bincount(site[n > 0]) <= 1))
+        npt.assert_allclose(po.fleet_lcoe(n, cost, energy)[0], res['lcoe'])
+
+    def testHundredsOfSites(self):
+        site, c = candidates(300, np.random.RandomState(3))
+        t0 = time.time()
+        res = po.allocate_portfolio(c, site, budget=2.5e9, min_capacity=1500.0, max_turbines=rng_max(300),
+                                    gap=1e-3)
+        self.assertLess(time.time() - t0, 60.0)
+        self.assertIn(res['status'], ('optimal', 'node_limit'))
+        n = res['turbine_number']
+        self.assertTrue(np.all(np.bincount(site[n > 0]) <= 1))
+        self.assertGreaterEqual(res['capacity'], 1500.0)
+
+    def testInfeasible(self):
+        site, c = candidates(2, np.random.RandomState(4))
+        res = po.allocate_portfolio(c, site, budget=1e6, min_capacity=100.0, max_turbines=5)
+        self.assertEqual(res['status'], 'infeasible')
+        self.assertRaises(ValueError, po.allocate_portfolio, c, site, 1e9, 0.0, 5)
+
+def rng_max(n_sites):
+    return np.repeat(np.random.RandomState(5).randint(5, 40, n_sites), 2)
+
+if __name__ == '__main__':
+    unittest.main()
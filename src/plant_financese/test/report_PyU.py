@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.plant_finance as pf
+from plant_financese.offshore import DEFAULT_OFFSHORE_COSTS
+from openmdao.api import Problem, Group
+
+class TestReport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.params = dict(pf.PARAM_DEFAULTS)
+        self.params.update(turbine_cost=1.2e6, turbine_number=50, turbine_bos_costs=7.7e5,
+                           turbine_avg_annual_opex=7e4, turbine_aep=1.6e7, machine_rating=5.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def testSampling(self):
+        mypfin = pf.PlantFinance(report_every=3)
+        for k in range(10):
+            self.params['turbine_cost'] = 1.0e6 + k * 1e5
+            mypfin.solve_nonlinear(self.params, {}, {})
+        self.assertEqual([r.call for r in mypfin.reports.reports], [3, 6, 9])
+        record = mypfin.reports.last.as_dict()
+        self.assertEqual(record['turbine_cost'], 1.8e6)
+        npt.assert_allclose(record['icc'], (1.8e6 + 7.7e5) / 5e3)
+        self.assertTrue('LCoE' in str(mypfin.reports.last))
+
+        mypfin.reports.to_json(os.path.join(self.tmp, 'reports.json'))
+        mypfin.reports.to_csv(os.path.join(self.tmp, 'reports.csv'))
+        with open(os.path.join(self.tmp, 'reports.json')) as f:
+            self.assertEqual(len(json.load(f)), 3)
+        data = np.genfromtxt(os.path.join(self.tmp, 'reports.csv'), delimiter=',', names=True)
+        npt.assert_allclose(data['lcoe'], [r.as_dict()['lcoe'] for r in mypfin.reports.reports])
+
+    def testLastReports(self):
+        mypfin = pf.PlantFinance(verbosity=True, max_reports=3)
+        for k in range(10):
+            self.params['turbine_cost'] = 1.0e6 + k * 1e5
+            mypfin.solve_nonlinear(self.params, {}, {})
+        self.assertEqual([r.call for r in mypfin.reports.reports], [8, 9, 10])
+        self.assertEqual(mypfin.reports.last.as_dict()['turbine_cost'], 1.9e6)
+        self.assertEqual(pf.PlantFinance(verbosity=True).reports.max_reports, 1000)
+
+    def testOffshoreIntermediates(self):
+        costs = DEFAULT_OFFSHORE_COSTS
+        mypfin = pf.PlantFinance(report_every=1, offshore_costs=costs)
+        self.params['sea_depth'] = 40.0
+        unknowns = {}
+        mypfin.solve_nonlinear(self.params, unknowns, {})
+        record = mypfin.reports.last.as_dict()
+        m = costs.lookup(40.0)
+        self.assertGreater(m['bos'], 1.0)
+        self.assertEqual(record['turbine_bos_costs'], 7.7e5)
+        npt.assert_allclose(record['icc'], (1.2e6 + 7.7e5 * m['bos']) / 5e3)
+        npt.assert_allclose(record['c_opex'], 7e4 * m['om'] / 5e3)
+        npt.assert_allclose(record['coe'], unknowns['coe'])
+
+    def testOffByDefault(self):
+        mypfin = pf.PlantFinance()
+        mypfin.solve_nonlinear(self.params, {}, {})
+        self.assertEqual(len(mypfin.reports), 0)
+        self.assertEqual(len(pf.PlantFinance(verbosity=True).reports.reports), 0)
+        self.assertEqual(pf.PlantFinance(verbosity=True).reports.every, 1)
+
+    def testFinalReport(self):
+        prob = Problem(root=Group())
+        prob.root.add('pf', pf.PlantFinance(), promotes=['*'])
+        prob.setup(check=False)
+        for k in ['turbine_cost', 'turbine_number', 'turbine_bos_costs', 'turbine_avg_annual_opex',
+                  'turbine_aep', 'machine_rating']:
+            prob[k] = self.params[k]
+        prob.run()
+        record = prob.root.pf.report().as_dict()
+        self.assertEqual(record['lcoe'], prob['lcoe'])
+        self.assertEqual(record['call'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.core as core
+import plant_financese.scenarios as sc
+import plant_financese.sweep as sw
+
+class TestScenarioFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'plants.pfs')
+        self.columns = {'turbine_cost': np.linspace(1e6, 2e6, 100), 'turbine_aep': np.linspace(1e7, 2e7, 100)}
+        self.fixed = {'turbine_number': 50, 'turbine_bos_costs': 7.7e5, 'turbine_avg_annual_opex': 7e4,
+                      'machine_rating': 5.0}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def testRoundTrip(self):
+        sc.create_scenarios(self.path, self.columns, fixed=self.fixed).close()
+        f = sc.ScenarioFile(self.path)
+        self.assertEqual(len(f), 100)
+        self.assertIsInstance(f.columns['turbine_cost'], np.memmap)
+        npt.assert_equal(f.columns['turbine_aep'], self.columns['turbine_aep'])
+        self.assertEqual(f.units['turbine_aep'], 'kW*h')
+        self.assertEqual(f.units['machine_rating'], 'MW')
+        self.assertEqual(f.schema['model_version'], core.MODEL_VERSION)
+        out = core.evaluate_batch(f.chunk(10, 20))
+        npt.assert_equal(out['lcoe'], core.evaluate_batch(dict(self.fixed, turbine_cost=self.columns['turbine_cost'][10:20],
+                                                                     turbine_aep=self.columns['turbine_aep'][10:20]))['lcoe'])
+        self.assertRaises(ValueError, f.append, self.columns)
+
+    def testAppend(self):
+        f = sc.create_scenarios(self.path, self.columns, capacity=150, fixed=self.fixed)
+        f.append(dict((name, values[:40]) for name, values in self.columns.items()))
+        self.assertEqual((len(f), f.capacity), (140, 150))
+        f.append(self.columns)
+        self.assertEqual((len(f), f.capacity), (240, 300))
+        f.close()
+        f = sc.ScenarioFile(self.path)
+        npt.assert_equal(f.columns['turbine_cost'],
+                         np.r_[self.columns['turbine_cost'], self.columns['turbine_cost'][:40], self.columns['turbine_cost']])
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+        g = sc.ScenarioFile(self.path, 'r+')
+        self.assertRaises(ValueError, g.append, {'turbine_cost': [1.0]})
+        self.assertRaises(ValueError, g.append, {'turbine_cost': [1.0], 'turbine_aep': [1.0, 2.0]})
+
+    def testLargeOpen(self):
+        # Columns are reserved sparse and never read on open
+        sc.create_scenarios(self.path, {'turbine_cost': [1e6]}, capacity=50 * 10**6).close()
+        self.assertEqual(os.path.getsize(self.path), sc.HEADER_SIZE + 8 * 50 * 10**6)
+        f = sc.ScenarioFile(self.path)
+        self.assertEqual(len(f), 1)
+
+    def testSchemaChecks(self):
+        self.assertRaises(ValueError, sc.create_scenarios, self.path, {'turbine_cst': [1.0]})
+        sc.create_scenarios(self.path, self.columns).close()
+        with open(self.path, 'r+b') as f:
+            n, capacity, schema = sc._read_header(f)
+            schema['columns'][1]['units'] = 'MWh'
+            sc._write_header(f, n, capacity, schema)
+        self.assertRaises(ValueError, sc.ScenarioFile, self.path)
+        with open(self.path, 'r+b') as f:
+            f.write(b'NOTSCENS')
+        self.assertRaises(ValueError, sc.ScenarioFile, self.path)
+
+    def testSweep(self):
+        f = sc.create_scenarios(self.path, self.columns, fixed=self.fixed)
+        sw.run_sweep(f, os.path.join(self.tmp, 'sweep'), chunk_size=30, processes=2)
+        expected = core.evaluate_batch(dict(self.fixed, **self.columns))
+        npt.assert_equal(sw.load_sweep(os.path.join(self.tmp, 'sweep'))['lcoe'], expected['lcoe'])
+
+if __name__ == '__main__':
+    unittest.main()
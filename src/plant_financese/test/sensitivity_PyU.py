@@ -0,0 +1,46 @@
+import unittest
+import plant_financese.sensitivity as sa
+from plant_financese.validation import PlantFinanceInputError
+
+class TestSensitivity(unittest.TestCase):
+    def setUp(self):
+        self.bounds = {'turbine_cost': (1.0e6, 1.4e6),
+                       'turbine_number': (20, 100),
+                       'turbine_bos_costs': (6e5, 9e5),
+                       'turbine_avg_annual_opex': (5e4, 9e4),
+                       'turbine_aep': (1.4e7, 1.8e7),
+                       'machine_rating': (3.0, 6.0),
+                       'fixed_charge_rate': (0.08, 0.14)}
+
+    def testSobol(self):
+        res = sa.sobol_indices(self.bounds, 20000, seed=2)
+        S1 = dict(zip(res['names'], res['S1']))
+        ST = dict(zip(res['names'], res['ST']))
+        # turbine_number and machine_rating cancel out of the LCOE equations
+        self.assertTrue(ST['turbine_number'] < 1e-12)
+        self.assertTrue(ST['machine_rating'] < 1e-12)
+        self.assertTrue(ST['turbine_aep'] > ST['turbine_avg_annual_opex'])
+        self.assertTrue(0.9 < sum(S1.values()) < 1.1)
+        for name in res['names']:
+            self.assertTrue(S1[name] <= ST[name] + 0.02)
+
+    def testMorris(self):
+        res = sa.morris_effects(self.bounds, 50, seed=3, use_dcf=True)
+        mu_star = dict(zip(res['names'], res['mu_star']))
+        mu = dict(zip(res['names'], res['mu']))
+        self.assertTrue(mu_star['machine_rating'] < 1e-12)
+        self.assertTrue(mu['turbine_cost'] > 0.0)
+        self.assertTrue(mu['turbine_aep'] < 0.0)
+
+    def testInvalidSamples(self):
+        bounds = dict((name, self.bounds[name]) for name in ('turbine_cost', 'fixed_charge_rate'))
+        self.assertRaises(PlantFinanceInputError, sa.sobol_indices, bounds, 10, fixed={'turbine_aep': 0.0})
+        # Valid inputs, but the plant loses all its energy to wakes
+        fixed = {'turbine_number': 50, 'turbine_aep': 1.6e7, 'machine_rating': 5.0, 'wake_loss_factor': 1.0}
+        self.assertRaises(ValueError, sa.morris_effects, bounds, 5, fixed=fixed, use_dcf=True)
+
+    def testUnknownParam(self):
+        self.assertRaises(ValueError, sa.sobol_indices, {'rotor_diameter': (100., 150.)}, 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.core as core
+import plant_financese.service as sv
+
+async def post(reader, writer, body, target='/evaluate', method='POST'):
+    data = json.dumps(body).encode() if body is not None else b''
+    writer.write(('%s %s HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n'
+                  % (method, target, len(data))).encode() + data)
+    await writer.drain()
+    code = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        if line.lower().startswith(b'content-length'):
+            length = int(line.split(b':')[1])
+    return code, json.loads((await reader.readexactly(length)).decode())
+
+class TestService(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.costs = np.linspace(1e6, 2e6, 200)
+        self.base = {'turbine_number': 50, 'turbine_bos_costs': 7.7e5, 'turbine_avg_annual_opex': 7e4,
+                     'turbine_aep': 1.6e7, 'machine_rating': 5.0}
+
+    def tearDown(self):
+        self.loop.close()
+
+    def query(self, server, bodies, **kwargs):
+        # One connection per query, all in flight at once
+        async def one(body):
+            if server.path is not None:
+                reader, writer = await asyncio.open_unix_connection(server.path)
+            else:
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            try:
+                return await post(reader, writer, body, **kwargs)
+            finally:
+                writer.close()
+        async def run():
+            await server.start()
+            try:
+                return await asyncio.gather(*[one(b) for b in bodies])
+            finally:
+                await server.close()
+        return self.loop.run_until_complete(run())
+
+    def testMicroBatches(self):
+        server = sv.EvaluationServer(sv.MicroBatcher(max_batch=64, max_delay=0.05))
+        replies = self.query(server, [dict(self.base, turbine_cost=c) for c in self.costs])
+        expected = core.evaluate_batch(dict(self.base, turbine_cost=self.costs))
+        self.assertEqual(set(code for code, r in replies), {200})
+        npt.assert_allclose([r['lcoe'] for code, r in replies], expected['lcoe'], rtol=1e-15)
+        npt.assert_allclose([r['coe'] for code, r in replies], expected['coe'], rtol=1e-15)
+        stats = server.batcher.stats()
+        self.assertEqual(stats['requests'], 200)
+        self.assertLessEqual(stats['largest_batch'], 64)
+        self.assertLess(stats['batches'], 20)
+
+    def testErrors(self):
+        server = sv.EvaluationServer(sv.MicroBatcher(use_dcf=True, outputs=('lcoe', 'capex')))
+        replies = self.query(server, [dict(self.base, turbine_cost=1.5e6), dict(self.base, turbine_cost=0.0),
+                                      {'turbine_cst': 1.0}, {'turbine_cost': 'a'},
+                                      [dict(self.base, turbine_cost=1.5e6), dict(self.base, turbine_number=0)]])
+        expected = core.evaluate_batch(dict(self.base, turbine_cost=1.5e6), use_dcf=True)
+        self.assertEqual([code for code, r in replies], [200, 422, 400, 400, 422])
+        npt.assert_allclose(replies[0][1]['capex'], expected['capex'])
+        self.assertIsNone(replies[1][1]['lcoe'])
+        self.assertIn('turbine_cst', replies[2][1]['error'])
+        self.assertEqual(replies[4][1][0]['lcoe'], replies[0][1]['lcoe'])
+        self.assertIn('error', replies[4][1][1])
+
+    def testBadListNotQueued(self):
+        server = sv.EvaluationServer()
+        replies = self.query(server, [[dict(self.base, turbine_cost=1.5e6), {'turbine_cst': 1.0}]])
+        self.assertEqual(replies[0][0], 400)
+        self.assertEqual(server.batcher.requests, 0)
+
+    def testInternalError(self):
+        class Broken(sv.MicroBatcher):
+            def evaluate_many(self, queries):
+                raise RuntimeError('evaluation failed')
+        replies = self.query(sv.EvaluationServer(Broken()), [dict(self.base, turbine_cost=1.5e6)])
+        self.assertEqual(replies[0], (500, {'error': 'RuntimeError: evaluation failed'}))
+
+    def testUnixSocket(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            server = sv.EvaluationServer(path=os.path.join(tmp, 'plant_finance.sock'))
+            replies = self.query(server, [dict(self.base, turbine_cost=c) for c in self.costs[:10]])
+            expected = core.evaluate_batch(dict(self.base, turbine_cost=self.costs[:10]))
+            npt.assert_allclose([r['lcoe'] for code, r in replies], expected['lcoe'], rtol=1e-15)
+        finally:
+            shutil.rmtree(tmp)
+
+    def testKeepAlive(self):
+        server = sv.EvaluationServer()
+        async def run():
+            await server.start()
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            replies = [await post(reader, writer, dict(self.base, turbine_cost=c)) for c in self.costs[:3]]
+            replies.append(await post(reader, writer, None, '/stats', 'GET'))
+            writer.close()
+            await server.close()
+            return replies
+        replies = self.loop.run_until_complete(run())
+        self.assertEqual(replies[-1][1]['requests'], 3)
+        self.assertEqual(replies[-1][1]['batches'], 3)
+
+    def testMalformedRequest(self):
+        # Answered with 400, then the connection is closed
+        server = sv.EvaluationServer()
+        async def run():
+            await server.start()
+            replies = []
+            for request in (b'garbage\r\n\r\n', b'POST /evaluate HTTP/1.1\r\nContent-Length: ten\r\n\r\n'):
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+                writer.write(request)
+                replies.append(await reader.read())
+                writer.close()
+            await server.close()
+            return replies
+        for reply in self.loop.run_until_complete(run()):
+            self.assertTrue(reply.startswith(b'HTTP/1.1 400 Bad Request\r\n'))
+            self.assertIn('error', json.loads(reply.split(b'\r\n\r\n', 1)[1].decode()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import gc
+import os
+import pickle
+import tempfile
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.core as core
+import plant_financese.shared as sh
+from plant_financese.validation import PlantFinanceInputError
+
+class TestSharedScenarios(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.columns = {'turbine_cost': rng.uniform(1e6, 2e6, 10000), 'turbine_aep': rng.uniform(1e7, 2e7, 10000),
+                        'turbine_number': 50, 'turbine_bos_costs': 7.7e5, 'turbine_avg_annual_opex': 7e4,
+                        'machine_rating': 5.0}
+
+    def testLayout(self):
+        with sh.SharedScenarios.from_columns(self.columns, outputs=('lcoe', 'capex')) as shared:
+            self.assertEqual(shared.n, 10000)
+            self.assertEqual(sorted(shared.inputs), ['turbine_aep', 'turbine_cost'])
+            self.assertEqual(shared.fixed['turbine_number'], 50)
+            self.assertEqual(shared.outputs['status'].dtype, np.int64)
+            # Columns are views of the one mapping, and a pickled copy maps the same file
+            self.assertFalse(shared.inputs['turbine_cost'].flags.owndata)
+            other = pickle.loads(pickle.dumps(shared))
+            self.assertLess(len(pickle.dumps(shared)), 1000)
+            other.outputs['lcoe'][:3] = 1.0
+            npt.assert_equal(shared.outputs['lcoe'][:3], 1.0)
+            other.close()
+            self.assertTrue(os.path.exists(shared.path))
+            path = shared.path
+        self.assertFalse(os.path.exists(path))
+        self.assertRaises(ValueError, sh.SharedScenarios, 10, ['turbine_cst'])
+
+    def testUnclosed(self):
+        # Collecting a pickled copy leaves the file, collecting the owner removes it
+        shared = sh.SharedScenarios.from_columns(self.columns)
+        path = shared.path
+        other = pickle.loads(pickle.dumps(shared))
+        del other
+        gc.collect()
+        self.assertTrue(os.path.exists(path))
+        del shared
+        gc.collect()
+        self.assertFalse(os.path.exists(path))
+
+    def testPool(self):
+        for use_dcf in (False, True):
+            expected = core.evaluate_batch(self.columns, use_dcf)
+            with sh.SharedScenarios.from_columns(self.columns, ('lcoe', 'coe', 'capex')[:2 + use_dcf],
+                                                 directory=tempfile.gettempdir()) as shared:
+                out = sh.evaluate_shared(shared, processes=2, chunk_size=1500, use_dcf=use_dcf)
+                for name in out:
+                    npt.assert_equal(out[name], expected[name])
+
+    def testPolicy(self):
+        columns = dict(self.columns, turbine_number=np.r_[50, 0, 50], turbine_cost=1.5e6, turbine_aep=1.6e7)
+        with sh.SharedScenarios.from_columns(columns) as shared:
+            out = sh.evaluate_shared(shared)
+            npt.assert_equal(np.isnan(out['lcoe']), [False, True, False])
+            self.assertEqual(out['status'][1] & 1, 1)
+            self.assertRaises(PlantFinanceInputError, sh.evaluate_shared, shared, 2, 2, policy='raise')
+            self.assertRaises(ValueError, sh.evaluate_shared, shared, policy='mask')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.streaming as st
+import plant_financese.plant_finance as pf
+from plant_financese.validation import PlantFinanceInputError
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        rng = np.random.RandomState(4)
+        n = 1003
+        self.columns = {'capex': rng.uniform(1e6, 2e6, n),
+                        'turbine_bos_costs': rng.uniform(5e5, 9e5, n),
+                        'turbine_avg_annual_opex': rng.uniform(5e4, 9e4, n),
+                        'turbine_aep': rng.uniform(1.2e7, 1.8e7, n),
+                        'machine_rating': rng.choice([3.0, 5.0], n),
+                        'turbine_number': rng.randint(10, 100, n)}
+        self.column_map = {'capex': 'turbine_cost'}
+        params = dict((self.column_map.get(k, k), v) for k, v in self.columns.items())
+        self.expected = pf.batch_lcoe(**params)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def check(self, dst):
+        res = np.loadtxt(dst, delimiter=',', skiprows=1)
+        npt.assert_equal(res[:, 0], np.arange(1003))
+        npt.assert_equal(res[:, 1], self.expected['lcoe'])
+        npt.assert_equal(res[:, 3], self.expected['icc'])
+
+    def testCsv(self):
+        src = os.path.join(self.tmp, 'projects.csv')
+        names = sorted(self.columns.keys())
+        with open(src, 'w') as f:
+            f.write('name,' + ','.join(names) + '\n')
+            for k in range(1003):
+                f.write('site%d,' % k + ','.join('%.17g' % self.columns[name][k] for name in names) + '\n')
+        dst = os.path.join(self.tmp, 'out.csv')
+        self.assertEqual(st.evaluate_file(src, dst, self.column_map, chunk_size=100), 1003)
+        self.check(dst)
+
+    def testQuotedCsv(self):
+        src = os.path.join(self.tmp, 'projects.csv')
+        names = sorted(self.columns.keys())
+        with open(src, 'w') as f:
+            f.write('"name, phase",' + ','.join('"%s"' % name for name in names) + '\n')
+            for k in range(1003):
+                f.write('"Farm %d, Phase 2",' % k + ','.join('%.17g' % self.columns[name][k] for name in names) + '\n')
+        chunks = list(st.read_csv_chunks(src, 400, self.column_map))
+        self.assertEqual([len(c['turbine_cost']) for c in chunks], [400, 400, 203])
+        dst = os.path.join(self.tmp, 'out.csv')
+        self.assertEqual(st.evaluate_file(src, dst, self.column_map, chunk_size=100), 1003)
+        self.check(dst)
+
+    def testNpy(self):
+        src = os.path.join(self.tmp, 'columns')
+        os.mkdir(src)
+        for name, values in self.columns.items():
+            np.save(os.path.join(src, name + '.npy'), values)
+        dst = os.path.join(self.tmp, 'out.csv')
+        self.assertEqual(st.evaluate_file(src, dst, self.column_map, chunk_size=256), 1003)
+        self.check(dst)
+
+    def testPolicies(self):
+        # Row 1 has no capital cost
+        src = os.path.join(self.tmp, 'columns')
+        os.mkdir(src)
+        for name, values in self.columns.items():
+            values = values[:4].copy()
+            if name == 'capex':
+                values[1] = 0.0
+            np.save(os.path.join(src, name + '.npy'), values)
+        dst = os.path.join(self.tmp, 'out.csv')
+        for policy in ('nan', 'mask'):
+            st.evaluate_file(src, dst, self.column_map, policy=policy)
+            res = np.genfromtxt(dst, delimiter=',', names=True)
+            npt.assert_equal(np.isnan(res['lcoe']), [False, True, False, False])
+            npt.assert_equal(np.isnan(res['icc']), [False, True, False, False])
+            self.assertEqual(res['status'][1], 2)
+            npt.assert_allclose(res['lcoe'][0], self.expected['lcoe'][0], rtol=1e-15)
+        self.assertRaises(PlantFinanceInputError, st.evaluate_file, src, dst, self.column_map, policy='raise')
+
+    def testBadMap(self):
+        self.assertRaises(ValueError, st.map_columns, ['capex'], {'capex': 'capital_cost'})
+        self.assertRaises(ValueError, st.map_columns, ['capex'], {'opex': 'turbine_avg_annual_opex'})
+
+if __name__ == '__main__':
+    unittest.main()
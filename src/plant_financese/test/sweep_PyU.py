@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.sweep as sw
+import plant_financese.scenarios as sc
+import plant_financese.plant_finance as pf
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.spec = sw.FullFactorial({'turbine_number': [20, 50, 100],
+                                      'machine_rating': [3.0, 5.0],
+                                      'turbine_cost': np.linspace(1e6, 2e6, 5),
+                                      'fixed_charge_rate': [0.08, 0.1, 0.12]},
+                                     fixed={'turbine_bos_costs': 7.7e5, 'turbine_avg_annual_opex': 7e4,
+                                            'turbine_aep': 1.6e7})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def testFactorial(self):
+        self.assertEqual(len(self.spec), 90)
+        cols = self.spec.chunk(0, 90)
+        self.assertEqual(len(set(zip(cols['turbine_number'], cols['machine_rating'], cols['turbine_cost'],
+                                     cols['fixed_charge_rate']))), 90)
+        npt.assert_equal(self.spec.chunk(10, 20)['turbine_cost'], cols['turbine_cost'][10:20])
+
+    def testResume(self):
+        out_dir = os.path.join(self.tmp, 'run')
+        info = sw.run_sweep(self.spec, out_dir, chunk_size=16, save_inputs=True)
+        self.assertEqual((info['n_chunks'], info['computed']), (6, 6))
+        os.remove(sw.chunk_path(out_dir, 3))
+        info = sw.run_sweep(self.spec, out_dir, chunk_size=16, save_inputs=True)
+        self.assertEqual((info['computed'], info['skipped']), (1, 5))
+
+        res = sw.load_sweep(out_dir)
+        cols = self.spec.chunk(0, 90)
+        expected = pf.batch_lcoe(**cols)
+        npt.assert_equal(res['lcoe'], expected['lcoe'])
+        npt.assert_equal(res['input:turbine_number'], cols['turbine_number'])
+
+        self.assertRaises(ValueError, sw.run_sweep, self.spec, out_dir, chunk_size=32)
+
+    def testResumeOtherSweep(self):
+        out_dir = os.path.join(self.tmp, 'run')
+        sw.run_sweep(self.spec, out_dir, chunk_size=16)
+        other = sw.FullFactorial(dict(zip(self.spec.names, self.spec.values)),
+                                 fixed=dict(self.spec.fixed, turbine_aep=1.2e7))
+        self.assertEqual(len(other), len(self.spec))
+        self.assertNotEqual(sw.spec_digest(other), sw.spec_digest(self.spec))
+        self.assertRaises(ValueError, sw.run_sweep, other, out_dir, chunk_size=16)
+        self.assertRaises(ValueError, sw.run_sweep, self.spec, out_dir, chunk_size=16, policy='raise')
+        self.assertRaises(ValueError, sw.run_sweep, self.spec, out_dir, chunk_size=16, save_inputs=True)
+        same = sw.FullFactorial(dict(zip(self.spec.names, self.spec.values)), fixed=self.spec.fixed)
+        self.assertEqual(sw.run_sweep(same, out_dir, chunk_size=16)['skipped'], 6)
+
+    def testDigestLayout(self):
+        # Strided and contiguous columns hash alike, whatever the block boundaries
+        values = np.linspace(1e6, 2e6, 300000)
+        strided = np.repeat(values, 2)[::2]
+        self.assertFalse(strided.flags.c_contiguous)
+        self.assertEqual(sw.spec_digest(sw.ScenarioList({'turbine_cost': values})),
+                         sw.spec_digest(sw.ScenarioList({'turbine_cost': strided})))
+
+    def testDigestScenarioFile(self):
+        path = os.path.join(self.tmp, 'scenarios.bin')
+        f = sc.create_scenarios(path, {'turbine_cost': np.linspace(1e6, 2e6, 10)}, capacity=20)
+        digest = sw.spec_digest(f)
+        self.assertEqual(sw.spec_digest(sc.ScenarioFile(path)), digest)
+        f.append({'turbine_cost': [1.5e6]})
+        self.assertNotEqual(sw.spec_digest(f), digest)
+        f.close()
+
+    def testMaskRejected(self):
+        self.assertRaises(ValueError, sw.run_sweep, self.spec, os.path.join(self.tmp, 'run'), policy='mask')
+
+    def testPool(self):
+        spec = sw.ScenarioList({'turbine_cost': np.linspace(1e6, 2e6, 1000)}, fixed=self.spec.fixed)
+        spec.fixed.update(turbine_number=50, machine_rating=5.0)
+        sw.run_sweep(spec, os.path.join(self.tmp, 'serial'), chunk_size=128, use_dcf=True)
+        sw.run_sweep(spec, os.path.join(self.tmp, 'pool'), chunk_size=128, use_dcf=True, processes=2)
+        a = sw.load_sweep(os.path.join(self.tmp, 'serial'))
+        b = sw.load_sweep(os.path.join(self.tmp, 'pool'))
+        self.assertEqual(a['lcoe'].shape, (1000,))
+        npt.assert_equal(a['lcoe'], b['lcoe'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.timeseries as ts
+import plant_financese.core as core
+
+class TestTimeSeries(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        rng = np.random.RandomState(5)
+        self.n = 6
+        hours = 2 * ts.HOURS_PER_YEAR
+        self.generation = rng.uniform(0.0, 5000.0, (hours, self.n)).astype(np.float32)
+        self.price = rng.uniform(0.01, 0.09, hours).astype(np.float32)
+        self.plants = {'turbine_cost': rng.uniform(1e6, 2e6, self.n), 'turbine_number': 4,
+                       'turbine_bos_costs': 7.7e5, 'turbine_avg_annual_opex': 7e4, 'machine_rating': 5.0}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def testAnnualTotals(self):
+        out = ts.evaluate_timeseries(self.generation, self.price, self.plants, chunk_hours=1000)
+        g = self.generation.astype(np.float64)
+        p = self.price.astype(np.float64)[:, np.newaxis]
+        npt.assert_allclose(out['annual_energy'], g.sum(axis=0) / 2, rtol=1e-12)
+        npt.assert_allclose(out['revenue'], (g * p).sum(axis=0) / 2, rtol=1e-12)
+        npt.assert_allclose(out['energy_by_year'][1], g[ts.HOURS_PER_YEAR:].sum(axis=0), rtol=1e-12)
+        npt.assert_allclose(out['capture_price'], out['revenue'] / out['annual_energy'])
+        npt.assert_allclose(out['average_price'], p.mean(), rtol=1e-12)
+
+        expected = core.batch_lcoe(turbine_aep=out['annual_energy'] / 4, **self.plants)
+        npt.assert_allclose(out['lcoe'], expected['lcoe'], rtol=1e-14)
+        npt.assert_allclose(out['value_adjusted_lcoe'],
+                            out['lcoe'] + out['average_price'] - out['capture_price'], rtol=1e-14)
+
+    def testMemoryMapped(self):
+        gen_path = os.path.join(self.tmp, 'generation.bin')
+        self.generation.tofile(gen_path)
+        price_path = os.path.join(self.tmp, 'price.npy')
+        np.save(price_path, np.tile(self.price[:, np.newaxis], (1, self.n)))
+        out = ts.evaluate_timeseries(gen_path, price_path, self.plants, use_dcf=True, n_plants=self.n)
+        ref = ts.evaluate_timeseries(self.generation, self.price, self.plants, use_dcf=True)
+        for name in ('annual_energy', 'revenue', 'lcoe', 'coe'):
+            npt.assert_allclose(out[name], ref[name], rtol=1e-12)
+        self.assertRaises(ValueError, ts.open_profile, gen_path)
+
+    def testRawPrice(self):
+        # One raw price series for all plants, next to raw per-plant generation
+        gen_path = os.path.join(self.tmp, 'generation.bin')
+        self.generation.tofile(gen_path)
+        price_path = os.path.join(self.tmp, 'price.bin')
+        self.price.tofile(price_path)
+        self.assertEqual(ts.open_profile(price_path, self.n, hours=len(self.price)).shape, (len(self.price),))
+        out = ts.evaluate_timeseries(gen_path, price_path, self.plants, n_plants=self.n)
+        ref = ts.evaluate_timeseries(self.generation, self.price, self.plants)
+        for name in ('revenue', 'capture_price', 'average_price', 'lcoe'):
+            npt.assert_allclose(out[name], ref[name], rtol=1e-12)
+        self.assertRaises(ValueError, ts.open_profile, price_path, 7)
+
+    def testPartialYear(self):
+        self.assertRaises(ValueError, ts.profile_totals, self.generation[:100], self.price[:100])
+
+if __name__ == '__main__':
+    unittest.main()
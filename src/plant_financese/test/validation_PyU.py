@@ -0,0 +1,71 @@
+import warnings
+import numpy as np
+import numpy.testing as npt
+import unittest
+import plant_financese.validation as val
+import plant_financese.plant_finance as pf
+
+class TestValidation(unittest.TestCase):
+    def setUp(self):
+        self.columns = {'turbine_cost': np.array([1.2e6, 0.0, 1.2e6, 1.2e6]),
+                        'turbine_number': np.array([50, 50, 0, 50]),
+                        'turbine_bos_costs': np.array([7.7e5, 7.7e5, 7.7e5, 0.0]),
+                        'turbine_avg_annual_opex': 7e4,
+                        'turbine_aep': 1.6e7,
+                        'machine_rating': 5.0}
+
+    def testStatus(self):
+        status = val.validate_inputs(**self.columns)
+        npt.assert_equal(status, [val.OK, val.ZERO_TURBINE_COST, val.ZERO_TURBINE_NUMBER, val.ZERO_BOS_COSTS])
+        self.assertEqual(len(val.describe(val.ZERO_AEP | val.ZERO_OPEX)), 2)
+
+    def testOuterProduct(self):
+        # Shapes that only broadcast together, not to the first input's shape
+        columns = dict(self.columns, turbine_number=50, turbine_bos_costs=7.7e5,
+                       turbine_cost=np.linspace(0.0, 2e6, 5), turbine_aep=np.array([[0.0], [1.4e7], [1.6e7]]))
+        status = val.validate_inputs(**columns)
+        self.assertEqual(status.shape, (3, 5))
+        out = pf.evaluate_batch(columns, policy='nan')
+        self.assertEqual(out['lcoe'].shape, (3, 5))
+        npt.assert_equal(np.isnan(out['lcoe']), (status & val.ERRORS) != 0)
+        npt.assert_equal(status[0, 1:], val.ZERO_AEP)
+        npt.assert_equal(status[1:, 0], val.ZERO_TURBINE_COST)
+
+    def testPolicies(self):
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            out = pf.evaluate_batch(self.columns, policy='nan')
+            self.assertEqual(len(w), 1)
+            self.assertTrue(issubclass(w[0].category, val.PlantFinanceInputWarning))
+        npt.assert_equal(np.isnan(out['lcoe']), [False, True, True, False])
+        npt.assert_equal(out['status'], val.validate_inputs(**self.columns))
+
+        out = pf.evaluate_batch(self.columns, policy='mask')
+        npt.assert_equal(out['lcoe'].mask, [False, True, True, False])
+        self.assertEqual(out['lcoe'].count(), 2)
+
+        with self.assertRaises(val.PlantFinanceInputError) as cm:
+            pf.evaluate_batch(self.columns, policy='raise')
+        self.assertTrue('first at index 1' in str(cm.exception))
+
+        out = pf.evaluate_batch(self.columns, trusted=True)
+        self.assertTrue('status' not in out)
+
+    def testComponent(self):
+        params = dict(pf.PARAM_DEFAULTS)
+        params.update(turbine_cost=0.0, turbine_number=50, turbine_bos_costs=7.7e5, turbine_avg_annual_opex=7e4,
+                      turbine_aep=1.6e7, machine_rating=5.0)
+        unknowns = {}
+        self.assertRaises(val.PlantFinanceInputError, pf.PlantFinance().solve_nonlinear, params, unknowns, {})
+
+        mypfin = pf.PlantFinance(policy='nan')
+        mypfin.solve_nonlinear(params, unknowns, {})
+        self.assertTrue(np.isnan(unknowns['lcoe']))
+        self.assertEqual(mypfin.status, val.ZERO_TURBINE_COST)
+        J = mypfin.linearize(params, unknowns, {})
+        self.assertTrue(np.all(np.isnan(list(J.values()))))
+
+        self.assertRaises(ValueError, pf.PlantFinance, policy='exit')
+
+if __name__ == '__main__':
+    unittest.main()
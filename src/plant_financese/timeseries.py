@@ -0,0 +1,106 @@
+"""
+timeseries.py
+
+Hourly (time-series) mode of the PlantFinance equations. Generation and price profiles are
+(hours, plants) arrays holding one or more weather years back to back, usually memory-mapped .npy
+or raw binary files; they are reduced to per-year energy and revenue in blocks of hours, so a
+multi-GB profile set is never resident. The annual energy then replaces the annual AEP inputs of
+the cost equations and the revenue gives the capture price and a value-adjusted LCOE.
+"""
+
+import numpy as np
+
+from plant_financese.core import evaluate_batch, PARAM_DEFAULTS
+
+HOURS_PER_YEAR = 8760
+
+
+def open_profile(source, n_plants=None, dtype=np.float32, hours=None):
+    """(hours, plants) profile from an array, a .npy file (memory-mapped) or a raw binary file.
+
+    Raw files hold hour-major values of the given dtype and need n_plants, except that a raw file
+    of exactly `hours` values is read as a 1-d profile when hours is given. A 1-d profile is one
+    series shared by every plant (typically a market price).
+    """
+    if not isinstance(source, str):
+        return np.asarray(source)
+    if source.endswith('.npy'):
+        return np.load(source, mmap_mode='r')
+    values = np.memmap(source, dtype=dtype, mode='r')
+    if hours is not None and len(values) == hours:
+        return values
+    if n_plants is None:
+        raise ValueError('n_plants is needed to read the raw profile %s' % source)
+    if len(values) % n_plants:
+        raise ValueError('%s holds %d values, not whole hours of %d plants' % (source, len(values), n_plants))
+    return values.reshape(-1, n_plants)
+
+
+def profile_totals(generation, price, hours_per_year=HOURS_PER_YEAR, chunk_hours=HOURS_PER_YEAR):
+    """Per-year energy and revenue of each plant, reduced chunk_hours rows at a time.
+
+    generation is (hours, plants) in kWh per hour, price (hours, plants) or (hours,) in USD/kWh,
+    hours a whole number of years. Returns (energy, revenue, mean_price), each (years, plants);
+    mean_price is the time-averaged price each plant sees.
+    """
+    hours, n_plants = generation.shape
+    if hours % hours_per_year:
+        raise ValueError('%d hours is not a whole number of %d-hour years' % (hours, hours_per_year))
+    if len(price) != hours:
+        raise ValueError('generation has %d hours, price %d' % (hours, len(price)))
+    n_years = hours // hours_per_year
+
+    energy     = np.zeros((n_years, n_plants))
+    revenue    = np.zeros((n_years, n_plants))
+    mean_price = np.zeros((n_years, n_plants))
+    for year in range(n_years):
+        for start in range(year * hours_per_year, (year + 1) * hours_per_year, chunk_hours):
+            stop = min(start + chunk_hours, (year + 1) * hours_per_year)
+            g = np.asarray(generation[start:stop], dtype=np.float64)
+            p = np.asarray(price[start:stop], dtype=np.float64)
+            if p.ndim == 1:
+                p = p[:, np.newaxis]
+            energy[year]     += g.sum(axis=0)
+            revenue[year]    += np.einsum('ij,ij->j', g, np.broadcast_to(p, g.shape))
+            mean_price[year] += p.sum(axis=0)
+        mean_price[year] /= hours_per_year
+    return energy, revenue, mean_price
+
+
+def evaluate_timeseries(generation, price, plants, hours_per_year=HOURS_PER_YEAR, chunk_hours=HOURS_PER_YEAR,
+                        use_dcf=False, policy='nan', n_plants=None):
+    """Annual energy, capture price, revenue and LCOE of every plant from hourly profiles.
+
+    generation and price are arrays or files as taken by open_profile (kWh per hour and USD/kWh),
+    a raw price file holds either one series for all plants or one per plant. plants maps
+    PlantFinance params to per-plant values or scalars. The mean annual energy over the weather
+    years is the park AEP, and turbine_aep is its per-turbine share, as the measured generation
+    already includes wake losses. Returns a dict of per-plant arrays: annual_energy,
+    revenue (annual), capture_price, average_price, value_factor (capture over average price),
+    lcoe, coe, value_adjusted_lcoe (lcoe plus the shortfall of the capture price below the average
+    price) and status, and the (years, plants) arrays energy_by_year and revenue_by_year.
+    """
+    generation = open_profile(generation, n_plants)
+    price      = open_profile(price, generation.shape[1], hours=generation.shape[0])
+    energy, revenue, mean_price = profile_totals(generation, price, hours_per_year, chunk_hours)
+
+    out = {'energy_by_year': energy, 'revenue_by_year': revenue}
+    out['annual_energy'] = energy.mean(axis=0)
+    out['revenue']       = revenue.mean(axis=0)
+    out['average_price'] = mean_price.mean(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out['capture_price'] = out['revenue'] / out['annual_energy']
+        out['value_factor']  = out['capture_price'] / out['average_price']
+
+    inputs = dict(PARAM_DEFAULTS)
+    inputs.update(plants)
+    inputs['park_aep']         = out['annual_energy']
+    inputs['wake_loss_factor'] = 0.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inputs['turbine_aep'] = out['annual_energy'] / np.asarray(inputs['turbine_number'], dtype=np.float64)
+        finance = evaluate_batch(inputs, use_dcf, policy)
+    out['lcoe']   = finance['lcoe']
+    out['coe']    = finance['coe']
+    out['status'] = finance['status']
+    out['value_adjusted_lcoe'] = out['lcoe'] + (out['average_price'] - out['capture_price'])
+    return out
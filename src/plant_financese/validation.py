@@ -0,0 +1,109 @@
+"""
+validation.py
+
+Vectorized checks of the PlantFinance inputs. Every scenario gets a status bit mask; error bits
+mark scenarios whose outputs are meaningless (division by zero), warning bits mark inputs that are
+most likely unconnected. How errors are surfaced is set by a policy:
+
+    'raise'  raise PlantFinanceInputError if any scenario has an error
+    'mask'   return the outputs as numpy masked arrays, masked where a scenario has an error
+    'nan'    set the outputs of scenarios with an error to NaN
+"""
+
+import warnings
+import numpy as np
+
+OK                  = 0
+ZERO_TURBINE_NUMBER = 1
+ZERO_TURBINE_COST   = 2
+ZERO_AEP            = 4
+ZERO_MACHINE_RATING = 8
+ZERO_BOS_COSTS      = 16
+ZERO_OPEX           = 32
+
+ERRORS   = ZERO_TURBINE_NUMBER | ZERO_TURBINE_COST | ZERO_AEP | ZERO_MACHINE_RATING
+WARNINGS = ZERO_BOS_COSTS | ZERO_OPEX
+
+MESSAGES = [
+    (ZERO_TURBINE_NUMBER, 'The number of the turbines in the plant is not initialized correctly and it is currently equal to 0'),
+    (ZERO_TURBINE_COST,   'The cost of the turbines in the plant is not initialized correctly and it is currently equal to 0 USD'),
+    (ZERO_AEP,            'AEP is not connected properly. turbine_aep is currently equal to 0 Wh'),
+    (ZERO_MACHINE_RATING, 'The rating of the turbine is not initialized correctly and it is currently equal to 0 MW'),
+    (ZERO_BOS_COSTS,      'The BoS costs of the turbine are not initialized correctly and they are currently equal to 0 USD'),
+    (ZERO_OPEX,           'The Opex costs of the turbine are not initialized correctly and they are currently equal to 0 USD'),
+]
+
+POLICIES = ('raise', 'mask', 'nan')
+
+
+class PlantFinanceInputError(ValueError):
+    def __init__(self, message, status=None):
+        super(PlantFinanceInputError, self).__init__(message)
+        self.status = status
+
+
+class PlantFinanceInputWarning(UserWarning):
+    pass
+
+
+def describe(code):
+    # Messages for the bits set in a single status code
+    return [message for bit, message in MESSAGES if code & bit]
+
+
+def validate_inputs(turbine_cost, turbine_number, turbine_bos_costs, turbine_avg_annual_opex, turbine_aep,
+                    machine_rating, **kwargs):
+    """Status bit mask of each scenario, broadcast over the inputs (same arguments as batch_lcoe).
+
+    The LCOE equations divide by the turbine AEP, so a zero turbine_aep is an error even if park_aep is set.
+    """
+    # Not in place, the first mask need not have the broadcast shape
+    status  = (np.asarray(turbine_number) == 0) * ZERO_TURBINE_NUMBER
+    status  = status | (np.asarray(turbine_cost) == 0) * ZERO_TURBINE_COST
+    status  = status | (np.asarray(turbine_aep) == 0) * ZERO_AEP
+    status  = status | (np.asarray(machine_rating) == 0) * ZERO_MACHINE_RATING
+    status  = status | (np.asarray(turbine_bos_costs) == 0) * ZERO_BOS_COSTS
+    status  = status | (np.asarray(turbine_avg_annual_opex) == 0) * ZERO_OPEX
+    return status
+
+
+def check_status(status, policy='raise', warn=True):
+    """Surface the status of a batch according to policy, returns the boolean error mask.
+
+    Raises PlantFinanceInputError under the 'raise' policy, otherwise only reports. Warning bits
+    are reported once per call as a PlantFinanceInputWarning (no per-scenario output).
+    """
+    if policy not in POLICIES:
+        raise ValueError('Unknown validation policy %r, use one of %s' % (policy, ', '.join(POLICIES)))
+    status = np.asarray(status)
+    errors = (status & ERRORS) != 0
+
+    if policy == 'raise' and errors.any():
+        first = np.flatnonzero(errors)[0]
+        code  = int(status.ravel()[first])
+        raise PlantFinanceInputError('%d of %d scenarios have invalid inputs, first at index %d: %s. '
+                                     'Check the connections to Plant_FinanceSE'
+                                     % (errors.sum(), status.size, first, '; '.join(describe(code & ERRORS))),
+                                     status)
+
+    if warn and (status & WARNINGS).any():
+        for bit, message in MESSAGES:
+            if bit & WARNINGS:
+                count = np.count_nonzero(status & bit)
+                if count:
+                    warnings.warn('%s (%d of %d scenarios). Check the connections to Plant_FinanceSE'
+                                  % (message, count, status.size), PlantFinanceInputWarning, stacklevel=3)
+    return errors
+
+
+def apply_policy(outputs, errors, policy, names=None):
+    # Blank out the outputs of the scenarios with errors, in place on the dict of output arrays
+    if policy == 'raise' or not np.any(errors):
+        return outputs
+    for name in (names or list(outputs.keys())):
+        value, mask = np.broadcast_arrays(outputs[name], errors)
+        if policy == 'nan':
+            outputs[name] = np.where(mask, np.nan, value)
+        else:
+            outputs[name] = np.ma.masked_array(value, mask=mask)
+    return outputs